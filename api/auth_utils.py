@@ -6,9 +6,10 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
-from asgiref.sync import sync_to_async
+from api.db_executor import run_db
 import jwt
 from datetime import datetime, timedelta
+from typing import Optional
 import os
 
 # JWT settings
@@ -17,6 +18,8 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 security = HTTPBearer()
+# Anonymous requests get None instead of HTTPBearer's 401/403
+optional_security = HTTPBearer(auto_error=False)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Create JWT access token"""
@@ -55,7 +58,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     username = verify_token(token)
     
     try:
-        user = await sync_to_async(User.objects.get)(username=username)
+        user = await run_db(User.objects.get, username=username)
         return user
     except ObjectDoesNotExist:
         raise HTTPException(
@@ -64,8 +67,10 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-async def get_current_user_optional(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user_optional(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
     """Get current user if authenticated, otherwise return None"""
+    if credentials is None:
+        return None
     try:
         return await get_current_user(credentials)
     except HTTPException:
@@ -0,0 +1,73 @@
+"""
+Conditional GET helpers: validators, 304 responses and CDN cache headers
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from fastapi import Request, Response
+
+
+def make_etag(*parts: object) -> str:
+    """Weak ETag over ``parts``; weak because equal payloads may differ byte-wise (e.g. compression)."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def is_not_modified(request: Request, etag: Optional[str], last_modified: Optional[datetime] = None) -> bool:
+    """True when the client's cached copy is still current.
+
+    If-None-Match wins over If-Modified-Since when both are sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have whole-second precision
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def cache_headers(
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+    surrogate_keys: Iterable[str] = (),
+    max_age: Optional[int] = None,
+) -> Dict[str, str]:
+    """Validator, Cache-Control and Surrogate-Key headers for a public catalog response.
+
+    Surrogate keys let a CDN or reverse proxy purge every cached response
+    that mentions a product or category when it changes.
+    """
+    if max_age is None:
+        max_age = getattr(settings, "STORE_API_CACHE_MAX_AGE", 60)
+    headers = {
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age}",
+    }
+    if etag:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    keys = " ".join(dict.fromkeys(surrogate_keys))
+    if keys:
+        headers["Surrogate-Key"] = keys
+    return headers
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,105 @@
+"""
+Bounded thread pool for blocking Django ORM work called from async endpoints
+"""
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from django.conf import settings
+from django.db import close_old_connections
+
+T = TypeVar("T")
+
+# Recent queue waits kept for the percentile metrics
+WAIT_SAMPLES = 1024
+
+
+class DBExecutor:
+    """Runs sync ORM callables on a fixed-size pool of worker threads.
+
+    ``sync_to_async`` with the default ``thread_sensitive=True`` sends every
+    call in the process through one thread; this pool lets up to
+    ``max_workers`` queries run at once while still bounding how many
+    database connections the API holds. Django connections are per thread,
+    so each worker reuses its own (kept for ``CONN_MAX_AGE``), and
+    ``close_old_connections`` runs around every call, as Django does around
+    every request, to drop expired or broken ones.
+
+    Django's async queryset methods (``aget``, ``acount``, ``aiterator``,
+    ``async for``) are that same thread-sensitive wrapper, so the routers'
+    listing, detail, count and cart reads go through ``run_db`` instead;
+    the rarer writes are left on them.
+
+    Size ``max_workers`` against the database: a queue depth that stays
+    above zero, or growing wait times, means callers are waiting on threads.
+    """
+
+    def __init__(self, max_workers: int = 8) -> None:
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._waits_ms: deque = deque(maxlen=WAIT_SAMPLES)
+
+    def _call(self, submitted: float, func: Callable[..., T]) -> T:
+        wait_ms = (time.perf_counter() - submitted) * 1000
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._waits_ms.append(wait_ms)
+        close_old_connections()
+        try:
+            result = func()
+        except BaseException:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+        return result
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Await ``func(*args, **kwargs)`` run on a pool thread."""
+        with self._lock:
+            self._queued += 1
+        call = functools.partial(self._call, time.perf_counter(), functools.partial(func, *args, **kwargs))
+        return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            stats: Dict[str, object] = {
+                "max_workers": self.max_workers,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+        stats["wait_ms"] = {
+            "samples": len(waits),
+            "mean": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95": round(waits[min(len(waits) - 1, int(0.95 * len(waits)))], 3) if waits else 0.0,
+            "max": round(waits[-1], 3) if waits else 0.0,
+        }
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+db_executor = DBExecutor(max_workers=getattr(settings, "STORE_DB_EXECUTOR_WORKERS", 8))
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking ORM code off the event loop on the shared DB executor."""
+    return await db_executor.run(func, *args, **kwargs)
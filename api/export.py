@@ -0,0 +1,96 @@
+"""
+Streaming catalog export: product rows as NDJSON or CSV, read in chunks
+"""
+import csv
+import io
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List
+
+from django.db.models import QuerySet
+
+from api.db_executor import run_db
+from api.serializers import FieldSet, dumps, product_row_dict
+from store.images import IMAGE_VARIANT_KEYS
+from store.models import Product
+
+EXPORT_FORMATS: Dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+async def _rows(queryset: QuerySet[Product], fields: FieldSet, chunk_size: int) -> AsyncIterator[Dict[str, Any]]:
+    # Seek on id one chunk at a time: memory stays at one chunk, and no cursor or
+    # read transaction is held open while a slow client drains the stream. (Django
+    # 4.2's aiterator() runs values_list() SQL on the event loop, so it is not used.)
+    rows = queryset.order_by("id").values_list(*fields.columns)
+    last_id = 0
+    while True:
+        chunk = await run_db(list, rows.filter(id__gt=last_id)[:chunk_size])
+        for row in chunk:
+            yield product_row_dict(row, fields)
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+async def ndjson_chunks(queryset: QuerySet[Product], fields: FieldSet, chunk_size: int) -> AsyncIterator[bytes]:
+    """One JSON object per line, flushed every ``chunk_size`` rows."""
+    lines = []
+    async for data in _rows(queryset, fields, chunk_size):
+        lines.append(dumps(data))
+        if len(lines) >= chunk_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def csv_header(fields: FieldSet) -> List[str]:
+    """CSV column names: ``image_variants`` becomes one ``image_<variant>`` column per URL."""
+    header: List[str] = []
+    for key in fields.output:
+        if key == "image_variants":
+            header.extend(f"image_{variant}" for variant in IMAGE_VARIANT_KEYS)
+        else:
+            header.append(key)
+    return header
+
+
+def csv_row(data: Dict[str, Any], fields: FieldSet) -> List[Any]:
+    """Cells for one ``product_row_dict`` in ``csv_header`` order; missing variants are blank."""
+    row: List[Any] = []
+    for key in fields.output:
+        if key == "image_variants":
+            variants = data[key] or {}
+            row.extend(variants.get(variant) for variant in IMAGE_VARIANT_KEYS)
+        else:
+            row.append(_csv_value(data[key]))
+    return row
+
+
+async def csv_chunks(queryset: QuerySet[Product], fields: FieldSet, chunk_size: int) -> AsyncIterator[bytes]:
+    """A header row then one row per product, flushed every ``chunk_size`` rows.
+
+    CSV is flat, so ``fields`` must not include the nested category, and the
+    ``image_variants`` dict is spread over ``image_<variant>`` columns.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(csv_header(fields))
+    written = 0
+    async for data in _rows(queryset, fields, chunk_size):
+        writer.writerow(csv_row(data, fields))
+        written += 1
+        if written % chunk_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
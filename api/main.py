@@ -25,7 +25,10 @@ import uvicorn
 from hamaroghara.wsgi import application as django_app
 
 # Import API routers
-from api.routers import products, categories, cart, orders, auth
+from api.routers import products, categories, cart, orders, auth, search
+from api.db_executor import db_executor, run_db
+from api.response_cache import PrecompressedCacheMiddleware, response_cache_stats
+from store.jobs import queue_stats
 
 # Create FastAPI app
 app = FastAPI(
@@ -36,6 +39,10 @@ app = FastAPI(
     redoc_url="/api/redoc"
 )
 
+# Serve hot catalog GETs from precompressed cached bytes; added first so CORS
+# headers are still computed per request around it
+app.add_middleware(PrecompressedCacheMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -58,6 +65,7 @@ app.include_router(products.router, prefix="/api/products", tags=["Products"])
 app.include_router(categories.router, prefix="/api/categories", tags=["Categories"])
 app.include_router(cart.router, prefix="/api/cart", tags=["Cart"])
 app.include_router(orders.router, prefix="/api/orders", tags=["Orders"])
+app.include_router(search.router, prefix="/api/search", tags=["Search"])
 
 @app.get("/api/")
 async def root():
@@ -74,6 +82,25 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "Hamaro Ghara Store API"}
 
+@app.get("/api/health/db")
+async def db_executor_stats():
+    """DB executor pool size, queue depth and queue wait times for this process"""
+    return db_executor.stats()
+
+@app.get("/api/health/response-cache")
+async def response_cache_health():
+    """Precompressed response cache hits, misses and encodings served by this process"""
+    return response_cache_stats.as_dict()
+
+@app.get("/api/health/image-jobs")
+async def image_jobs_health():
+    """Image jobs pending, running and failed, and the age of the oldest pending one"""
+    return await run_db(queue_stats)
+
+@app.on_event("shutdown")
+def shutdown_db_executor():
+    db_executor.shutdown(wait=False)
+
 if __name__ == "__main__":
     uvicorn.run(
         "api.main:app",
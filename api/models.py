@@ -1,10 +1,12 @@
 """
 Pydantic models for API serialization
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
+from django.db.models.fields.files import FieldFile
+from store.models import discount_percentage
 
 # Base models
 class CategoryBase(BaseModel):
@@ -45,21 +47,80 @@ class ProductUpdate(BaseModel):
     featured: Optional[bool] = None
     best_selling: Optional[bool] = None
 
+class ImageVariants(BaseModel):
+    thumbnail: str
+    webp_srcset: str
+    jpeg_srcset: str
+
 class ProductResponse(ProductBase):
     id: int
     slug: str
     category_id: int
     image: Optional[str] = None
-    discount_percentage: int = 0
+    image_variants: Optional[ImageVariants] = None
+    discount_percentage: int = Field(None, validate_default=True)
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
+    
+    @field_validator('image', mode='before')
+    @classmethod
+    def image_url(cls, value):
+        # from_orm hands over the ImageFieldFile; empty files are falsy
+        if isinstance(value, FieldFile):
+            return value.url if value else None
+        return value
+    
+    @field_validator('discount_percentage', mode='before')
+    @classmethod
+    def derive_discount(cls, value, info):
+        # Products have no such attribute for from_orm: derive it from the validated prices
+        if value is None:
+            return discount_percentage(info.data.get('price'), info.data.get('original_price'))
+        return value
 
 class ProductWithCategory(ProductResponse):
     category: CategoryResponse
 
+class ProductFields(BaseModel):
+    """A product as the read endpoints return it: every key of the default
+    profile, or with ``?fields=`` only the keys asked for (so none is required)."""
+    id: Optional[int] = None
+    name: Optional[str] = None
+    slug: Optional[str] = None
+    category_id: Optional[int] = None
+    description: Optional[str] = None
+    price: Optional[Decimal] = None
+    original_price: Optional[Decimal] = None
+    image: Optional[str] = None
+    image_variants: Optional[ImageVariants] = None
+    discount_percentage: Optional[int] = None
+    in_stock: Optional[bool] = None
+    featured: Optional[bool] = None
+    best_selling: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    # Only with fields=category, and by default on product detail and batch
+    category: Optional[CategoryResponse] = None
+
+class ProductTombstoneResponse(BaseModel):
+    id: int
+    slug: str
+    deleted_at: datetime
+
+class ProductChangesResponse(BaseModel):
+    changed: List[ProductFields]
+    deleted: List[ProductTombstoneResponse]
+    next_token: str
+    has_more: bool
+
+class ProductBatchResponse(BaseModel):
+    results: List[ProductFields]
+    missing_ids: List[int] = []
+    missing_slugs: List[str] = []
+
 class CartItemBase(BaseModel):
     product_id: int
     quantity: int = 1
@@ -73,7 +134,8 @@ class CartItemUpdate(BaseModel):
 class CartItemResponse(CartItemBase):
     id: int
     product: ProductResponse
-    total_price: Decimal
+    # Filled in from Cart.get_total_price() after from_orm
+    total_price: Decimal = Decimal('0')
     created_at: datetime
     
     class Config:
@@ -144,16 +206,27 @@ class UserResponse(BaseModel):
 class ProfileResponse(BaseModel):
     user: UserResponse
     profile_picture: Optional[str] = None
+    picture_variants: Optional[ImageVariants] = None
     
     class Config:
         from_attributes = True
 
+class SuggestionResponse(BaseModel):
+    type: str
+    id: int
+    name: str
+    slug: str
+    thumbnail: Optional[str] = None
+
 # Response models for pagination
 class PaginatedResponse(BaseModel):
-    count: int
+    count: Optional[int] = None
+    count_is_estimate: bool = False
     next: Optional[str] = None
     previous: Optional[str] = None
-    results: List[dict]
+    next_cursor: Optional[str] = None
+    results: List[ProductFields]
+    facets: Optional[dict] = None
 
 # Error models
 class ErrorResponse(BaseModel):
@@ -0,0 +1,205 @@
+"""
+Precompressed response cache for hot public catalog endpoints
+"""
+import asyncio
+import gzip
+import hashlib
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.conditional import is_not_modified, make_etag
+from api.db_executor import run_db
+from store.catalog import get_catalog_version
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is in requirements.txt
+    brotli = None
+
+RESPONSE_CACHE_KEY_TMPL = "api:response:{version}:{digest}:v1"
+
+# Paths whose GET responses are the same for every caller
+DEFAULT_CACHED_PATHS: Tuple[str, ...] = (
+    r"^/api/products/$",
+    r"^/api/products/(featured|bestselling)/list$",
+    r"^/api/categories/$",
+    r"^/api/categories/[-\w]+/products$",
+)
+
+# Bodies smaller than this are served as is; compression would not pay for the header
+MIN_COMPRESS_SIZE = 512
+# Most of the ratio of the densest settings at a fraction of their time: every catalog
+# write (stock edits, image jobs) turns the next request for each cached page into a miss
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Response headers recomputed per encoding rather than replayed
+_HOP_HEADERS = {b"content-length", b"content-encoding"}
+
+
+@dataclass
+class CachedResponse:
+    headers: List[Tuple[bytes, bytes]]
+    etag: str
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+
+
+def compress(body: bytes) -> Dict[str, bytes]:
+    """Identity, gzip and (when available) brotli variants of ``body``."""
+    bodies = {"identity": body}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        bodies["gzip"] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return bodies
+
+
+def negotiate(accept_encoding: str, available: Sequence[str]) -> str:
+    """Best of ``available`` for an Accept-Encoding header, preferring br, then gzip, then identity."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    for coding in ("br", "gzip"):
+        if coding in available and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return "identity"
+
+
+def cache_key(path: str, query_string: bytes, version: int) -> str:
+    # Parameter order does not change the response, so it does not change the key
+    query = urlencode(sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)))
+    digest = hashlib.sha1(f"{path}?{query}".encode()).hexdigest()
+    return RESPONSE_CACHE_KEY_TMPL.format(version=version, digest=digest)
+
+
+class ResponseCacheStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encodings: Dict[str, int] = {}
+
+    def record(self, hit: bool, encoding: str) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.encodings[encoding] = self.encodings.get(encoding, 0) + 1
+
+    def as_dict(self) -> Dict[str, object]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "encodings": dict(self.encodings),
+            }
+
+
+response_cache_stats = ResponseCacheStats()
+
+
+class PrecompressedCacheMiddleware:
+    """Serve repeat GETs of public catalog endpoints from cached, precompressed bytes.
+
+    The first 200 response for a path and query is stored with its gzip and
+    brotli variants under the current catalog version; later requests pick a
+    variant by Accept-Encoding and are answered without touching the router,
+    the ORM, the serializer or a compressor. Any product or category write
+    bumps the catalog version and orphans every entry. Responses without an
+    ETag get one, so cached hits also answer If-None-Match with a 304.
+    Compression and the (pickling) cache reads and writes run on worker
+    threads, never on the event loop.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Optional[Sequence[str]] = None, timeout: Optional[int] = None) -> None:
+        self.app = app
+        if paths is None:
+            paths = getattr(settings, "STORE_RESPONSE_CACHE_PATHS", DEFAULT_CACHED_PATHS)
+        self.paths = [re.compile(pattern) for pattern in paths]
+        self.timeout = timeout if timeout is not None else getattr(settings, "STORE_RESPONSE_CACHE_TIMEOUT", 300)
+
+    def _cacheable(self, scope: Scope) -> bool:
+        return (
+            scope["type"] == "http"
+            and scope["method"] == "GET"
+            and any(pattern.match(scope["path"]) for pattern in self.paths)
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.timeout or not self._cacheable(scope):
+            await self.app(scope, receive, send)
+            return
+
+        key = cache_key(scope["path"], scope.get("query_string", b""), await run_db(get_catalog_version))
+        entry = await asyncio.to_thread(cache.get, key)
+        if entry is not None:
+            await self._send_cached(scope, send, entry, hit=True)
+            return
+
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        body = b"".join(chunks)
+        headers = Headers(raw=start["headers"])
+        if start["status"] != 200 or "content-encoding" in headers or "set-cookie" in headers:
+            # Not a shareable representation: pass it through untouched
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = headers.get("etag")
+        raw = [(name, value) for name, value in start["headers"] if name.lower() not in _HOP_HEADERS]
+        vary = [value.decode("latin-1") for name, value in raw if name.lower() == b"vary"]
+        raw = [(name, value) for name, value in raw if name.lower() != b"vary"]
+        raw.append((b"vary", ", ".join(vary + ["Accept-Encoding"]).encode("latin-1")))
+        if etag is None:
+            etag = make_etag(key, hashlib.sha1(body).hexdigest())
+            raw.append((b"etag", etag.encode()))
+        entry = CachedResponse(headers=raw, etag=etag, bodies=await asyncio.to_thread(compress, body))
+        await asyncio.to_thread(cache.set, key, entry, timeout=self.timeout)
+        await self._send_cached(scope, send, entry, hit=False)
+
+    async def _send_cached(self, scope: Scope, send: Send, entry: CachedResponse, hit: bool) -> None:
+        request = Request(scope)
+        encoding = negotiate(request.headers.get("accept-encoding", ""), list(entry.bodies))
+        response_cache_stats.record(hit, encoding)
+        headers = list(entry.headers) + [(b"x-cache", b"HIT" if hit else b"MISS")]
+        if is_not_modified(request, entry.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        body = entry.bodies[encoding]
+        if encoding != "identity":
+            headers.append((b"content-encoding", encoding.encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
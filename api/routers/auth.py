@@ -7,7 +7,7 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 from datetime import timedelta
-from asgiref.sync import sync_to_async
+from api.db_executor import run_db
 from api.auth_utils import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
 from api.models import UserResponse, SuccessResponse
 
@@ -16,7 +16,8 @@ router = APIRouter()
 @router.post("/login", response_model=dict)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Login endpoint"""
-    user = await sync_to_async(authenticate)(
+    user = await run_db(
+        authenticate,
         username=form_data.username, 
         password=form_data.password
     )
@@ -43,14 +44,14 @@ async def register(username: str, email: str, password: str, first_name: str = "
     """Register new user"""
     try:
         # Check if user already exists
-        username_exists = await sync_to_async(User.objects.filter(username=username).exists)()
+        username_exists = await run_db(User.objects.filter(username=username).exists)
         if username_exists:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already exists"
             )
         
-        email_exists = await sync_to_async(User.objects.filter(email=email).exists)()
+        email_exists = await run_db(User.objects.filter(email=email).exists)
         if email_exists:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,7 +59,8 @@ async def register(username: str, email: str, password: str, first_name: str = "
             )
         
         # Create new user
-        user = await sync_to_async(User.objects.create_user)(
+        user = await run_db(
+            User.objects.create_user,
             username=username,
             email=email,
             password=password,
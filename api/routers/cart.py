@@ -4,6 +4,7 @@ Cart API endpoints
 from fastapi import APIRouter, HTTPException, status, Depends
 from api.models import CartItemResponse, CartItemCreate, CartItemUpdate, SuccessResponse
 from api.auth_utils import get_current_user
+from api.db_executor import run_db
 from store.models import Cart, Product
 from django.contrib.auth.models import User
 from typing import List
@@ -16,7 +17,7 @@ async def get_cart_items(current_user: User = Depends(get_current_user)):
     cart_items = Cart.objects.filter(user=current_user).select_related('product')
     
     result = []
-    for item in cart_items:
+    for item in await run_db(list, cart_items):
         item_data = CartItemResponse.from_orm(item)
         item_data.total_price = item.get_total_price()
         result.append(item_data)
@@ -30,7 +31,7 @@ async def add_to_cart(
 ):
     """Add item to cart"""
     try:
-        product = Product.objects.get(id=cart_item.product_id)
+        product = await run_db(Product.objects.get, id=cart_item.product_id)
         
         if not product.in_stock:
             raise HTTPException(
@@ -39,7 +40,9 @@ async def add_to_cart(
             )
         
         # Check if item already exists in cart
-        cart_item_obj, created = Cart.objects.get_or_create(
+        # select_related so an existing row's product is loaded for the response
+        cart_item_obj, created = await run_db(
+            Cart.objects.select_related('product').get_or_create,
             user=current_user,
             product=product,
             defaults={'quantity': cart_item.quantity}
@@ -48,7 +51,7 @@ async def add_to_cart(
         if not created:
             # Update quantity if item already exists
             cart_item_obj.quantity += cart_item.quantity
-            cart_item_obj.save()
+            await cart_item_obj.asave()
         
         response = CartItemResponse.from_orm(cart_item_obj)
         response.total_price = cart_item_obj.get_total_price()
@@ -74,17 +77,17 @@ async def update_cart_item(
 ):
     """Update cart item quantity"""
     try:
-        cart_item = Cart.objects.get(id=item_id, user=current_user)
+        cart_item = await run_db(Cart.objects.select_related('product').get, id=item_id, user=current_user)
         
         if cart_item_update.quantity <= 0:
-            cart_item.delete()
+            await cart_item.adelete()
             raise HTTPException(
                 status_code=status.HTTP_200_OK,
                 detail="Item removed from cart"
             )
         
         cart_item.quantity = cart_item_update.quantity
-        cart_item.save()
+        await cart_item.asave()
         
         response = CartItemResponse.from_orm(cart_item)
         response.total_price = cart_item.get_total_price()
@@ -109,8 +112,8 @@ async def remove_from_cart(
 ):
     """Remove item from cart"""
     try:
-        cart_item = Cart.objects.get(id=item_id, user=current_user)
-        cart_item.delete()
+        cart_item = await run_db(Cart.objects.get, id=item_id, user=current_user)
+        await cart_item.adelete()
         
         return SuccessResponse(message="Item removed from cart")
         
@@ -129,7 +132,7 @@ async def remove_from_cart(
 async def clear_cart(current_user: User = Depends(get_current_user)):
     """Clear all items from cart"""
     try:
-        Cart.objects.filter(user=current_user).delete()
+        await Cart.objects.filter(user=current_user).adelete()
         
         return SuccessResponse(message="Cart cleared successfully")
         
@@ -142,12 +145,12 @@ async def clear_cart(current_user: User = Depends(get_current_user)):
 @router.get("/count")
 async def get_cart_count(current_user: User = Depends(get_current_user)):
     """Get total number of items in cart"""
-    count = Cart.objects.filter(user=current_user).count()
+    count = await run_db(Cart.objects.filter(user=current_user).count)
     return {"count": count}
 
 @router.get("/total")
 async def get_cart_total(current_user: User = Depends(get_current_user)):
     """Get total price of items in cart"""
-    cart_items = Cart.objects.filter(user=current_user)
-    total = sum(item.get_total_price() for item in cart_items)
+    cart_items = Cart.objects.filter(user=current_user).select_related('product')
+    total = sum(item.get_total_price() for item in await run_db(list, cart_items))
     return {"total": total}
@@ -1,26 +1,40 @@
 """
 Categories API endpoints
 """
-from fastapi import APIRouter, HTTPException, status, Depends
-from api.models import CategoryResponse, CategoryCreate, ProductResponse
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
+from api.models import CategoryResponse, CategoryCreate, ProductFields
 from api.auth_utils import get_current_user
+from api.db_executor import run_db
+from api.serializers import FastJSONResponse, FieldSet, aproduct_dicts, product_fields
+from api.conditional import cache_headers, is_not_modified, make_etag, not_modified_response
+from store.catalog import get_catalog_version
 from store.models import Category, Product
 from django.contrib.auth.models import User
-from typing import List
+from typing import List, Optional
+from django.db.models import Count, Max
 
 router = APIRouter()
 
 @router.get("/", response_model=List[CategoryResponse])
-async def get_categories():
+async def get_categories(request: Request, response: Response):
     """Get all categories"""
-    categories = Category.objects.all()
-    return [CategoryResponse.from_orm(category) for category in categories]
+    # Category writes bump the catalog version, so it validates the whole list; the count
+    # and highest id also catch rows added or removed without signals (bulk writes, raw SQL)
+    shape = await run_db(Category.objects.aggregate, n=Count('id'), last=Max('id'))
+    headers = cache_headers(
+        etag=make_etag("categories", shape["n"], shape["last"], await run_db(get_catalog_version)),
+        surrogate_keys=["categories"],
+    )
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
+    response.headers.update(headers)
+    return [CategoryResponse.from_orm(category) for category in await run_db(list, Category.objects.all())]
 
 @router.get("/{category_slug}", response_model=CategoryResponse)
 async def get_category(category_slug: str):
     """Get a specific category by slug"""
     try:
-        category = Category.objects.get(slug=category_slug)
+        category = await run_db(Category.objects.get, slug=category_slug)
         return CategoryResponse.from_orm(category)
     except Category.DoesNotExist:
         raise HTTPException(
@@ -28,31 +42,22 @@ async def get_category(category_slug: str):
             detail="Category not found"
         )
 
-@router.get("/{category_slug}/products", response_model=List[ProductResponse])
+@router.get("/{category_slug}/products", response_model=List[ProductFields])
 async def get_category_products(
     category_slug: str,
     limit: int = 20,
-    featured_only: bool = False
+    featured_only: bool = False,
+    fields: Optional[FieldSet] = Depends(product_fields)
 ):
     """Get products in a specific category"""
     try:
-        category = Category.objects.get(slug=category_slug)
+        category = await run_db(Category.objects.get, slug=category_slug)
         queryset = Product.objects.filter(category=category, in_stock=True)
         
         if featured_only:
             queryset = queryset.filter(featured=True)
         
-        products = queryset[:limit]
-        
-        result = []
-        for product in products:
-            product_data = ProductResponse.from_orm(product)
-            product_data.discount_percentage = product.get_discount_percentage()
-            if product.image:
-                product_data.image = product.image.url
-            result.append(product_data)
-        
-        return result
+        return FastJSONResponse(await aproduct_dicts(queryset[:limit], fields))
         
     except Category.DoesNotExist:
         raise HTTPException(
@@ -75,13 +80,13 @@ async def create_category(
     
     try:
         # Check if slug already exists
-        if Category.objects.filter(slug=category_data.slug).exists():
+        if await Category.objects.filter(slug=category_data.slug).aexists():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Category with this slug already exists"
             )
         
-        category = Category.objects.create(
+        category = await Category.objects.acreate(
             name=category_data.name,
             slug=category_data.slug,
             description=category_data.description,
@@ -111,14 +116,14 @@ async def update_category(
         )
     
     try:
-        category = Category.objects.get(slug=category_slug)
+        category = await Category.objects.aget(slug=category_slug)
         
         # Update fields
         category.name = category_data.name
         category.slug = category_data.slug
         category.description = category_data.description
         category.icon = category_data.icon
-        category.save()
+        await category.asave()
         
         return CategoryResponse.from_orm(category)
         
@@ -147,16 +152,16 @@ async def delete_category(
         )
     
     try:
-        category = Category.objects.get(slug=category_slug)
+        category = await Category.objects.aget(slug=category_slug)
         
         # Check if category has products
-        if Product.objects.filter(category=category).exists():
+        if await Product.objects.filter(category=category).aexists():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cannot delete category with existing products"
             )
         
-        category.delete()
+        await category.adelete()
         
         return {"message": "Category deleted successfully"}
         
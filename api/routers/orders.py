@@ -9,7 +9,7 @@ from django.contrib.auth.models import User
 from django.db import transaction
 from typing import List
 import uuid
-from asgiref.sync import sync_to_async
+from api.db_executor import run_db
 
 router = APIRouter()
 
@@ -19,7 +19,7 @@ async def get_user_orders(current_user: User = Depends(get_current_user)):
     def fetch_orders_sync() -> List[Order]:
         return list(Order.objects.filter(user=current_user).prefetch_related('items__product'))
 
-    orders = await sync_to_async(fetch_orders_sync)()
+    orders = await run_db(fetch_orders_sync)
 
     result: List[OrderResponse] = []
     for order in orders:
@@ -41,7 +41,7 @@ async def get_order(
                 id=order_id, user=current_user
             )
 
-        order = await sync_to_async(get_order_sync)()
+        order = await run_db(get_order_sync)
 
         order_data = OrderResponse.from_orm(order)
         order_data.items = [OrderItemResponse.from_orm(item) for item in order.items.all()]
@@ -95,9 +95,10 @@ async def create_order(
                 )
 
                 cart_items.delete()
-                return order
+            # Load the items here; the response is built on the event loop
+            return Order.objects.prefetch_related('items__product').get(id=order.id)
 
-        order = await sync_to_async(create_order_sync)()
+        order = await run_db(create_order_sync)
 
         order_resp = OrderResponse.from_orm(order)
         order_resp.items = [OrderItemResponse.from_orm(item) for item in order.items.all()]
@@ -133,9 +134,9 @@ async def update_order_status(
     
     try:
         async def update_status_async():
-            order = await sync_to_async(Order.objects.get)(id=order_id)
+            order = await run_db(Order.objects.get, id=order_id)
             order.status = status
-            await sync_to_async(order.save)()
+            await run_db(order.save)
         
         await update_status_async()
 
@@ -168,9 +169,9 @@ async def update_tracking_number(
     
     try:
         async def update_tracking_async():
-            order = await sync_to_async(Order.objects.get)(id=order_id)
+            order = await run_db(Order.objects.get, id=order_id)
             order.tracking_number = tracking_number
-            await sync_to_async(order.save)()
+            await run_db(order.save)
 
         await update_tracking_async()
 
@@ -195,8 +196,8 @@ async def get_order_payment(
     """Get payment information for an order"""
     try:
         async def get_payment_async():
-            order = await sync_to_async(Order.objects.get)(id=order_id, user=current_user)
-            payment = await sync_to_async(Payment.objects.get)(order=order)
+            order = await run_db(Order.objects.get, id=order_id, user=current_user)
+            payment = await run_db(Payment.objects.get, order=order)
             return payment
 
         payment = await get_payment_async()
@@ -238,12 +239,12 @@ async def update_payment_status(
     
     try:
         async def update_payment_async():
-            order = await sync_to_async(Order.objects.get)(id=order_id)
-            payment = await sync_to_async(Payment.objects.get)(order=order)
+            order = await run_db(Order.objects.get, id=order_id)
+            payment = await run_db(Payment.objects.get, order=order)
             payment.payment_status = payment_status
             if transaction_id:
                 payment.transaction_id = transaction_id
-            await sync_to_async(payment.save)()
+            await run_db(payment.save)
 
         await update_payment_async()
 
@@ -1,19 +1,52 @@
 """
 Products API endpoints
 """
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from django.core.paginator import Paginator
-from django.db.models import Q
+from fastapi import APIRouter, HTTPException, status, Depends, File, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from django.conf import settings
+from django.db.models import Count, Max
+from api.db_executor import run_db
 from typing import Optional, List
-from api.models import ProductResponse, ProductWithCategory, ProductCreate, ProductUpdate, PaginatedResponse
+from decimal import Decimal
+from datetime import datetime, timezone
+import math
+from urllib.parse import urlencode
+from api.models import (
+    ProductResponse, ProductFields, ProductBatchResponse, ProductChangesResponse, ProductCreate, ProductUpdate,
+    PaginatedResponse,
+)
 from api.auth_utils import get_current_user_optional, get_current_user
-from store.models import Product, Category
+from api.export import EXPORT_FORMATS, csv_chunks, ndjson_chunks
+from api.conditional import cache_headers, is_not_modified, make_etag, not_modified_response
+from store.catalog import get_catalog_version
+from store.models import Product, Category, DiscountPercentage
+from store.facets import get_facet_index
+from store.importer import IMPORT_FORMATS, guess_format, import_products
+from api.serializers import (
+    DETAIL_FIELDS, FULL_FIELDS, FastJSONResponse, FieldSet, aproduct_dicts, aproduct_dicts_batch, aproduct_dicts_in_order,
+    product_dict,
+    product_fields, product_row_dict,
+)
+from store.pagination import KEYSET_ORDERING, PRODUCT_ORDERINGS, seek, split_page
+from store.search import cached_search, get_search_index
+from store.sync import SyncToken, SyncTokenExpired, changes_since
+from store.vectors import get_vector_index
 from django.contrib.auth.models import User
 
 router = APIRouter()
 
+def _page_url(request: Request, **changes: object) -> str:
+    """This request's URL with ``changes`` applied to its query string; None drops a parameter.
+
+    Filters, ordering and ``fields`` carry over to the next and previous pages.
+    """
+    params = [(key, value) for key, value in request.query_params.multi_items() if key not in changes]
+    params += [(key, str(value)) for key, value in changes.items() if value is not None]
+    return f"{request.url.path}?{urlencode(params)}"
+
 @router.get("/", response_model=PaginatedResponse)
 async def get_products(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     category: Optional[str] = None,
@@ -21,62 +54,319 @@ async def get_products(
     featured: Optional[bool] = None,
     best_selling: Optional[bool] = None,
     in_stock: Optional[bool] = None,
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    min_discount: Optional[int] = Query(None, ge=0, le=100),
+    ordering: str = Query("-created_at", pattern="^(" + "|".join(PRODUCT_ORDERINGS) + ")$"),
+    facets: bool = True,
+    cursor: Optional[str] = None,
+    count_mode: Optional[str] = Query(None, pattern="^(exact|estimate|none)$"),
+    fields: Optional[FieldSet] = Depends(product_fields),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    """Get all products with filtering and pagination"""
-    queryset = Product.objects.select_related('category').all()
+    """Get all products with filtering and pagination
+    
+    Pass ``cursor`` (empty for the first page, then each response's
+    ``next_cursor``) for keyset pagination ordered by (created_at, id): every
+    page costs the same however deep it is. ``count_mode`` picks an exact
+    COUNT, an estimate from the in-memory facet bitmaps, or no count; it
+    defaults to exact for page numbers and estimate for cursors. ``fields``
+    limits the loaded columns and returned keys (e.g. ``fields=card``).
+    ``min_price``, ``max_price``, ``min_discount`` and ``ordering`` run in
+    SQL against the (category, price) and discount expression indexes.
+    """
+    queryset = Product.objects.all()
+    count_mode = count_mode or ('exact' if cursor is None else 'estimate')
+    count_is_estimate = False
+    next_cursor = None
+    
+    if search and cursor is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor pagination is not available for search results; use page"
+        )
     
-    # Apply filters
-    if category:
-        queryset = queryset.filter(category__slug=category)
+    # Price range and discount are not facet dimensions and search results are ranked
+    sql_filters = min_price is not None or max_price is not None or min_discount is not None
+    if search and (sql_filters or ordering != "-created_at"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_price, max_price, min_discount and ordering are not available for search results"
+        )
+    if cursor is not None and PRODUCT_ORDERINGS[ordering] != KEYSET_ORDERING:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor pagination only supports ordering=-created_at"
+        )
     
     if search:
-        queryset = queryset.filter(
-            Q(name__icontains=search) | Q(description__icontains=search)
+        # Ranked ids from the (cached) search backend; filters are applied inside it
+        category_id = None
+        if category:
+            category_id = await run_db(Category.objects.filter(slug=category).values_list('id', flat=True).first) or 0
+        result = await run_db(
+            cached_search,
+            search,
+            page=page,
+            page_size=page_size,
+            facets=facets,
+            in_stock=in_stock,
+            featured=featured,
+            best_selling=best_selling,
+            category_id=category_id,
         )
+        products = await aproduct_dicts_in_order(result.ids, fields)
+        count, has_next, has_previous = result.count, result.has_next, result.has_previous
+        # Out-of-range pages were clamped: link from the page actually returned
+        page = result.page
+        facet_counts = result.facets
+    else:
+        # Apply filters
+        if category:
+            queryset = queryset.filter(category__slug=category)
+        
+        if featured is not None:
+            queryset = queryset.filter(featured=featured)
+        
+        if best_selling is not None:
+            queryset = queryset.filter(best_selling=best_selling)
+        
+        if in_stock is not None:
+            queryset = queryset.filter(in_stock=in_stock)
+        
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+        
+        # alias() keeps the expression out of the SELECT, so WHERE and ORDER BY repeat
+        # it verbatim and SQLite can match the expression index
+        queryset = queryset.alias(discount=DiscountPercentage())
+        if min_discount is not None:
+            queryset = queryset.filter(discount__gte=min_discount)
+        
+        queryset = queryset.order_by(*PRODUCT_ORDERINGS[ordering])
+        
+        facet_counts = None
+        estimate = None
+        if facets or count_mode == 'estimate':
+            facet_index = await run_db(get_facet_index)
+            if sql_filters:
+                # Price range and discount are not bitmap dimensions: count the facets
+                # with one GROUP BY rather than loading every matching id
+                sql_counts = await run_db(facet_index.counts_for, queryset)
+                estimate = sql_counts["total"]
+                facet_counts = sql_counts if facets else None
+            else:
+                # Listing filters are facet dimensions, so the result set is a bitmap AND
+                result_bitmap = facet_index.bitmap(
+                    category_id=(facet_index.category_id(category) or 0) if category else None,
+                    featured=featured,
+                    best_selling=best_selling,
+                    in_stock=in_stock,
+                )
+                estimate = result_bitmap.bit_count()
+                facet_counts = facet_index.counts(result_bitmap) if facets else None
+        
+        if count_mode == 'exact':
+            # The GROUP BY already counted the result set
+            count = estimate if sql_filters and estimate is not None else await run_db(queryset.count)
+        elif count_mode == 'estimate':
+            # Exact as of the index's last refresh, without a COUNT query
+            # (or exact outright when the GROUP BY above produced it)
+            count, count_is_estimate = estimate, not sql_filters
+        else:
+            count = None
+        
+        if cursor is not None:
+            try:
+                rows = seek(queryset, cursor, page_size)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid cursor"
+                )
+            # Split on raw rows: created_at is the cursor key even when not requested
+            row_fields = (fields or FULL_FIELDS).with_columns('created_at')
+            created_at = row_fields.columns.index('created_at')
+            rows = await run_db(list, rows.values_list(*row_fields.columns))
+            keyset = split_page(rows, page_size, key=lambda row: (row[created_at], row[0]))
+            products = [product_row_dict(row, row_fields) for row in keyset.items]
+            next_cursor = keyset.next_cursor
+            has_next, has_previous = keyset.has_next, False
+        else:
+            if count is None:
+                # No count to clamp against; one extra row tells whether a next page exists
+                offset = (page - 1) * page_size
+                products = await aproduct_dicts(queryset[offset:offset + page_size + 1], fields)
+                has_next = len(products) > page_size
+                products = products[:page_size]
+            else:
+                # Out-of-range pages clamp to the last page, like Paginator.get_page
+                num_pages = max(1, math.ceil(count / page_size))
+                page = min(page, num_pages)
+                offset = (page - 1) * page_size
+                products = await aproduct_dicts(queryset[offset:offset + page_size], fields)
+                has_next = page < num_pages
+            has_previous = page > 1
     
-    if featured is not None:
-        queryset = queryset.filter(featured=featured)
+    if next_cursor:
+        next_url = _page_url(request, cursor=next_cursor, page=None)
+    else:
+        next_url = _page_url(request, page=page + 1, cursor=None) if has_next else None
     
-    if best_selling is not None:
-        queryset = queryset.filter(best_selling=best_selling)
+    # Rows are already in PaginatedResponse's shape; skip re-validating them
+    return FastJSONResponse({
+        "count": count,
+        "count_is_estimate": count_is_estimate,
+        "next": next_url,
+        "previous": _page_url(request, page=page - 1, cursor=None) if has_previous else None,
+        "next_cursor": next_cursor,
+        "results": products,
+        "facets": facet_counts,
+    })
+
+def _split_param(value: Optional[str]) -> List[str]:
+    return list(dict.fromkeys(part.strip() for part in (value or "").split(",") if part.strip()))
+
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    request: Request,
+    ids: Optional[str] = Query(None, description="Comma separated product ids"),
+    slugs: Optional[str] = Query(None, description="Comma separated product slugs"),
+    fields: Optional[FieldSet] = Depends(product_fields),
+):
+    """Get many products by id and/or slug in one request, in the order asked for"""
+    try:
+        id_list = [int(value) for value in _split_param(ids)]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be comma separated integers"
+        )
+    slug_list = _split_param(slugs)
+    if not id_list and not slug_list:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass ids and/or slugs"
+        )
+    max_items = getattr(settings, 'STORE_BATCH_MAX_ITEMS', 200)
+    if len(id_list) + len(slug_list) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {max_items} ids and slugs per request"
+        )
     
-    if in_stock is not None:
-        queryset = queryset.filter(in_stock=in_stock)
+    fields = fields or DETAIL_FIELDS
+    headers = cache_headers(
+        etag=make_etag("batch", id_list, slug_list, ",".join(fields.output), await run_db(get_catalog_version)),
+        surrogate_keys=["products"],
+    )
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
     
-    # Pagination
-    paginator = Paginator(queryset, page_size)
-    page_obj = paginator.get_page(page)
+    products, missing_ids, missing_slugs = await aproduct_dicts_batch(id_list, slug_list, fields)
+    return FastJSONResponse({
+        "results": products,
+        "missing_ids": missing_ids,
+        "missing_slugs": missing_slugs,
+    }, headers=headers)
+
+@router.get("/export")
+async def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    updated_since: Optional[datetime] = Query(None, description="Only products updated at or after this time"),
+    fields: Optional[FieldSet] = Depends(product_fields),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the whole catalog for feed consumers (admin only)"""
+    if not current_user.is_staff:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only staff members can export products"
+        )
     
-    # Convert to response format
-    products = []
-    for product in page_obj:
-        product_data = ProductResponse.from_orm(product)
-        product_data.discount_percentage = product.get_discount_percentage()
-        if product.image:
-            product_data.image = product.image.url
-        products.append(product_data.dict())
-    
-    return PaginatedResponse(
-        count=paginator.count,
-        next=f"/api/products/?page={page + 1}&page_size={page_size}" if page_obj.has_next() else None,
-        previous=f"/api/products/?page={page - 1}&page_size={page_size}" if page_obj.has_previous() else None,
-        results=products
+    fields = fields or FULL_FIELDS
+    if format == "csv" and fields.with_category:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV exports are flat; request category_id instead of category"
+        )
+    
+    # Taken before the first row is read; pass it back as updated_since for the next delta export
+    started_at = datetime.now(tz=timezone.utc)
+    queryset = Product.objects.all()
+    if updated_since:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    
+    chunk_size = getattr(settings, 'STORE_EXPORT_CHUNK_SIZE', 2000)
+    chunks = csv_chunks if format == "csv" else ndjson_chunks
+    return StreamingResponse(
+        chunks(queryset, fields, chunk_size),
+        media_type=EXPORT_FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="products.{format}"',
+            "X-Export-Started-At": started_at.isoformat(),
+        },
     )
 
-@router.get("/{product_slug}", response_model=ProductWithCategory)
-async def get_product(product_slug: str):
+@router.get("/changes", response_model=ProductChangesResponse)
+async def get_product_changes(
+    since: Optional[str] = Query(None, description="next_token from the previous call; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=1000, description="Most changed and most deleted products returned"),
+    fields: Optional[FieldSet] = Depends(product_fields),
+):
+    """Get products saved and deleted since a sync token, plus the token for the next call"""
+    try:
+        token = SyncToken.decode(since) if since else None
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    
+    row_fields = (fields or FULL_FIELDS).with_columns('updated_at')
+    try:
+        changes = await run_db(changes_since, token, limit, row_fields.columns)
+    except SyncTokenExpired as exc:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=str(exc)
+        )
+    return FastJSONResponse({
+        "changed": [product_row_dict(row, row_fields) for row in changes.rows],
+        "deleted": [
+            {"id": tombstone.product_id, "slug": tombstone.slug, "deleted_at": tombstone.deleted_at}
+            for tombstone in changes.tombstones
+        ],
+        "next_token": changes.next_token.encode(),
+        "has_more": changes.has_more,
+    })
+
+@router.get("/{product_slug}", response_model=ProductFields)
+async def get_product(product_slug: str, request: Request, fields: Optional[FieldSet] = Depends(product_fields)):
     """Get a specific product by slug"""
+    fields = fields or DETAIL_FIELDS
+    queryset = Product.objects.select_related('category') if fields.with_category else Product.objects.all()
     try:
-        product = Product.objects.select_related('category').get(slug=product_slug)
+        # updated_at and category_id feed the validators and surrogate keys
+        product = await run_db(queryset.only(*fields.columns, 'updated_at', 'category_id').get, slug=product_slug)
         
-        # Create response
-        product_data = ProductWithCategory.from_orm(product)
-        product_data.discount_percentage = product.get_discount_percentage()
-        if product.image:
-            product_data.image = product.image.url
+        etag_parts = [product.id, product.updated_at.isoformat(), ",".join(fields.output)]
+        if fields.with_category:
+            # The embedded category's edits do not touch product.updated_at
+            category = product.category
+            etag_parts += [category.slug, category.name, category.description, category.icon]
+        headers = cache_headers(
+            etag=make_etag(*etag_parts),
+            last_modified=product.updated_at,
+            surrogate_keys=[f"product-{product.id}", f"category-{product.category_id}"],
+        )
+        if is_not_modified(request, headers["ETag"], product.updated_at):
+            return not_modified_response(headers)
         
-        return product_data
+        return FastJSONResponse(product_dict(product, fields), headers=headers)
         
     except Product.DoesNotExist:
         raise HTTPException(
@@ -84,35 +374,62 @@ async def get_product(product_slug: str):
             detail="Product not found"
         )
 
-@router.get("/featured/list", response_model=List[ProductResponse])
-async def get_featured_products(limit: int = Query(10, ge=1, le=50)):
-    """Get featured products"""
-    products = Product.objects.filter(featured=True, in_stock=True)[:limit]
+@router.get("/{product_slug}/more-like-this", response_model=List[ProductFields])
+async def get_more_like_this(
+    product_slug: str,
+    limit: int = Query(8, ge=1, le=50),
+    fields: Optional[FieldSet] = Depends(product_fields),
+):
+    """Get in-stock products with the most similar name and description text"""
+    try:
+        product = await run_db(Product.objects.only('id').get, slug=product_slug)
+    except Product.DoesNotExist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
     
-    result = []
-    for product in products:
-        product_data = ProductResponse.from_orm(product)
-        product_data.discount_percentage = product.get_discount_percentage()
-        if product.image:
-            product_data.image = product.image.url
-        result.append(product_data)
+    def neighbours_sync():
+        # Index (re)builds hit the database, so they run off the event loop
+        allowed = get_search_index().filter_view(in_stock=True)
+        return get_vector_index().more_like_this(product.id, k=limit, allowed=allowed)
+    
+    neighbours = await run_db(neighbours_sync)
     
-    return result
+    return FastJSONResponse(await aproduct_dicts_in_order([pid for pid, _ in neighbours], fields))
+
+@router.get("/featured/list", response_model=List[ProductFields])
+async def get_featured_products(
+    request: Request,
+    limit: int = Query(10, ge=1, le=50),
+    fields: Optional[FieldSet] = Depends(product_fields),
+):
+    """Get featured products"""
+    featured = Product.objects.filter(featured=True, in_stock=True)
+    # The count catches deletes and unfeaturing, which max(updated_at) misses; the catalog
+    # version also covers writes that skip updated_at
+    shape = await run_db(featured.aggregate, latest=Max('updated_at'), n=Count('id'))
+    last_modified = shape['latest']
+    headers = cache_headers(
+        etag=make_etag(
+            "featured", limit, ",".join((fields or FULL_FIELDS).output), last_modified, shape['n'],
+            await run_db(get_catalog_version),
+        ),
+        last_modified=last_modified,
+        surrogate_keys=["products", "featured"],
+    )
+    if is_not_modified(request, headers["ETag"], last_modified):
+        return not_modified_response(headers)
+    return FastJSONResponse(await aproduct_dicts(featured[:limit], fields), headers=headers)
 
-@router.get("/bestselling/list", response_model=List[ProductResponse])
-async def get_best_selling_products(limit: int = Query(10, ge=1, le=50)):
+@router.get("/bestselling/list", response_model=List[ProductFields])
+async def get_best_selling_products(
+    limit: int = Query(10, ge=1, le=50),
+    fields: Optional[FieldSet] = Depends(product_fields),
+):
     """Get best selling products"""
     products = Product.objects.filter(best_selling=True, in_stock=True)[:limit]
-    
-    result = []
-    for product in products:
-        product_data = ProductResponse.from_orm(product)
-        product_data.discount_percentage = product.get_discount_percentage()
-        if product.image:
-            product_data.image = product.image.url
-        result.append(product_data)
-    
-    return result
+    return FastJSONResponse(await aproduct_dicts(products, fields))
 
 @router.post("/", response_model=ProductResponse)
 async def create_product(
@@ -129,10 +446,10 @@ async def create_product(
     
     try:
         # Verify category exists
-        category = Category.objects.get(id=product_data.category_id)
+        category = await Category.objects.aget(id=product_data.category_id)
         
         # Create product
-        product = Product.objects.create(
+        product = await Product.objects.acreate(
             name=product_data.name,
             slug=product_data.slug,
             category=category,
@@ -162,6 +479,33 @@ async def create_product(
             detail=f"Error creating product: {str(e)}"
         )
 
+@router.post("/import")
+async def import_products_file(
+    file: UploadFile = File(..., description="CSV with a header row, or JSONL"),
+    format: Optional[str] = Query(None, pattern="^(" + "|".join(IMPORT_FORMATS) + ")$",
+                                  description="Defaults to the file extension"),
+    current_user: User = Depends(get_current_user)
+):
+    """Upsert products from a CSV or JSONL upload in batches (admin only)"""
+    if not current_user.is_staff:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only staff members can import products"
+        )
+    
+    format = format or guess_format(file.filename)
+    if format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot tell the format from the file name; pass format=csv or format=jsonl"
+        )
+    
+    # The upload is spooled to disk by Starlette and read as a stream, one batch at a time
+    result = await run_db(
+        import_products, file.file, format, batch_size=getattr(settings, 'STORE_IMPORT_BATCH_SIZE', 1000)
+    )
+    return result.as_dict()
+
 @router.put("/{product_slug}", response_model=ProductResponse)
 async def update_product(
     product_slug: str,
@@ -177,14 +521,14 @@ async def update_product(
         )
     
     try:
-        product = Product.objects.get(slug=product_slug)
+        product = await Product.objects.aget(slug=product_slug)
         
         # Update fields
         update_data = product_data.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(product, field, value)
         
-        product.save()
+        await product.asave()
         
         response = ProductResponse.from_orm(product)
         response.discount_percentage = product.get_discount_percentage()
@@ -218,8 +562,8 @@ async def delete_product(
         )
     
     try:
-        product = Product.objects.get(slug=product_slug)
-        product.delete()
+        product = await Product.objects.aget(slug=product_slug)
+        await product.adelete()
         
         return {"message": "Product deleted successfully"}
         
@@ -0,0 +1,44 @@
+"""
+Search API endpoints
+"""
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from api.db_executor import run_db
+from typing import List
+from api.models import ProductResponse, SuggestionResponse
+from api.auth_utils import get_current_user
+from api.serializers import FastJSONResponse, aproduct_dicts_in_order
+from store.search import get_search_index, search_cache_stats
+from store.vectors import get_vector_index
+from store.suggest import get_suggester
+from django.contrib.auth.models import User
+
+router = APIRouter()
+
+@router.get("/suggest", response_model=List[SuggestionResponse])
+async def suggest(q: str = Query("", max_length=100), limit: int = Query(8, ge=1, le=20)):
+    """Typeahead suggestions for product and category names"""
+    def suggest_sync():
+        # Rebuilds hit the database and re-ranking a short prefix scans under the index lock
+        return get_suggester().suggest(q, limit=limit)
+
+    return [item.as_dict() for item in await run_db(suggest_sync)]
+
+@router.get("/semantic", response_model=List[ProductResponse])
+async def semantic_search(q: str = Query(..., min_length=1, max_length=500), limit: int = Query(10, ge=1, le=50)):
+    """Free-text search ranked by TF-IDF cosine similarity to product text"""
+    def search_sync():
+        allowed = get_search_index().filter_view(in_stock=True)
+        return get_vector_index().query(q, k=limit, allowed=allowed)
+
+    neighbours = await run_db(search_sync)
+    return FastJSONResponse(await aproduct_dicts_in_order([pid for pid, _ in neighbours]))
+
+@router.get("/cache-stats")
+async def get_search_cache_stats(current_user: User = Depends(get_current_user)):
+    """Search result cache hit/miss counters for this process (admin only)"""
+    if not current_user.is_staff:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only staff members can view cache statistics"
+        )
+    return await run_db(search_cache_stats.as_dict)
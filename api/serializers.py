@@ -0,0 +1,243 @@
+"""
+Fast product serialization: values() rows to response dicts, encoded with orjson
+"""
+import functools
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import Q, QuerySet
+from django.utils.encoding import filepath_to_uri
+from fastapi import HTTPException, Query, status
+from fastapi.responses import JSONResponse
+
+from api.db_executor import run_db
+from store.images import image_variants
+from store.models import Category, Product, discount_percentage
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+# Columns behind ProductResponse, in values_list() order
+PRODUCT_FIELDS: Tuple[str, ...] = (
+    "id", "name", "slug", "category_id", "description", "price", "original_price", "image",
+    "in_stock", "featured", "best_selling", "created_at", "updated_at",
+)
+CATEGORY_FIELDS: Tuple[str, ...] = ("id", "name", "slug", "description", "icon", "created_at")
+# Keys a client may request with ?fields=; discount_percentage and image_variants are derived,
+# category is nested
+OUTPUT_FIELDS: Tuple[str, ...] = PRODUCT_FIELDS + ("discount_percentage", "image_variants", "category")
+FIELD_PROFILES: Dict[str, Tuple[str, ...]] = {
+    "card": (
+        "id", "name", "slug", "price", "original_price", "discount_percentage", "image", "image_variants",
+        "in_stock",
+    ),
+    "full": PRODUCT_FIELDS + ("discount_percentage", "image_variants"),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _media_prefix() -> str:
+    # FileSystemStorage.url is a join onto base_url; precompute it instead of calling it per row
+    storage = getattr(default_storage, "_wrapped", default_storage)
+    if isinstance(storage, FileSystemStorage) and storage.base_url:
+        return storage.base_url
+    return ""
+
+
+def image_url(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    prefix = _media_prefix()
+    if prefix:
+        return prefix + filepath_to_uri(name).lstrip("/")
+    return default_storage.url(name)
+
+
+@dataclass(frozen=True)
+class FieldSet:
+    """Which product columns to load and which keys to return.
+
+    ``columns`` always include id and anything a derived key needs (both
+    prices for discount_percentage); ``output`` is what the client asked
+    for. A nested ``category`` loads the category columns through the join.
+    """
+
+    columns: Tuple[str, ...]
+    output: Tuple[str, ...]
+
+    @property
+    def with_category(self) -> bool:
+        return "category" in self.output
+
+    def with_columns(self, *columns: str) -> "FieldSet":
+        """Same output, also loading ``columns`` (e.g. a pagination key)."""
+        return FieldSet(self.columns + tuple(c for c in columns if c not in self.columns), self.output)
+
+    def project(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if len(data) == len(self.output):
+            return data
+        return {key: data[key] for key in self.output}
+
+
+def fieldset(names: Iterable[str]) -> FieldSet:
+    """FieldSet for ``names`` (field names and/or profile names); raises ValueError on unknown names."""
+    output: List[str] = []
+    for name in names:
+        expanded = FIELD_PROFILES.get(name, (name,))
+        for field in expanded:
+            if field not in OUTPUT_FIELDS:
+                raise ValueError(f"Unknown field: {field}")
+            if field not in output:
+                output.append(field)
+    if not output:
+        raise ValueError("No fields requested")
+    columns = ["id"]
+    for field in output:
+        if field == "discount_percentage":
+            needed = ("price", "original_price")
+        elif field == "image_variants":
+            needed = ("image_digest",)
+        elif field == "category":
+            needed = tuple(f"category__{name}" for name in CATEGORY_FIELDS)
+        else:
+            needed = (field,)
+        columns.extend(column for column in needed if column not in columns)
+    return FieldSet(tuple(columns), tuple(output))
+
+
+FULL_FIELDS = fieldset(FIELD_PROFILES["full"])
+# Product detail embeds the category unless ?fields= says otherwise
+DETAIL_FIELDS = fieldset(FIELD_PROFILES["full"] + ("category",))
+
+
+def _column_value(product: Product, column: str) -> Any:
+    if column == "image":
+        return product.image.name
+    value: Any = product
+    for part in column.split("__"):
+        value = getattr(value, part)
+    return value
+
+
+def product_row_dict(row: Sequence[Any], fields: Optional[FieldSet] = None) -> Dict[str, Any]:
+    """Response dict for one values_list(*fields.columns) row, with the derived fields filled in."""
+    fields = fields or FULL_FIELDS
+    data = dict(zip(fields.columns, row))
+    if "image" in data:
+        data["image"] = image_url(data["image"])
+    if "image_digest" in data:
+        # Only ever loaded for image_variants, never output itself
+        data["image_variants"] = image_variants(data.pop("image_digest"))
+    if "price" in data and "original_price" in data:
+        data["discount_percentage"] = discount_percentage(data["price"], data["original_price"])
+    if fields.with_category:
+        data["category"] = {name: data.pop(f"category__{name}") for name in CATEGORY_FIELDS}
+    return fields.project(data)
+
+
+def product_dict(product: Product, fields: Optional[FieldSet] = None) -> Dict[str, Any]:
+    """Same shape as ``product_row_dict`` from an already loaded instance."""
+    fields = fields or FULL_FIELDS
+    return product_row_dict([_column_value(product, column) for column in fields.columns], fields)
+
+
+def category_dict(category: Category) -> Dict[str, Any]:
+    return {field: getattr(category, field) for field in CATEGORY_FIELDS}
+
+
+def product_dicts(queryset: QuerySet[Product], fields: Optional[FieldSet] = None) -> List[Dict[str, Any]]:
+    """Serialize ``queryset`` from plain tuples: no model instances, no pydantic validation."""
+    fields = fields or FULL_FIELDS
+    return [product_row_dict(row, fields) for row in queryset.values_list(*fields.columns)]
+
+
+async def aproduct_dicts(queryset: QuerySet[Product], fields: Optional[FieldSet] = None) -> List[Dict[str, Any]]:
+    """Async twin of ``product_dicts`` for the FastAPI routers, run on the DB executor."""
+    return await run_db(product_dicts, queryset, fields)
+
+
+async def aproduct_dicts_in_order(ids: List[int], fields: Optional[FieldSet] = None) -> List[Dict[str, Any]]:
+    """Rows for ``ids`` in the given order, skipping ids that no longer exist."""
+    if not ids:
+        return []
+    fields = fields or FULL_FIELDS
+    # Key on the loaded id column; it is in every FieldSet but maybe not in the output
+    rows = await run_db(list, Product.objects.filter(id__in=ids).values_list(*fields.columns))
+    found = {row[0]: product_row_dict(row, fields) for row in rows}
+    return [found[i] for i in ids if i in found]
+
+
+async def aproduct_dicts_batch(
+    ids: Sequence[int], slugs: Sequence[str], fields: Optional[FieldSet] = None
+) -> Tuple[List[Dict[str, Any]], List[int], List[str]]:
+    """Rows for ``ids`` then ``slugs``, in request order and from one query.
+
+    Returns ``(rows, missing_ids, missing_slugs)``; a product asked for by
+    both id and slug (or twice) appears once, at its first position.
+    """
+    fields = (fields or FULL_FIELDS).with_columns("slug")
+    slug_at = fields.columns.index("slug")
+    by_id: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+    by_slug: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    rows = await run_db(list, Product.objects.filter(Q(id__in=ids) | Q(slug__in=slugs)).values_list(*fields.columns))
+    for row in rows:
+        found = (row[0], product_row_dict(row, fields))
+        by_id[row[0]] = by_slug[row[slug_at]] = found
+    results: List[Dict[str, Any]] = []
+    seen = set()
+    for key, index in [(i, by_id) for i in ids] + [(s, by_slug) for s in slugs]:
+        if key in index and index[key][0] not in seen:
+            seen.add(index[key][0])
+            results.append(index[key][1])
+    return results, [i for i in ids if i not in by_id], [s for s in slugs if s not in by_slug]
+
+
+def product_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma separated product fields and/or profiles ("
+        + ", ".join(f"{name}: {','.join(profile)}" for name, profile in FIELD_PROFILES.items())
+        + "); default full",
+    ),
+) -> Optional[FieldSet]:
+    """Dependency parsing ``?fields=``; None when the client did not ask for a subset."""
+    if not fields:
+        return None
+    try:
+        return fieldset(name.strip() for name in fields.split(",") if name.strip())
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+def _default(value: Any) -> Any:
+    # Decimals stay strings, as pydantic emits them
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON with orjson (stdlib json if it is missing)."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with ``dumps``.
+
+    Returning one from an endpoint skips FastAPI's response_model pass, so
+    callers must hand it data already in the documented shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
@@ -0,0 +1,488 @@
+import asyncio
+import csv
+import io
+import json
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from api.auth_utils import get_current_user
+from api.db_executor import DBExecutor, db_executor
+from api.response_cache import PrecompressedCacheMiddleware
+from api.routers import cart, categories, products
+from api.models import ProductResponse
+from api.serializers import DETAIL_FIELDS, FIELD_PROFILES, FULL_FIELDS, dumps, product_dict
+from store import catalog
+from store.facets import facet_index
+from store.jobs import work
+from store.models import CatalogVersion, Category, ImageJob, Product
+from store.search import product_index
+from store.sync import SyncToken
+
+
+def api_client(response_cache=False):
+    app = FastAPI()
+    app.include_router(products.router, prefix="/api/products")
+    if response_cache:
+        app.add_middleware(PrecompressedCacheMiddleware)
+    return TestClient(app)
+
+
+def jpeg_bytes(size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 60, 30)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+# Transactional: the API runs its queries on other threads (and connections)
+class ProductImageJobApiTests(TransactionTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, STORE_IMAGE_JOBS_INLINE=False, STORE_SYNC_SAFETY_LAG=0,
+        )
+        self.settings_override.enable()
+        category = Category.objects.create(name="Tools", slug="tools")
+        self.product = Product.objects.create(
+            name="Cordless Drill", slug="cordless-drill", category=category, price=Decimal("89.99"),
+        )
+        self.client = api_client()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_processed_image_changes_etag_and_reaches_changes_feed(self):
+        self.product.image.save("drill.jpg", ContentFile(jpeg_bytes()))
+        self.assertEqual(ImageJob.objects.filter(status="pending").count(), 1)
+
+        before = self.client.get("/api/products/cordless-drill")
+        self.assertEqual(before.status_code, 200)
+        self.assertIsNone(before.json()["image_variants"])
+        token = self.client.get("/api/products/changes").json()["next_token"]
+
+        self.assertEqual(work(once=True), {"done": 1, "failed": 0})
+
+        after = self.client.get("/api/products/cordless-drill", headers={"If-None-Match": before.headers["etag"]})
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after.headers["etag"], before.headers["etag"])
+        self.assertIn("320.jpg", after.json()["image_variants"]["thumbnail"])
+
+        changes = self.client.get(f"/api/products/changes?since={token}").json()
+        self.assertEqual([row["slug"] for row in changes["changed"]], ["cordless-drill"])
+        self.assertIsNotNone(changes["changed"][0]["image_variants"])
+
+    def test_csv_export_spreads_image_variants_over_columns(self):
+        self.product.image.save("drill.jpg", ContentFile(jpeg_bytes()))
+        work(once=True)
+        Product.objects.create(name="Rake", slug="rake", category=self.product.category, price=Decimal("9.99"))
+        self.client.app.dependency_overrides[get_current_user] = lambda: mock.Mock(is_staff=True)
+
+        response = self.client.get("/api/products/export?format=csv&fields=slug,image_variants")
+        rows = list(csv.reader(io.StringIO(response.text)))
+        self.assertEqual(rows[0], ["slug", "image_thumbnail", "image_webp_srcset", "image_jpeg_srcset"])
+        self.assertEqual(rows[1][0], "cordless-drill")
+        self.assertTrue(rows[1][1].endswith("/320.jpg"))
+        self.assertIn("320.webp 320w", rows[1][2])
+        self.assertEqual(rows[2], ["rake", "", "", ""])
+
+
+class ProductListingFacetTests(TransactionTestCase):
+    def setUp(self):
+        tools = Category.objects.create(name="Tools", slug="tools")
+        garden = Category.objects.create(name="Garden", slug="garden")
+        for slug, category, price, fields in [
+            ("cordless-drill", tools, "89.99", {"featured": True}),
+            ("claw-hammer", tools, "19.50", {"in_stock": False}),
+            ("hose-reel", garden, "45.00", {"best_selling": True}),
+            ("ride-on-mower", garden, "1499.00", {}),
+        ]:
+            Product.objects.create(
+                name=slug.replace("-", " ").title(), slug=slug, category=category, price=Decimal(price), **fields,
+            )
+        # The process-wide index may hold rows of earlier tests' (flushed) tables
+        facet_index.built_at = 0.0
+        self.client = api_client()
+
+    def test_price_filter_facets_are_counted_in_sql(self):
+        body = self.client.get("/api/products/?min_price=20&max_price=100").json()
+        self.assertEqual(body["count"], 2)
+        self.assertEqual(sorted(row["slug"] for row in body["results"]), ["cordless-drill", "hose-reel"])
+        facets = body["facets"]
+        self.assertEqual(facets["total"], 2)
+        self.assertEqual([(f["value"], f["count"]) for f in facets["category"]], [("garden", 1), ("tools", 1)])
+        self.assertEqual(facets["price"], [{"value": "25-50", "count": 1}, {"value": "50-100", "count": 1}])
+        self.assertEqual(facets["featured"], {"true": 1, "false": 1})
+        self.assertEqual(facets["in_stock"], {"true": 2, "false": 0})
+
+    def test_facets_match_with_and_without_sql_filters(self):
+        # min_price=0 keeps every row but takes the GROUP BY path
+        bitmap = self.client.get("/api/products/?category=garden").json()["facets"]
+        grouped = self.client.get("/api/products/?category=garden&min_price=0").json()["facets"]
+        self.assertEqual(grouped, bitmap)
+
+    def test_listing_and_detail_reads_run_on_the_db_executor(self):
+        with mock.patch.object(db_executor, "run", wraps=db_executor.run) as run:
+            self.assertEqual(self.client.get("/api/products/hose-reel").status_code, 200)
+            self.assertEqual(self.client.get("/api/products/?cursor=&facets=false").status_code, 200)
+        # Detail get; cursor page facet index and rows
+        self.assertEqual(run.call_count, 3)
+
+
+class ProductFieldsTests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tools", slug="tools")
+        Product.objects.create(
+            name="Cordless Drill", slug="cordless-drill", category=category,
+            price=Decimal("80.00"), original_price=Decimal("100.00"),
+        )
+        facet_index.built_at = 0.0
+        self.client = api_client()
+
+    def test_card_profile_returns_exactly_its_keys(self):
+        row = self.client.get("/api/products/?fields=card&facets=false").json()["results"][0]
+        self.assertCountEqual(row, FIELD_PROFILES["card"])
+        self.assertEqual(row["discount_percentage"], 20)
+
+    def test_derived_and_nested_fields_load_what_they_need(self):
+        body = self.client.get("/api/products/cordless-drill?fields=discount_percentage,category").json()
+        self.assertEqual(body, {"discount_percentage": 20, "category": mock.ANY})
+        self.assertEqual(body["category"]["slug"], "tools")
+        self.assertCountEqual(self.client.get("/api/products/cordless-drill").json(), DETAIL_FIELDS.output)
+
+    def test_openapi_schema_allows_sparse_products(self):
+        schema = self.client.app.openapi()
+        self.assertNotIn("required", schema["components"]["schemas"]["ProductFields"])
+
+        def response_schema(path):
+            return schema["paths"][path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+
+        self.assertEqual(response_schema("/api/products/{product_slug}"), {"$ref": "#/components/schemas/ProductFields"})
+        results = schema["components"]["schemas"]["PaginatedResponse"]["properties"]["results"]
+        self.assertEqual(results["items"], {"$ref": "#/components/schemas/ProductFields"})
+
+    def test_row_serializer_matches_the_pydantic_model(self):
+        product = Product.objects.get()
+        fast = json.loads(dumps(product_dict(product, FULL_FIELDS)))
+        slow = ProductResponse.model_validate(product).model_dump(mode="json")
+        for key in ("created_at", "updated_at"):
+            self.assertEqual(datetime.fromisoformat(fast.pop(key)), datetime.fromisoformat(slow.pop(key)))
+        self.assertEqual(fast, slow)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get("/api/products/cordless-drill?fields=name,password")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "Unknown field: password")
+
+
+class ProductBatchTests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tools", slug="tools")
+        self.products = [
+            Product.objects.create(name=f"Tool {i}", slug=f"tool-{i}", category=category, price=Decimal("10.00"))
+            for i in range(3)
+        ]
+        catalog._forget()
+        self.client = api_client()
+
+    def test_results_follow_the_request_and_report_missing(self):
+        first, second, third = self.products
+        body = self.client.get(
+            f"/api/products/batch?ids={third.id},999999,{first.id}&slugs=tool-1,tool-2,gone&fields=slug"
+        ).json()
+        # tool-2 was already returned by id
+        self.assertEqual(body["results"], [{"slug": "tool-2"}, {"slug": "tool-0"}, {"slug": "tool-1"}])
+        self.assertEqual((body["missing_ids"], body["missing_slugs"]), ([999999], ["gone"]))
+
+    def test_etag_revalidates_until_the_catalog_changes(self):
+        url = f"/api/products/batch?ids={self.products[0].id}"
+        etag = self.client.get(url).headers["etag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+        self.products[0].save()
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 200)
+
+    @override_settings(STORE_BATCH_MAX_ITEMS=2)
+    def test_bad_requests_are_rejected(self):
+        for query in ("", "ids=1,x", "ids=1,2&slugs=tool-0"):
+            self.assertEqual(self.client.get(f"/api/products/batch?{query}").status_code, 400, query)
+
+
+@override_settings(STORE_EXPORT_CHUNK_SIZE=2)
+class ProductExportTests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tools", slug="tools")
+        for i in range(5):
+            Product.objects.create(name=f"Tool {i}", slug=f"tool-{i}", category=category, price=Decimal("10.00"))
+        self.client = api_client()
+        self.staff = mock.Mock(is_staff=True)
+        self.client.app.dependency_overrides[get_current_user] = lambda: self.staff
+
+    def test_ndjson_streams_every_row_once_across_chunks(self):
+        response = self.client.get("/api/products/export?fields=slug")
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(rows, [{"slug": f"tool-{i}"} for i in range(5)])
+
+        # The start time is the next delta export's updated_since
+        Product.objects.get(slug="tool-3").save()
+        since = response.headers["x-export-started-at"]
+        delta = self.client.get("/api/products/export", params={"updated_since": since, "fields": "slug"})
+        self.assertEqual(delta.text, '{"slug":"tool-3"}\n')
+
+    def test_staff_only_and_csv_must_be_flat(self):
+        self.assertEqual(self.client.get("/api/products/export?format=csv&fields=slug,category").status_code, 400)
+        self.staff.is_staff = False
+        self.assertEqual(self.client.get("/api/products/export").status_code, 403)
+
+
+class CartApiTests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tools", slug="tools")
+        self.product = Product.objects.create(
+            name="Cordless Drill", slug="cordless-drill", category=category, price=Decimal("50.00"),
+        )
+        user = User.objects.create_user("shopper", password="x")
+        app = FastAPI()
+        app.include_router(cart.router, prefix="/api/cart")
+        app.dependency_overrides[get_current_user] = lambda: user
+        self.client = TestClient(app)
+
+    def test_cart_reads_run_on_the_db_executor(self):
+        with mock.patch.object(db_executor, "run", wraps=db_executor.run) as run:
+            for _ in range(2):
+                added = self.client.post("/api/cart/add", json={"product_id": self.product.id, "quantity": 1})
+                self.assertEqual(added.status_code, 200)
+            self.assertEqual(added.json()["quantity"], 2)
+            updated = self.client.put(f"/api/cart/{added.json()['id']}", json={"quantity": 5})
+            self.assertEqual(updated.json()["total_price"], "250.00")
+        # Product and cart row per add, cart row for the update
+        self.assertEqual(run.call_count, 5)
+
+
+class DBExecutorTests(TransactionTestCase):
+    def setUp(self):
+        self.executor = DBExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_calls_run_in_parallel_up_to_the_pool_size(self):
+        # Neither call returns until both are running at once
+        barrier = threading.Barrier(2, timeout=5)
+
+        async def both():
+            return await asyncio.gather(*(self.executor.run(barrier.wait) for _ in range(2)))
+
+        self.assertEqual(sorted(asyncio.run(both())), [0, 1])
+        self.assertEqual(self.executor.stats()["completed"], 2)
+
+    def test_queries_run_on_workers_and_failures_are_counted(self):
+        Category.objects.create(name="Tools", slug="tools")
+
+        async def calls():
+            count = await self.executor.run(Category.objects.count)
+            with self.assertRaises(Category.DoesNotExist):
+                await self.executor.run(Category.objects.get, slug="garden")
+            return count
+
+        self.assertEqual(asyncio.run(calls()), 1)
+        stats = self.executor.stats()
+        self.assertEqual((stats["completed"], stats["failed"], stats["queue_depth"], stats["running"]), (2, 1, 0, 0))
+        self.assertEqual(stats["wait_ms"]["samples"], 2)
+
+
+@override_settings(STORE_SYNC_SAFETY_LAG=0)
+class ProductSyncApiTests(TransactionTestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Tools", slug="tools")
+        self.products = [
+            Product.objects.create(name=f"Tool {i}", slug=f"tool-{i}", category=self.category, price=Decimal("10.00"))
+            for i in range(5)
+        ]
+        facet_index.built_at = 0.0
+        self.client = api_client()
+
+    def test_cursor_pages_cover_the_listing_once(self):
+        slugs, cursor = [], ""
+        while cursor is not None:
+            body = self.client.get(f"/api/products/?cursor={cursor}&page_size=2&facets=false").json()
+            slugs += [row["slug"] for row in body["results"]]
+            cursor = body["next_cursor"]
+            if len(slugs) == 2:
+                # Newer rows land before the cursor and never shift later pages
+                Product.objects.create(name="Late", slug="late", category=self.category, price=Decimal("1.00"))
+        self.assertEqual(slugs, [p.slug for p in reversed(self.products)])
+
+        response = self.client.get("/api/products/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
+    def test_changes_feed_reports_saves_and_deletes_once(self):
+        first = self.client.get("/api/products/changes").json()
+        self.assertEqual(len(first["changed"]), 5)
+        self.assertEqual(first["deleted"], [])
+        token = first["next_token"]
+
+        renamed, deleted = self.products[0], self.products[1]
+        deleted_id = deleted.id
+        renamed.name = "Tool Zero"
+        renamed.save()
+        deleted.delete()
+
+        changes = self.client.get(f"/api/products/changes?since={token}").json()
+        self.assertEqual([row["name"] for row in changes["changed"]], ["Tool Zero"])
+        self.assertEqual([(row["id"], row["slug"]) for row in changes["deleted"]], [(deleted_id, "tool-1")])
+        self.assertFalse(changes["has_more"])
+
+        again = self.client.get(f"/api/products/changes?since={changes['next_token']}").json()
+        self.assertEqual((again["changed"], again["deleted"]), ([], []))
+
+    def test_changes_feed_pages_with_limit(self):
+        token, seen = None, []
+        while True:
+            url = "/api/products/changes?limit=2" + (f"&since={token}" if token else "")
+            body = self.client.get(url).json()
+            seen += [row["slug"] for row in body["changed"]]
+            token = body["next_token"]
+            if not body["has_more"]:
+                break
+        self.assertEqual(seen, [p.slug for p in self.products])
+
+    def test_expired_token_is_gone(self):
+        old = timezone.now() - timedelta(days=365)
+        response = self.client.get(f"/api/products/changes?since={SyncToken(old, 0, 0, old).encode()}")
+        self.assertEqual(response.status_code, 410)
+
+
+class ResponseCacheTests(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Tools", slug="tools")
+        for i in range(6):
+            Product.objects.create(
+                name=f"Tool {i}", slug=f"tool-{i}", category=category, price=Decimal("10.00"),
+                description="A sturdy tool for the workshop, with a two year warranty.",
+            )
+        facet_index.built_at = 0.0
+        self.client = api_client(response_cache=True)
+
+    def get(self, encoding, **headers):
+        return self.client.get("/api/products/", headers={"Accept-Encoding": encoding, **headers})
+
+    def test_encoding_is_negotiated_and_varies(self):
+        first = self.get("br, gzip")
+        self.assertEqual((first.headers["x-cache"], first.headers["content-encoding"]), ("MISS", "br"))
+        self.assertIn("Accept-Encoding", first.headers["vary"])
+
+        gzipped = self.get("gzip")
+        self.assertEqual((gzipped.headers["x-cache"], gzipped.headers["content-encoding"]), ("HIT", "gzip"))
+        plain = self.get("br;q=0, gzip;q=0")
+        self.assertNotIn("content-encoding", plain.headers)
+        self.assertEqual(int(plain.headers["content-length"]), len(plain.content))
+        # httpx decodes br and gzip: every variant is the same document
+        self.assertEqual(first.json(), gzipped.json())
+        self.assertEqual(first.json(), plain.json())
+
+    def test_if_none_match_gets_304(self):
+        etag = self.get("gzip").headers["etag"]
+        response = self.get("gzip", **{"If-None-Match": etag})
+        self.assertEqual((response.status_code, response.content), (304, b""))
+        self.assertEqual(response.headers["etag"], etag)
+
+    def test_catalog_write_invalidates(self):
+        first = self.get("gzip")
+        product = Product.objects.get(slug="tool-0")
+        product.name = "Renamed Tool"
+        product.save()
+        after = self.get("gzip", **{"If-None-Match": first.headers["etag"]})
+        self.assertEqual((after.status_code, after.headers["x-cache"]), (200, "MISS"))
+        self.assertIn("Renamed Tool", [row["name"] for row in after.json()["results"]])
+
+
+class CatalogEtagTests(TransactionTestCase):
+    """Writes by another process: rows change without this process' signals or version bump."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Tools", slug="tools")
+        self.product = Product.objects.create(
+            name="Cordless Drill", slug="cordless-drill", category=self.category, price=Decimal("89.99"), featured=True,
+        )
+        app = FastAPI()
+        app.include_router(products.router, prefix="/api/products")
+        app.include_router(categories.router, prefix="/api/categories")
+        self.client = TestClient(app)
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": first.headers["etag"]}).status_code, 304)
+        return first.headers["etag"]
+
+    def test_featured_etag_follows_rows(self):
+        etag = self.revalidate("/api/products/featured/list")
+        Product.objects.filter(pk=self.product.pk).update(name="Drill", updated_at=timezone.now())
+        self.assertEqual(self.client.get("/api/products/featured/list", headers={"If-None-Match": etag}).status_code, 200)
+
+        etag = self.revalidate("/api/products/featured/list")
+        Product.objects.filter(pk=self.product.pk).update(featured=False)
+        response = self.client.get("/api/products/featured/list", headers={"If-None-Match": etag})
+        self.assertEqual((response.status_code, response.json()), (200, []))
+
+    def test_categories_etag_follows_rows(self):
+        etag = self.revalidate("/api/categories/")
+        Category.objects.bulk_create([Category(name="Garden", slug="garden")])
+        self.assertEqual(self.client.get("/api/categories/", headers={"If-None-Match": etag}).status_code, 200)
+
+    def test_other_process_bump_reaches_etags(self):
+        etag = self.revalidate("/api/categories/")
+        Category.objects.filter(pk=self.category.pk).update(name="Hand Tools")
+        CatalogVersion.objects.update(version=F("version") + 1)
+        with mock.patch.object(catalog, "VERSION_TTL", 0):
+            response = self.client.get("/api/categories/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["name"], "Hand Tools")
+
+
+class ProductListingLinkTests(TransactionTestCase):
+    def setUp(self):
+        tools = Category.objects.create(name="Tools", slug="tools")
+        garden = Category.objects.create(name="Garden", slug="garden")
+        for i in range(6):
+            Product.objects.create(
+                name=f"Tool {i}", slug=f"tool-{i}", category=tools if i % 2 else garden,
+                price=Decimal(10 + i), featured=i < 4,
+            )
+        facet_index.built_at = product_index.built_at = 0.0
+        self.client = api_client()
+
+    def follow(self, url):
+        slugs = []
+        while url:
+            body = self.client.get(url).json()
+            slugs += [row["slug"] for row in body["results"]]
+            url = body["next"]
+        return slugs
+
+    def test_cursor_links_keep_filters_and_fields(self):
+        slugs = self.follow("/api/products/?featured=true&cursor=&page_size=1&fields=card&facets=false")
+        self.assertEqual(slugs, ["tool-3", "tool-2", "tool-1", "tool-0"])
+
+    def test_page_links_keep_filters(self):
+        body = self.client.get("/api/products/?category=tools&min_price=12&page_size=1&page=2").json()
+        self.assertIsNone(body["next"])
+        self.assertEqual(body["previous"], "/api/products/?category=tools&min_price=12&page_size=1&page=1")
+        self.assertEqual(self.follow("/api/products/?category=tools&min_price=12&page_size=1"), ["tool-5", "tool-3"])
+
+    def test_search_links_start_from_the_clamped_page(self):
+        body = self.client.get("/api/products/?search=tool&page=999&page_size=2").json()
+        self.assertEqual(len(body["results"]), 2)
+        self.assertIsNone(body["next"])
+        self.assertEqual(body["previous"], "/api/products/?search=tool&page_size=2&page=2")
+        self.assertEqual(len(self.client.get(body["previous"]).json()["results"]), 2)
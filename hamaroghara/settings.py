@@ -80,6 +80,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep each API executor thread's connection between calls
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
@@ -134,4 +136,73 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Login URLs
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/'
+
+# Store tuning
+# Clustering backend used when subcategories are trained on demand inside a web
+# process ("numpy", "sklearn" or "single"); train_subcategories defaults to sklearn.
+STORE_SUBCATEGORY_BACKEND = os.environ.get('STORE_SUBCATEGORY_BACKEND', 'numpy')
+
+# Product search backend: "index" (in-process BM25 inverted index), "fts" (SQLite FTS5
+# table from migration 0003) or "db" (icontains scan)
+STORE_SEARCH_BACKEND = os.environ.get('STORE_SEARCH_BACKEND', 'index')
+# Seconds before the in-process search index is rebuilt to pick up writes from other processes
+STORE_SEARCH_INDEX_MAX_AGE = 300
+# Seconds before the autocomplete prefix index is rebuilt (refreshes popularity weights)
+STORE_SUGGEST_MAX_AGE = 600
+# Lower edges of the price facet buckets; the last bucket is open-ended
+STORE_PRICE_BUCKETS = (0, 25, 50, 100, 200, 500)
+# Seconds a process may reuse the catalog version (a DB row) before re-reading it, and so
+# how long another process' catalog write can go unseen by its caches and ETags
+STORE_CATALOG_VERSION_TTL = 1.0
+# Seconds a cached page of search result ids lives (entries also expire on any catalog write)
+STORE_SEARCH_CACHE_TIMEOUT = 300
+# Fall back to typo-tolerant trigram matching when a search finds nothing
+STORE_SEARCH_FUZZY_FALLBACK = True
+# Seconds before the in-process more-like-this vector index reloads persisted vectors
+STORE_VECTOR_INDEX_MAX_AGE = 600
+# Products per page on the category and search result pages
+STORE_PAGE_SIZE = 24
+# Category page from which "More" continues with keyset cursors instead of page numbers
+STORE_KEYSET_FROM_PAGE = 5
+# Threads (and so at most this many DB connections) the API uses for blocking ORM calls
+STORE_DB_EXECUTOR_WORKERS = int(os.environ.get('STORE_DB_EXECUTOR_WORKERS', 8))
+# Seconds browsers and CDNs may reuse public catalog API responses before revalidating
+STORE_API_CACHE_MAX_AGE = 60
+# Most ids plus slugs one GET /api/products/batch request may ask for
+STORE_BATCH_MAX_ITEMS = 200
+# Rows per database fetch and per streamed chunk in GET /api/products/export
+STORE_EXPORT_CHUNK_SIZE = 2000
+# Seconds a product save or delete must age before the changes feed hands it out, so a
+# transaction that commits late is not skipped by a watermark already past it
+STORE_SYNC_SAFETY_LAG = 5
+# Days tombstones are kept (prune_tombstones); older sync tokens must start a full sync
+STORE_SYNC_TOMBSTONE_RETENTION_DAYS = 30
+# Seconds a precompressed public API response is served from cache (0 disables); entries
+# also expire on any catalog write
+STORE_RESPONSE_CACHE_TIMEOUT = 300
+# Path regexes whose GET responses are the same for every caller and may be cached
+STORE_RESPONSE_CACHE_PATHS = (
+    r'^/api/products/$',
+    r'^/api/products/(featured|bestselling)/list$',
+    r'^/api/categories/$',
+    r'^/api/categories/[-\w]+/products$',
+)
+# Products per INSERT ... ON CONFLICT statement in import_products and POST /api/products/import
+STORE_IMPORT_BATCH_SIZE = 1000
+# Widths (px) of the WebP and JPEG copies made of every product image and profile picture,
+# offered to browsers as srcset candidates
+STORE_IMAGE_WIDTHS = (160, 320, 640, 1024)
+# The single-URL fallback derivative (one of STORE_IMAGE_WIDTHS), sized for a product card
+STORE_IMAGE_THUMBNAIL_WIDTH = 320
+# Directory under MEDIA_ROOT holding derivatives, named by the SHA-256 of the original
+STORE_IMAGE_DERIVATIVES_DIR = 'derivatives'
+# Resize uploads in the request instead of queueing them for image_worker (development
+# without a worker running)
+STORE_IMAGE_JOBS_INLINE = False
+# Worker processes image_worker starts by default
+STORE_IMAGE_WORKERS = 2
+# Tries per image job before it is left as failed
+STORE_IMAGE_JOB_MAX_ATTEMPTS = 3
+# Seconds a running image job may take before it is presumed lost and requeued
+STORE_IMAGE_JOB_LEASE = 300
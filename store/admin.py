@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, Cart, Wishlist, Order, OrderItem, Payment
+from .models import Category, ImageJob, Product, Cart, Wishlist, Order, OrderItem, Payment
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -44,4 +44,10 @@ class OrderAdmin(admin.ModelAdmin):
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['order', 'payment_method', 'amount', 'payment_status', 'transaction_id', 'created_at']
     list_filter = ['payment_method', 'payment_status', 'created_at']
-    search_fields = ['order__id', 'transaction_id']
\ No newline at end of file
+    search_fields = ['order__id', 'transaction_id']
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'object_id', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['kind', 'object_id', 'attempts', 'locked_at', 'error', 'created_at']
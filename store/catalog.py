@@ -0,0 +1,72 @@
+"""The catalog version: anything derived from products and categories keys on it.
+
+It lives in one database row (``CatalogVersion``), so a write in any
+process (another web or API worker, the admin, ``image_worker``) moves it
+for all of them. Each process re-reads it at most every
+``STORE_CATALOG_VERSION_TTL`` seconds and right after its own bumps
+commit, which bounds how long another process' write can go unseen.
+"""
+from __future__ import annotations
+
+import time
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import CatalogVersion
+
+# Seconds this process may reuse the version it last read
+VERSION_TTL: float = getattr(settings, "STORE_CATALOG_VERSION_TTL", 1.0)
+
+# (version, time.monotonic() when read)
+_memo: Optional[Tuple[int, float]] = None
+
+
+def _forget() -> None:
+    global _memo
+    _memo = None
+
+
+def _clock() -> int:
+    return int(time.time() * 1_000_000)
+
+
+def _seed() -> int:
+    """Create the row if it is missing (new or flushed database) and return its version."""
+    try:
+        with transaction.atomic():
+            return CatalogVersion.objects.get_or_create(pk=1, defaults={"version": _clock()})[0].version
+    except IntegrityError:
+        # Another process created it meanwhile
+        return CatalogVersion.objects.get(pk=1).version
+
+
+def get_catalog_version() -> int:
+    """Current catalog version (one indexed single-row read, memoized for ``VERSION_TTL``)."""
+    global _memo
+    memo = _memo
+    if memo is not None and time.monotonic() - memo[1] < VERSION_TTL:
+        return memo[0]
+    version = CatalogVersion.objects.filter(pk=1).values_list("version", flat=True).first()
+    if version is None:
+        version = _seed()
+    _memo = (version, time.monotonic())
+    return version
+
+
+def bump_catalog_version() -> None:
+    """Invalidate every catalog-derived cache entry (called on product/category writes).
+
+    Inside a transaction the new version becomes visible, to this process
+    too, when it commits: caching a pre-commit read under it would outlive
+    the commit.
+    """
+    # Never below the clock (in microseconds): a version lost to a rollback or a
+    # deleted row is not handed out again for entries cached under it meanwhile
+    if not CatalogVersion.objects.filter(pk=1).update(version=Greatest(F("version") + 1, Value(_clock()))):
+        _seed()
+    _forget()
+    transaction.on_commit(_forget)
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import importlib
+import logging
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Type
+
+from .text import content_tokens
+
+try:  # resource is POSIX-only; memory reporting degrades to zeros elsewhere
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+MAX_FEATURES = 4096
+NGRAM_RANGE = (1, 2)
+RANDOM_STATE = 42
+
+
+class BackendUnavailable(ImportError):
+    """Raised when a clustering backend's dependencies cannot be imported."""
+
+
+def max_rss_kb() -> int:
+    """Peak resident set size of this process in KiB (0 when unknown)."""
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+@dataclass
+class BackendReport:
+    backend: str
+    requested: str
+    import_seconds: float = 0.0
+    train_seconds: float = 0.0
+    rss_before_kb: int = 0
+    rss_after_kb: int = 0
+    categories: int = 0
+    products: int = 0
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def rss_growth_kb(self) -> int:
+        return max(0, self.rss_after_kb - self.rss_before_kb)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "backend": self.backend,
+            "requested": self.requested,
+            "import_seconds": round(self.import_seconds, 4),
+            "train_seconds": round(self.train_seconds, 4),
+            "peak_rss_kb": self.rss_after_kb,
+            "rss_growth_kb": self.rss_growth_kb,
+            "categories": self.categories,
+            "products": self.products,
+            "notes": list(self.notes),
+        }
+
+
+class ClusteringBackend:
+    """Turns a list of product texts into ``k`` cluster labels."""
+
+    name = "base"
+    modules: Sequence[str] = ()
+
+    def __init__(self) -> None:
+        self._modules: Dict[str, object] = {}
+
+    def load(self) -> float:
+        """Import the backend's dependencies; returns seconds spent importing."""
+        start = time.perf_counter()
+        for module in self.modules:
+            try:
+                self._modules[module] = importlib.import_module(module)
+            except ImportError as exc:
+                raise BackendUnavailable(f"{self.name} backend requires {module}: {exc}") from exc
+        return time.perf_counter() - start
+
+    def fit_predict(self, texts: List[str], k: int) -> List[int]:
+        raise NotImplementedError
+
+
+class SingleClusterBackend(ClusteringBackend):
+    """Dependency-free fallback: every product stays in its category's cluster 0."""
+
+    name = "single"
+
+    def fit_predict(self, texts: List[str], k: int) -> List[int]:
+        return [0] * len(texts)
+
+
+class NumpyBackend(ClusteringBackend):
+    """TF-IDF + spherical k-means in plain NumPy, sized for per-category corpora."""
+
+    name = "numpy"
+    modules = ("numpy",)
+    n_init = 4
+    max_iter = 50
+
+    def _tfidf(self, texts: List[str]):
+        np = self._modules["numpy"]
+        docs = [Counter(content_tokens(t, NGRAM_RANGE)) for t in texts]
+        df: Counter = Counter()
+        for doc in docs:
+            df.update(doc.keys())
+        vocab = sorted(df, key=lambda t: (-df[t], t))[:MAX_FEATURES]
+        index = {term: i for i, term in enumerate(vocab)}
+
+        X = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            for term, count in doc.items():
+                col = index.get(term)
+                if col is not None:
+                    X[row, col] = count
+
+        # Smoothed idf, matching TfidfVectorizer's defaults
+        n_docs = len(docs)
+        dfs = np.array([df[t] for t in vocab], dtype=np.float32)
+        X *= np.log((1.0 + n_docs) / (1.0 + dfs)) + 1.0
+        return self._normalize(X)
+
+    def _normalize(self, X):
+        np = self._modules["numpy"]
+        norms = np.linalg.norm(X, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return X / norms
+
+    def _init_centers(self, X, k: int, rng):
+        # k-means++ seeding with cosine distance
+        np = self._modules["numpy"]
+        n = X.shape[0]
+        centers = [X[rng.integers(n)]]
+        closest = 1.0 - X @ centers[0]
+        for _ in range(1, k):
+            weights = np.clip(closest, 0.0, None).astype(np.float64)
+            total = weights.sum()
+            idx = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+            centers.append(X[idx])
+            closest = np.minimum(closest, 1.0 - X @ X[idx])
+        return np.vstack(centers)
+
+    def _run(self, X, k: int, rng):
+        np = self._modules["numpy"]
+        centers = self._init_centers(X, k, rng)
+        labels = None
+        for _ in range(self.max_iter):
+            sims = X @ centers.T
+            new_labels = sims.argmax(axis=1)
+            if labels is not None and np.array_equal(labels, new_labels):
+                break
+            labels = new_labels
+
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, X)
+            empty = ~sums.any(axis=1)
+            if empty.any():
+                # Re-seed empty clusters with the worst-fitting points
+                worst = np.argsort(sims[np.arange(len(labels)), labels])[: int(empty.sum())]
+                sums[empty] = X[worst]
+            centers = self._normalize(sums)
+
+        score = float((X @ centers.T)[np.arange(X.shape[0]), labels].sum())
+        return labels, score
+
+    def fit_predict(self, texts: List[str], k: int) -> List[int]:
+        np = self._modules["numpy"]
+        X = self._tfidf(texts)
+        if X.shape[1] == 0:
+            return [0] * len(texts)
+        rng = np.random.default_rng(RANDOM_STATE)
+        best_labels, best_score = None, float("-inf")
+        for _ in range(self.n_init):
+            labels, score = self._run(X, k, rng)
+            if score > best_score:
+                best_labels, best_score = labels, score
+        return [int(label) for label in best_labels]
+
+
+class SklearnBackend(ClusteringBackend):
+    """Full TfidfVectorizer + KMeans; meant for the offline training command."""
+
+    name = "sklearn"
+    modules = ("sklearn.feature_extraction.text", "sklearn.cluster")
+
+    def fit_predict(self, texts: List[str], k: int) -> List[int]:
+        text_mod = self._modules["sklearn.feature_extraction.text"]
+        cluster_mod = self._modules["sklearn.cluster"]
+        vectorizer = text_mod.TfidfVectorizer(stop_words="english", max_features=MAX_FEATURES, ngram_range=NGRAM_RANGE)
+        X = vectorizer.fit_transform(texts)
+        model = cluster_mod.KMeans(n_clusters=k, n_init=10, random_state=RANDOM_STATE)
+        return [int(label) for label in model.fit_predict(X)]
+
+
+BACKENDS: Dict[str, Type[ClusteringBackend]] = {
+    NumpyBackend.name: NumpyBackend,
+    SklearnBackend.name: SklearnBackend,
+    SingleClusterBackend.name: SingleClusterBackend,
+}
+
+# Each backend degrades to the next lighter one when its imports fail
+FALLBACKS: Dict[str, Optional[str]] = {
+    SklearnBackend.name: NumpyBackend.name,
+    NumpyBackend.name: SingleClusterBackend.name,
+    SingleClusterBackend.name: None,
+}
+
+
+def load_backend(name: str) -> tuple[ClusteringBackend, BackendReport]:
+    """Instantiate ``name`` (falling back as needed) and report import cost."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown clustering backend {name!r}; choose from {', '.join(BACKENDS)}")
+
+    report = BackendReport(backend=name, requested=name, rss_before_kb=max_rss_kb())
+    current: Optional[str] = name
+    while current is not None:
+        backend = BACKENDS[current]()
+        try:
+            report.import_seconds += backend.load()
+        except BackendUnavailable as exc:
+            logger.warning("%s; falling back to %s", exc, FALLBACKS[current])
+            report.notes.append(str(exc))
+            current = FALLBACKS[current]
+            continue
+        report.backend = backend.name
+        return backend, report
+    raise BackendUnavailable("No clustering backend could be loaded")  # pragma: no cover
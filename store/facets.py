@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, QuerySet, Value, When
+
+from .models import Category, Product
+
+# Upper-open price bucket edges: [0, 25), [25, 50), ... [500, inf)
+DEFAULT_PRICE_BUCKETS = (0, 25, 50, 100, 200, 500)
+FLAG_FIELDS = ("in_stock", "featured", "best_selling")
+
+FacetKey = Tuple[str, object]
+
+
+class FacetIndex:
+    """Bitmaps (Python ints, bit n = product id n) per facet value.
+
+    Keeps one bitmap per category, per value of each boolean flag and per
+    price bucket. Counting a result set is an AND plus ``int.bit_count`` per
+    bitmap, so every facet is counted in one pass with no COUNT queries.
+    Maintained like the search index: lazy build, signal patches, max-age
+    rebuilds.
+    """
+
+    def __init__(self, price_buckets: Sequence[float] = DEFAULT_PRICE_BUCKETS, max_age: float = 300.0) -> None:
+        self.price_buckets = tuple(price_buckets)
+        self.max_age = max_age
+        self.built_at = 0.0
+        self._lock = threading.RLock()
+        self._bitmaps: Dict[FacetKey, int] = {}
+        self._doc_keys: Dict[int, Tuple[FacetKey, ...]] = {}
+        self._all = 0
+        self._categories: Dict[int, Tuple[str, str]] = {}
+        self._slugs: Dict[str, int] = {}
+
+    # -- maintenance -------------------------------------------------------
+
+    def price_bucket(self, price: Decimal | float) -> int:
+        return max(0, bisect.bisect_right(self.price_buckets, float(price)) - 1)
+
+    def bucket_label(self, bucket: int) -> str:
+        low = self.price_buckets[bucket]
+        if bucket + 1 < len(self.price_buckets):
+            return f"{low}-{self.price_buckets[bucket + 1]}"
+        return f"{low}+"
+
+    def _keys(self, category_id: int, in_stock: bool, featured: bool, best_selling: bool, price) -> Tuple[FacetKey, ...]:
+        return (
+            ("category_id", category_id),
+            ("in_stock", bool(in_stock)),
+            ("featured", bool(featured)),
+            ("best_selling", bool(best_selling)),
+            ("price", self.price_bucket(price)),
+        )
+
+    def build(self) -> None:
+        fresh = FacetIndex(self.price_buckets, self.max_age)
+        # Ids are gathered per key and each bitmap made once: OR-ing bits into
+        # ever larger ints row by row would copy them per product (quadratic)
+        ids: Dict[FacetKey, List[int]] = {}
+        rows = Product.objects.values_list("id", "category_id", "in_stock", "featured", "best_selling", "price")
+        for pid, *values in rows.iterator(chunk_size=5000):
+            keys = fresh._keys(*values)
+            for key in keys:
+                ids.setdefault(key, []).append(pid)
+            fresh._doc_keys[pid] = keys
+        fresh._bitmaps = {key: self.bitmap_from_ids(key_ids) for key, key_ids in ids.items()}
+        fresh._all = self.bitmap_from_ids(fresh._doc_keys)
+        for cid, slug, name in Category.objects.values_list("id", "slug", "name"):
+            fresh._categories[cid] = (slug, name)
+            fresh._slugs[slug] = cid
+        with self._lock:
+            self._bitmaps = fresh._bitmaps
+            self._doc_keys = fresh._doc_keys
+            self._all = fresh._all
+            self._categories = fresh._categories
+            self._slugs = fresh._slugs
+            self.built_at = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        if not self.built_at or time.monotonic() - self.built_at > self.max_age:
+            self.build()
+
+    def _set(self, pid: int, keys: Tuple[FacetKey, ...]) -> None:
+        bit = 1 << pid
+        for key in keys:
+            self._bitmaps[key] = self._bitmaps.get(key, 0) | bit
+        self._doc_keys[pid] = keys
+        self._all |= bit
+
+    def _clear(self, pid: int) -> None:
+        mask = ~(1 << pid)
+        for key in self._doc_keys.pop(pid, ()):
+            self._bitmaps[key] &= mask
+        self._all &= mask
+
+    def update_product(self, product: Product) -> None:
+        keys = self._keys(product.category_id, product.in_stock, product.featured, product.best_selling, product.price)
+        with self._lock:
+            self._clear(product.id)
+            self._set(product.id, keys)
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            self._clear(product_id)
+
+    def update_category(self, category: Category) -> None:
+        with self._lock:
+            old = self._categories.get(category.id)
+            if old:
+                self._slugs.pop(old[0], None)
+            self._categories[category.id] = (category.slug, category.name)
+            self._slugs[category.slug] = category.id
+
+    def remove_category(self, category_id: int) -> None:
+        with self._lock:
+            old = self._categories.pop(category_id, None)
+            if old:
+                self._slugs.pop(old[0], None)
+
+    # -- querying ----------------------------------------------------------
+
+    def category_id(self, slug: str) -> Optional[int]:
+        return self._slugs.get(slug)
+
+    def bitmap(self, **filters: object) -> int:
+        """Bitmap of products matching every non-None facet filter."""
+        result = self._all
+        for name, value in filters.items():
+            if value is not None:
+                result &= self._bitmaps.get((name, value), 0)
+        return result
+
+    @staticmethod
+    def bitmap_from_ids(ids: Iterable[int]) -> int:
+        ids = list(ids)
+        if not ids:
+            return 0
+        buf = bytearray(max(ids) // 8 + 1)
+        for pid in ids:
+            buf[pid >> 3] |= 1 << (pid & 7)
+        return int.from_bytes(buf, "little")
+
+    def counts(self, result: int) -> Dict[str, object]:
+        """Count every facet value inside ``result`` (a bitmap)."""
+        with self._lock:
+            items = list(self._bitmaps.items())
+            categories = dict(self._categories)
+        pairs = ((key, (bitmap & result).bit_count()) for key, bitmap in items)
+        return self._summarise(pairs, result.bit_count(), categories)
+
+    def counts_for(self, queryset: QuerySet) -> Dict[str, object]:
+        """Count every facet value of the products in ``queryset``, in SQL.
+
+        For result sets narrowed by filters the bitmaps do not hold (price
+        range, discount): one GROUP BY over the facet columns instead of
+        loading every matching id. Same shape as ``counts``.
+        """
+        # Highest edge first: the first matching When wins, like bisect_right
+        bucket = Case(
+            *(When(price__gte=edge, then=Value(i)) for i, edge in reversed(list(enumerate(self.price_buckets)))),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        rows = (
+            queryset.order_by()
+            .annotate(price_bucket=bucket)
+            .values_list("category_id", "in_stock", "featured", "best_selling", "price_bucket")
+            .annotate(n=Count("id"))
+        )
+        counts: Dict[FacetKey, int] = {}
+        total = 0
+        for category_id, in_stock, featured, best_selling, price_bucket, n in rows:
+            total += n
+            for key in (
+                ("category_id", category_id),
+                ("in_stock", bool(in_stock)),
+                ("featured", bool(featured)),
+                ("best_selling", bool(best_selling)),
+                ("price", price_bucket),
+            ):
+                counts[key] = counts.get(key, 0) + n
+        with self._lock:
+            categories = dict(self._categories)
+        return self._summarise(counts.items(), total, categories)
+
+    def _summarise(
+        self, pairs: Iterable[Tuple[FacetKey, int]], total: int, categories: Dict[int, Tuple[str, str]],
+    ) -> Dict[str, object]:
+        facets: Dict[str, object] = {"total": total}
+        for flag in FLAG_FIELDS:
+            facets[flag] = {"true": 0, "false": 0}
+        by_category: List[Dict[str, object]] = []
+        by_price: List[Tuple[int, Dict[str, object]]] = []
+        for (name, value), count in pairs:
+            if not count:
+                continue
+            if name == "category_id":
+                slug, label = categories.get(value, (str(value), str(value)))
+                by_category.append({"value": slug, "label": label, "count": count})
+            elif name == "price":
+                by_price.append((value, {"value": self.bucket_label(value), "count": count}))
+            else:
+                facets[name]["true" if value else "false"] = count
+
+        by_category.sort(key=lambda f: (-f["count"], f["label"]))
+        facets["category"] = by_category
+        facets["price"] = [facet for _, facet in sorted(by_price, key=lambda pair: pair[0])]
+        return facets
+
+facet_index = FacetIndex(
+    price_buckets=getattr(settings, "STORE_PRICE_BUCKETS", DEFAULT_PRICE_BUCKETS),
+    max_age=getattr(settings, "STORE_SEARCH_INDEX_MAX_AGE", 300),
+)
+
+
+def get_facet_index() -> FacetIndex:
+    facet_index.ensure_fresh()
+    return facet_index
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from .models import Product
+from .text import STOP_WORDS, tokenize
+
+# Vocabulary words scored with edit distance per query word; bounds fuzzy latency
+CANDIDATE_BUDGET = 50
+
+
+def trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(word: str) -> int:
+    if len(word) <= 3:
+        return 0 if len(word) <= 2 else 1
+    return 1 if len(word) <= 6 else 2
+
+
+def edit_distance(a: str, b: str, bound: int) -> int:
+    """Levenshtein distance, giving up (returning bound + 1) once it exceeds ``bound``."""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """Character-trigram postings over product name words for typo tolerance.
+
+    Trigrams point at distinct name words, not products, so the candidate
+    set stays small however large the catalog grows. Each query word takes
+    the ``CANDIDATE_BUDGET`` words sharing the most trigrams, keeps those
+    within a length-scaled edit distance, and expands them to products; a
+    product must match every query word and ranks by total distance.
+    """
+
+    def __init__(self, max_age: float = 300.0) -> None:
+        self.max_age = max_age
+        self.built_at = 0.0
+        self._lock = threading.RLock()
+        self._grams: Dict[str, Set[str]] = {}
+        self._word_products: Dict[str, Set[int]] = {}
+        self._words: Dict[int, Tuple[str, ...]] = {}
+
+    def build(self) -> None:
+        fresh = TrigramIndex(self.max_age)
+        for pid, name in Product.objects.values_list("id", "name").iterator(chunk_size=5000):
+            fresh._add(pid, name)
+        with self._lock:
+            self._grams = fresh._grams
+            self._word_products = fresh._word_products
+            self._words = fresh._words
+            self.built_at = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        if not self.built_at or time.monotonic() - self.built_at > self.max_age:
+            self.build()
+
+    def _add(self, product_id: int, name: str) -> None:
+        words = tuple(dict.fromkeys(tokenize(name)))
+        self._words[product_id] = words
+        for word in words:
+            products = self._word_products.get(word)
+            if products is None:
+                products = self._word_products[word] = set()
+                for gram in trigrams(word):
+                    self._grams.setdefault(gram, set()).add(word)
+            products.add(product_id)
+
+    def _remove(self, product_id: int) -> None:
+        for word in self._words.pop(product_id, ()):
+            products = self._word_products.get(word)
+            if products is None:
+                continue
+            products.discard(product_id)
+            if products:
+                continue
+            del self._word_products[word]
+            for gram in trigrams(word):
+                words = self._grams.get(gram)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del self._grams[gram]
+
+    def update_product(self, product: Product) -> None:
+        with self._lock:
+            self._remove(product.id)
+            self._add(product.id, product.name)
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            self._remove(product_id)
+
+    def _matches(self, word: str, allowed: Optional[Set[int]]) -> Dict[int, int]:
+        """product id -> smallest edit distance between ``word`` and one of its name words."""
+        bound = max_typos(word)
+        overlap: Counter = Counter()
+        for gram in trigrams(word):
+            overlap.update(self._grams.get(gram, ()))
+        best: Dict[int, int] = {}
+        for term, _ in heapq.nlargest(CANDIDATE_BUDGET, overlap.items(), key=lambda item: (item[1], item[0])):
+            distance = edit_distance(word, term, bound)
+            if distance > bound:
+                continue
+            products = self._word_products[term]
+            for pid in products if allowed is None else products & allowed:
+                if distance < best.get(pid, bound + 1):
+                    best[pid] = distance
+        return best
+
+    def search(self, query: str, allowed: Optional[Set[int]] = None, limit: Optional[int] = None) -> List[int]:
+        words = [w for w in tokenize(query) if w not in STOP_WORDS] or tokenize(query)
+        if not words:
+            return []
+
+        with self._lock:
+            per_word: List[Dict[int, int]] = []
+            for word in words:
+                matches = self._matches(word, allowed)
+                if not matches:
+                    return []
+                per_word.append(matches)
+
+        per_word.sort(key=len)
+        candidates = set(per_word[0]).intersection(*per_word[1:])
+        scores = {pid: sum(matches[pid] for matches in per_word) for pid in candidates}
+        ranked = sorted(scores, key=lambda pid: (scores[pid], -pid))
+        return ranked[:limit] if limit else ranked
+
+
+trigram_index = TrigramIndex(max_age=getattr(settings, "STORE_SEARCH_INDEX_MAX_AGE", 300))
+
+
+def get_trigram_index() -> TrigramIndex:
+    trigram_index.ensure_fresh()
+    return trigram_index
@@ -0,0 +1,277 @@
+"""Responsive image derivatives: fixed-width WebP and JPEG copies of uploads.
+
+Derivatives are content-addressed: they live under the SHA-256 of the
+original's bytes (``derivatives/ab/abcd.../320.webp``), which the owning
+row keeps in a digest column. Variant URLs are therefore computed from the
+digest alone, without touching storage, and an image uploaded twice (or
+shared by many rows, like the default profile picture) is resized once.
+A blank digest means no derivatives yet (see store/jobs.py); pages show the
+original and the API a null image_variants meanwhile. Originals are public
+too, so uploads lose their metadata (GPS position, camera serials) when
+saved: see ``strip_metadata``.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import io
+import struct
+import zlib
+from typing import IO, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, default_storage
+from PIL import Image, ImageOps
+
+# Widths (px) written for every image, and so offered in each srcset
+IMAGE_WIDTHS: Tuple[int, ...] = tuple(sorted(getattr(settings, "STORE_IMAGE_WIDTHS", (160, 320, 640, 1024))))
+# The single-URL fallback: sized for a product card
+THUMBNAIL_WIDTH: int = getattr(settings, "STORE_IMAGE_THUMBNAIL_WIDTH", 320)
+DERIVATIVES_DIR: str = getattr(settings, "STORE_IMAGE_DERIVATIVES_DIR", "derivatives")
+
+# format -> (extension, Pillow save options)
+IMAGE_FORMATS: Dict[str, Tuple[str, Dict[str, object]]] = {
+    "webp": ("webp", {"format": "WEBP", "quality": 80, "method": 6}),
+    "jpeg": ("jpg", {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True}),
+}
+# Keys of every image_variants() dict, in the order flat exports list them
+IMAGE_VARIANT_KEYS: Tuple[str, ...] = ("thumbnail", "webp_srcset", "jpeg_srcset")
+
+
+EXIF_ORIENTATION = 0x0112
+
+# JPEG segments kept: APP0 (JFIF), APP2 (ICC profile) and APP14 (Adobe colour transform)
+# carry no personal data and change how the image decodes. Everything else before the
+# scan (APP1 Exif/XMP, other APPn, comments) is dropped.
+_JPEG_DROPPED = {0xE1, *range(0xE3, 0xEE), 0xEF, 0xFE}
+_PNG_DROPPED = {b"eXIf", b"tEXt", b"zTXt", b"iTXt", b"tIME"}
+_WEBP_DROPPED = {b"EXIF", b"XMP "}
+
+
+def _orientation_exif(payload: bytes) -> Optional[bytes]:
+    """A minimal Exif block holding only the orientation in ``payload``, unless that is upright."""
+    exif = Image.Exif()
+    try:
+        exif.load(payload)
+    except Exception:  # Pillow raises assorted errors for corrupt Exif
+        return None
+    orientation = exif.get(EXIF_ORIENTATION)
+    if orientation in (None, 1):
+        return None
+    minimal = Image.Exif()
+    minimal[EXIF_ORIENTATION] = orientation
+    return minimal.tobytes()
+
+
+def _strip_jpeg(data: bytes) -> bytes:
+    out = [data[:2]]
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            raise ValueError("malformed JPEG")
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1  # fill byte
+            continue
+        if marker == 0xDA:
+            # Start of scan: entropy-coded data and the rest of the file follow
+            break
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            out.append(data[i:i + 2])
+            i += 2
+            continue
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        segment = data[i:i + 2 + length]
+        if marker not in _JPEG_DROPPED:
+            out.append(segment)
+        elif marker == 0xE1 and segment[4:10] == b"Exif\x00\x00":
+            minimal = _orientation_exif(segment[4:])
+            if minimal:
+                out.append(b"\xff\xe1" + struct.pack(">H", len(minimal) + 2) + minimal)
+        i += 2 + length
+    out.append(data[i:])
+    return b"".join(out)
+
+
+def _strip_png(data: bytes) -> bytes:
+    out = [data[:8]]
+    i = 8
+    while i + 12 <= len(data):
+        (length,) = struct.unpack(">I", data[i:i + 4])
+        kind = data[i + 4:i + 8]
+        if kind not in _PNG_DROPPED:
+            out.append(data[i:i + 12 + length])
+        elif kind == b"eXIf":
+            minimal = _orientation_exif(data[i + 8:i + 8 + length])
+            if minimal:
+                body = b"eXIf" + minimal[6:]
+                out.append(struct.pack(">I", len(body) - 4) + body + struct.pack(">I", zlib.crc32(body)))
+        i += 12 + length
+    out.append(data[i:])
+    return b"".join(out)
+
+
+def _strip_webp(data: bytes) -> bytes:
+    chunks = []
+    i = 12
+    while i + 8 <= len(data):
+        kind = data[i:i + 4]
+        (length,) = struct.unpack("<I", data[i + 4:i + 8])
+        payload = data[i + 8:i + 8 + length]
+        if kind not in _WEBP_DROPPED:
+            chunks.append([kind, payload])
+        elif kind == b"EXIF":
+            minimal = _orientation_exif(payload)
+            if minimal:
+                chunks.append([kind, minimal[6:]])
+        i += 8 + length + (length & 1)
+    kept_exif = any(kind == b"EXIF" for kind, _ in chunks)
+    for chunk in chunks:
+        if chunk[0] == b"VP8X":
+            # The XMP flag, and the Exif one unless an orientation was kept, name dropped chunks
+            flags = chunk[1][0] & ~0x04 & (0xFF if kept_exif else ~0x08)
+            chunk[1] = bytes([flags]) + chunk[1][1:]
+    body = b"WEBP" + b"".join(
+        kind + struct.pack("<I", len(payload)) + payload + b"\x00" * (len(payload) & 1) for kind, payload in chunks
+    )
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _reencode(data: bytes) -> bytes:
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        buffer = io.BytesIO()
+        image.save(buffer, format=source.format)
+    return buffer.getvalue()
+
+
+def strip_metadata(data: bytes) -> bytes:
+    """``data`` without Exif, XMP, IPTC or text metadata, for originals that are served publicly.
+
+    JPEG, PNG and WebP are rewritten losslessly, segment by segment; a
+    non-upright Exif orientation survives on its own so browsers still turn
+    the image. GIF and BMP carry no such metadata; other formats are
+    re-encoded without it. Anything unreadable is returned as is (its
+    image job will fail it).
+    """
+    try:
+        if data[:2] == b"\xff\xd8":
+            return _strip_jpeg(data)
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            return _strip_png(data)
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return _strip_webp(data)
+        if data[:4] == b"GIF8" or data[:2] == b"BM":
+            return data
+        return _reencode(data)
+    except (ValueError, struct.error):
+        try:
+            return _reencode(data)
+        except (OSError, ValueError, KeyError, Image.DecompressionBombError):
+            return data
+    except (OSError, KeyError, Image.DecompressionBombError):
+        return data
+
+
+def file_digest(stream: IO[bytes]) -> str:
+    """SHA-256 hex digest of ``stream``, read in chunks from the start."""
+    stream.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1 << 16), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def digest_dir(digest: str) -> str:
+    return f"{DERIVATIVES_DIR}/{digest[:2]}/{digest}"
+
+
+def derivative_name(digest: str, width: int, format: str) -> str:
+    return f"{digest_dir(digest)}/{width}.{IMAGE_FORMATS[format][0]}"
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """``image`` with any transparency composited onto white (JPEG has no alpha)."""
+    if image.mode != "RGBA":
+        return image
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def render_derivatives(stream: IO[bytes]) -> Dict[Tuple[int, str], bytes]:
+    """Encode every (width, format) variant of the image in ``stream``.
+
+    Images are turned upright by their EXIF orientation and written without
+    metadata. Widths are never upscaled: a source narrower than a width is
+    stored at its own size under that width's name, so every srcset entry
+    exists. Raises ``PIL.UnidentifiedImageError`` (an ``OSError``) for
+    anything that is not an image.
+    """
+    with Image.open(stream) as source:
+        # JPEG sources decode straight at a reduced scale when the largest width allows it
+        # (square, since EXIF rotation may swap the sides)
+        source.draft("RGB", (max(IMAGE_WIDTHS), max(IMAGE_WIDTHS)))
+        image = ImageOps.exif_transpose(source)
+        transparent = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if transparent else "RGB")
+
+    rendered: Dict[Tuple[int, str], bytes] = {}
+    # Largest first, each step shrinking the previous result rather than the full original
+    for width in sorted(IMAGE_WIDTHS, reverse=True):
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for format, (_, options) in IMAGE_FORMATS.items():
+            buffer = io.BytesIO()
+            (image if format == "webp" else _flatten(image)).save(buffer, **options)
+            rendered[width, format] = buffer.getvalue()
+    return rendered
+
+
+def generate_derivatives(name: str, storage: Optional[Storage] = None, force: bool = False) -> Tuple[str, bool]:
+    """Write the variants of the stored file ``name``; returns ``(digest, created)``.
+
+    ``created`` is False when every variant already existed under the digest
+    (the same bytes were processed before), unless ``force`` re-renders them.
+    """
+    storage = storage or default_storage
+    with storage.open(name, "rb") as stream:
+        digest = file_digest(stream)
+        names = {key: derivative_name(digest, *key) for key in
+                 ((width, format) for width in IMAGE_WIDTHS for format in IMAGE_FORMATS)}
+        if not force and all(storage.exists(path) for path in names.values()):
+            return digest, False
+        rendered = render_derivatives(stream)
+    for key, path in names.items():
+        if storage.exists(path):
+            if not force:
+                continue
+            storage.delete(path)
+        saved = storage.save(path, ContentFile(rendered[key]))
+        if saved != path:
+            # Another process wrote the same content meanwhile; keep one copy
+            storage.delete(saved)
+    return digest, True
+
+
+@functools.lru_cache(maxsize=4096)
+def image_variants(digest: Optional[str]) -> Optional[Dict[str, str]]:
+    """Variant URLs for ``digest``: a thumbnail plus WebP and JPEG ``srcset`` strings.
+
+    Cached per digest, which is safe because derivatives never change
+    under one. None for a blank digest.
+    """
+    if not digest:
+        return None
+    base = default_storage.url(digest_dir(digest) + "/")
+    srcsets = {
+        format: ", ".join(f"{base}{width}.{extension} {width}w" for width in IMAGE_WIDTHS)
+        for format, (extension, _) in IMAGE_FORMATS.items()
+    }
+    return {
+        "thumbnail": f"{base}{THUMBNAIL_WIDTH}.{IMAGE_FORMATS['jpeg'][0]}",
+        "webp_srcset": srcsets["webp"],
+        "jpeg_srcset": srcsets["jpeg"],
+    }
@@ -0,0 +1,247 @@
+"""Bulk product import from CSV or JSONL streams.
+
+Records are upserted on slug, one ``INSERT ... ON CONFLICT DO UPDATE`` per
+batch, and categories resolve through a slug -> id map loaded once.
+``bulk_create`` sends no ``post_save`` signals, so the per-product index
+patching in ``signals.py`` never runs; ``refresh_derived_data`` rebuilds
+the derived data once instead.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import IO, AbstractSet, Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from django.core.cache import cache
+
+from .catalog import bump_catalog_version
+from .facets import facet_index
+from .fuzzy import trigram_index
+from .models import Category, Product
+from .recommender import PRODUCT_SIM_CACHE_KEY
+from .search import product_index
+from .suggest import suggester
+from .vectors import rebuild_product_vectors
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# Columns an import may set; anything else in a record is ignored
+IMPORT_FIELDS = (
+    "name", "description", "price", "original_price", "in_stock", "featured", "best_selling",
+)
+BOOLEAN_FIELDS = ("in_stock", "featured", "best_selling")
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f", ""}
+
+# Errors kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+def read_records(stream: IO[Any], format: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(line number, record) pairs from a binary or text CSV/JSONL stream, read lazily."""
+    if format not in IMPORT_FORMATS:
+        raise ValueError(f"Unknown import format {format!r}; choose from {', '.join(IMPORT_FORMATS)}")
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding="utf-8-sig")
+    if format == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_num, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_num, {"__error__": f"invalid JSON: {exc}"}
+            continue
+        yield line_num, record if isinstance(record, dict) else {"__error__": "expected a JSON object"}
+
+
+def _decimal(value: Any, name: str) -> Decimal:
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"{name} is not a number: {value!r}")
+    if not number.is_finite() or number < 0:
+        raise ValueError(f"{name} must be a non-negative number")
+    return number.quantize(Decimal("0.01"))
+
+
+def _boolean(value: Any, name: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"{name} is not a boolean: {value!r}")
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    categories_created: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+    def error(self, line_num: int, message: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_num, message))
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "categories_created": self.categories_created,
+            "errors": [{"line": line_num, "error": message} for line_num, message in self.errors],
+        }
+
+
+class ProductImporter:
+    """Upsert product records in batches of ``batch_size``.
+
+    A record needs ``slug``, ``name``, ``price`` and a ``category`` slug (or
+    ``category_id``); unknown category slugs are created when
+    ``create_categories`` is set. On update only the columns present in each
+    record are written, so a price feed (slug, name, category, price) leaves
+    descriptions and merchandising flags alone, even mixed into one file
+    with full records.
+    """
+
+    def __init__(self, batch_size: int = 1000, create_categories: bool = True) -> None:
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.result = ImportResult()
+        self._categories: Dict[str, int] = dict(Category.objects.values_list("slug", "id"))
+        self._category_ids = set(self._categories.values())
+
+    def _category_id(self, record: Dict[str, Any]) -> int:
+        if record.get("category_id") not in (None, ""):
+            category_id = int(record["category_id"])
+            if category_id not in self._category_ids:
+                raise ValueError(f"unknown category_id {category_id}")
+            return category_id
+        slug = str(record.get("category") or "").strip()
+        if not slug:
+            raise ValueError("category or category_id is required")
+        if slug not in self._categories:
+            if not self.create_categories:
+                raise ValueError(f"unknown category {slug!r}")
+            name = str(record.get("category_name") or "").strip() or slug.replace("-", " ").title()
+            category = Category.objects.create(name=name, slug=slug)
+            self._categories[slug] = category.id
+            self._category_ids.add(category.id)
+            self.result.categories_created += 1
+        return self._categories[slug]
+
+    def _product(self, record: Dict[str, Any]) -> Product:
+        if "__error__" in record:
+            raise ValueError(record["__error__"])
+        slug = str(record.get("slug") or "").strip()
+        name = str(record.get("name") or "").strip()
+        if not slug or not name or record.get("price") in (None, ""):
+            raise ValueError("slug, name and price are required")
+        values: Dict[str, Any] = {"slug": slug, "name": name, "category_id": self._category_id(record)}
+        values["price"] = _decimal(record["price"], "price")
+        if record.get("original_price") not in (None, ""):
+            values["original_price"] = _decimal(record["original_price"], "original_price")
+        if record.get("description") is not None:
+            values["description"] = str(record["description"])
+        for flag in BOOLEAN_FIELDS:
+            if flag in record:
+                values[flag] = _boolean(record[flag], flag)
+        return Product(**values)
+
+    def feed(self, records: Iterable[Tuple[int, Dict[str, Any]]]) -> ImportResult:
+        # Records grouped by the import columns they carry: each group is upserted with
+        # its own update_fields, so a column one record omits is not reset by another's
+        batch: Dict[FrozenSet[str], Dict[str, Product]] = {}
+        group_of: Dict[str, FrozenSet[str]] = {}
+        for line_num, record in records:
+            try:
+                product = self._product(record)
+            except (ValueError, TypeError) as exc:
+                self.result.error(line_num, str(exc))
+                continue
+            # A slug repeated within a batch: the last record wins
+            previous = group_of.pop(product.slug, None)
+            if previous is not None:
+                del batch[previous][product.slug]
+            columns = frozenset(key for key in record if key in IMPORT_FIELDS)
+            batch.setdefault(columns, {})[product.slug] = product
+            group_of[product.slug] = columns
+            if len(group_of) >= self.batch_size:
+                self._flush_groups(batch)
+                batch, group_of = {}, {}
+        self._flush_groups(batch)
+        return self.result
+
+    def _flush_groups(self, batch: Dict[FrozenSet[str], Dict[str, Product]]) -> None:
+        for columns, products in batch.items():
+            if products:
+                self._flush(products, columns)
+
+    def _flush(self, batch: Dict[str, Product], columns: AbstractSet[str]) -> None:
+        existing = set(Product.objects.filter(slug__in=batch).values_list("slug", flat=True))
+        # updated_at (auto_now) is filled on insert and must be copied on conflict too,
+        # or the changes feed would miss updated rows
+        update_fields = ["category"] + [name for name in IMPORT_FIELDS if name in columns] + ["updated_at"]
+        Product.objects.bulk_create(
+            list(batch.values()), update_conflicts=True, unique_fields=["slug"], update_fields=update_fields,
+        )
+        self.result.updated += len(existing)
+        self.result.created += len(batch) - len(existing)
+
+    def finish(self, rebuild_vectors: bool = True) -> None:
+        if self.result.created or self.result.updated:
+            refresh_derived_data(rebuild_vectors=rebuild_vectors)
+
+
+def refresh_derived_data(rebuild_vectors: bool = True) -> None:
+    """One pass over everything the skipped signals would have patched row by row.
+
+    For any bulk write to products (``bulk_create``, ``QuerySet.update``).
+    """
+    bump_catalog_version()
+    if rebuild_vectors:
+        # Also invalidates this process' vector index
+        rebuild_product_vectors()
+    for index in (product_index, suggester, facet_index, trigram_index):
+        if index.built_at:
+            index.build()
+    # Recomputed on next use, or by warm_recommender
+    cache.delete(PRODUCT_SIM_CACHE_KEY)
+
+
+def import_products(
+    stream: IO[Any],
+    format: str,
+    batch_size: int = 1000,
+    create_categories: bool = True,
+    rebuild_vectors: bool = True,
+) -> ImportResult:
+    importer = ProductImporter(batch_size=batch_size, create_categories=create_categories)
+    try:
+        importer.feed(read_records(stream, format))
+    finally:
+        # Batches already written stay written, so derived data must follow them
+        importer.finish(rebuild_vectors=rebuild_vectors)
+    return importer.result
+
+
+def guess_format(filename: Optional[str]) -> Optional[str]:
+    if filename:
+        extension = filename.rsplit(".", 1)[-1].lower()
+        if extension in ("jsonl", "ndjson"):
+            return "jsonl"
+        if extension == "csv":
+            return "csv"
+    return None
@@ -0,0 +1,175 @@
+"""Local image job queue: uploads are resized by worker processes, not in the request.
+
+Jobs are ``ImageJob`` rows. Workers (``manage.py image_worker``) claim the
+oldest due job with a conditional UPDATE, so any number of them, on any host
+sharing the database, can poll one table without a broker. A job names a
+row, not a file: it processes whatever image the row holds when it runs, so
+several uploads to one product before a worker gets to it cost one resize.
+Until then the row's digest is blank and pages show the original image.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .catalog import bump_catalog_version
+from .images import generate_derivatives
+from .models import ImageJob, Product, Profile
+
+logger = logging.getLogger(__name__)
+
+# kind -> (model, image field, digest field)
+IMAGE_TARGETS = {
+    "product": (Product, "image", "image_digest"),
+    "profile": (Profile, "profile_picture", "picture_digest"),
+}
+
+# Tries before a job is left as failed; retries back off from RETRY_DELAY seconds, doubling
+MAX_ATTEMPTS: int = getattr(settings, "STORE_IMAGE_JOB_MAX_ATTEMPTS", 3)
+RETRY_DELAY = 30
+# Seconds a running job may take before it is presumed lost with its worker and requeued
+LEASE_SECONDS: int = getattr(settings, "STORE_IMAGE_JOB_LEASE", 300)
+
+
+def kind_of(model) -> str:
+    return next(kind for kind, (target, _, _) in IMAGE_TARGETS.items() if target is model)
+
+
+def process(kind: str, object_id: int) -> str:
+    """Write the derivatives of the row's current image and record its digest; returns the digest.
+
+    The digest is only stored if the row still holds the file that was
+    processed: a newer upload has a job of its own.
+    """
+    model, field, digest_field = IMAGE_TARGETS[kind]
+    name = model.objects.filter(pk=object_id).values_list(field, flat=True).first()
+    if not name:
+        # Row deleted or image cleared since the upload
+        return ""
+    digest, _ = generate_derivatives(name)
+    values = {digest_field: digest}
+    if model is Product:
+        # update() skips auto_now: set it so the detail ETag and Last-Modified move and
+        # the changes feed hands the new image_variants to sync clients
+        values["updated_at"] = timezone.now()
+    if model.objects.filter(pk=object_id, **{field: name}).update(**values) and model is Product:
+        # Cached pages and API responses still lack the variants; the version is a shared
+        # row, so this reaches the web and API processes too
+        bump_catalog_version()
+    return digest
+
+
+def enqueue(kind: str, object_id: int) -> None:
+    if getattr(settings, "STORE_IMAGE_JOBS_INLINE", False):
+        # Development without a worker: resize in the request, as a job would
+        try:
+            process(kind, object_id)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.warning("Could not process %s %s image", kind, object_id, exc_info=True)
+        return
+    # One pending job per row is enough, since it reads the row's image when it runs; the
+    # partial unique constraint makes a concurrent enqueue's INSERT fail, and get_or_create
+    # then returns the winner's job
+    ImageJob.objects.get_or_create(kind=kind, object_id=object_id, status="pending")
+
+
+def claim() -> Optional[ImageJob]:
+    """Mark the oldest due pending job running and return it; None when there is none."""
+    now = timezone.now()
+    while True:
+        job_id = (
+            ImageJob.objects.filter(status="pending", run_after__lte=now)
+            .order_by("run_after", "id").values_list("id", flat=True).first()
+        )
+        if job_id is None:
+            return None
+        # Another worker may have taken it since the SELECT; the status guard lets one UPDATE win
+        claimed = ImageJob.objects.filter(id=job_id, status="pending").update(
+            status="running", locked_at=now, attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return ImageJob.objects.get(id=job_id)
+
+
+def run(job: ImageJob) -> bool:
+    """Process a claimed job: deleted when done, rescheduled or marked failed otherwise."""
+    try:
+        process(job.kind, job.object_id)
+    except Exception as exc:  # A bad upload must not take the worker down
+        logger.warning("Image job %s failed (attempt %s)", job.id, job.attempts, exc_info=True)
+        job.error = f"{type(exc).__name__}: {exc}"
+        job.locked_at = None
+        # Not an image at all: retrying will not help
+        if job.attempts >= MAX_ATTEMPTS or isinstance(exc, UnidentifiedImageError):
+            job.status = "failed"
+        else:
+            job.status = "pending"
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+        try:
+            with transaction.atomic():
+                job.save(update_fields=["status", "error", "locked_at", "run_after"])
+        except IntegrityError:
+            # A new upload queued a pending job meanwhile; it covers this retry
+            job.delete()
+        return False
+    job.delete()
+    return True
+
+
+def requeue_stale() -> int:
+    """Return running jobs whose worker died (lease expired) to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=LEASE_SECONDS)
+    requeued = 0
+    for job in ImageJob.objects.filter(status="running", locked_at__lt=cutoff):
+        try:
+            with transaction.atomic():
+                ImageJob.objects.filter(pk=job.pk, status="running").update(status="pending", locked_at=None)
+            requeued += 1
+        except IntegrityError:
+            # The row was queued again since the job was claimed; that pending job covers it
+            job.delete()
+    return requeued
+
+
+def work(
+    poll_interval: float = 2.0,
+    once: bool = False,
+    should_stop: Callable[[], bool] = lambda: False,
+) -> Dict[str, int]:
+    """Claim and run jobs until ``should_stop()``, or with ``once`` until none is due.
+
+    Returns how many jobs were done and failed.
+    """
+    counts = {"done": 0, "failed": 0}
+    last_sweep = 0.0
+    while not should_stop():
+        if time.monotonic() - last_sweep > LEASE_SECONDS / 2:
+            requeue_stale()
+            last_sweep = time.monotonic()
+        job = claim()
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        counts["done" if run(job) else "failed"] += 1
+    return counts
+
+
+def queue_stats() -> Dict[str, object]:
+    counts = dict(ImageJob.objects.values_list("status").annotate(n=Count("id")).order_by())
+    oldest = ImageJob.objects.filter(status="pending").order_by("created_at").values_list("created_at", flat=True).first()
+    return {
+        "pending": counts.get("pending", 0),
+        "running": counts.get("running", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_pending_seconds": round((timezone.now() - oldest).total_seconds(), 1) if oldest else None,
+    }
@@ -0,0 +1,144 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ...models import Cart, Category, DiscountPercentage, Order, OrderItem, Payment, Product, ProductTombstone, Wishlist
+from ...pagination import KEYSET_ORDERING, PRODUCT_CARD_FIELDS, encode_cursor, seek
+from ...sync import SyncToken, changed_products
+from ...synthetic import load_dataset
+
+
+class _Rollback(Exception):
+    pass
+
+
+def catalog_queries(product, category, user, order):
+    """(name, queryset, reads_every_row) for the queries behind the store views and API routers.
+
+    ``reads_every_row`` marks queries that are meant to scan (small tables
+    listed whole); any other query that scans a table fails the benchmark.
+    """
+    listing = Product.objects.only(*PRODUCT_CARD_FIELDS)
+    return [
+        # Home page and /api/products/featured|bestselling/list
+        ("home featured", Product.objects.filter(featured=True, in_stock=True)[:8], False),
+        ("home best selling", Product.objects.filter(best_selling=True, in_stock=True)[:8], False),
+        ("home categories", Category.objects.all()[:12], True),
+        # Product page
+        ("product by slug", Product.objects.filter(slug=product.slug, in_stock=True), False),
+        ("related products", Product.objects.filter(category=category, in_stock=True).exclude(id=product.id)[:4], False),
+        ("in wishlist", Wishlist.objects.filter(user=user, product=product)[:1], False),
+        # Category page and /api/categories/{slug}/products
+        ("category page", listing.filter(category=category, in_stock=True).order_by(*KEYSET_ORDERING)[:24], False),
+        # The COUNT(*) Paginator runs: no ordering
+        ("category count", Product.objects.filter(category=category, in_stock=True).order_by().values("id"), False),
+        # GET /api/products/
+        ("products newest", Product.objects.order_by(*KEYSET_ORDERING)[:20], False),
+        ("products cursor", seek(Product.objects.all(), encode_cursor(product.created_at, product.id), 20), False),
+        ("category by price", Product.objects.filter(
+            category=category, price__gte=Decimal("20"), price__lte=Decimal("200")).order_by("price", "id")[:20], False),
+        ("top discounts", Product.objects.alias(discount=DiscountPercentage()).filter(
+            discount__gte=20).order_by("-discount", "-id")[:20], False),
+        ("changes feed", changed_products(SyncToken(product.updated_at, product.id, 0))[:501], False),
+        ("tombstones", ProductTombstone.objects.filter(id__gt=0).order_by("id")[:501], False),
+        # Cart, wishlist and orders
+        ("cart", Cart.objects.filter(user=user).select_related("product"), False),
+        ("wishlist", Wishlist.objects.filter(user=user).select_related("product"), False),
+        ("order history", Order.objects.filter(user=user).order_by("-created_at"), False),
+        ("order items", OrderItem.objects.filter(order_id__in=[order.id]).select_related("product"), False),
+        ("order payment", Payment.objects.filter(order=order), False),
+        ("track order", Order.objects.filter(tracking_number=order.tracking_number), False),
+    ]
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    # "SCAN t USING [COVERING] INDEX i" walks an index in order; a bare "SCAN t" reads the table
+    return [step for step in plan if step.startswith("SCAN ") and " USING " not in step]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the catalog, cart and order queries on a large synthetic dataset and record their "
+        "EXPLAIN QUERY PLAN; fails if any falls back to a full table scan (rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=50000, help="Synthetic products to insert")
+        parser.add_argument("--users", type=int, default=500, help="Synthetic users with carts and wishlists")
+        parser.add_argument("--orders", type=int, default=20000, help="Synthetic orders")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("bench_queries reads SQLite's EXPLAIN QUERY PLAN output")
+
+        failures = []
+        try:
+            with transaction.atomic():
+                fixtures = self._seed(options)
+                failures = self._run(catalog_queries(*fixtures), options["repeat"])
+                raise _Rollback
+        except _Rollback:
+            pass
+        if failures:
+            raise CommandError(f"Full table scan in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("No full table scans; synthetic data rolled back."))
+
+    def _seed(self, options):
+        start = time.perf_counter()
+        seed = options["seed"]
+        categories = [Category.objects.create(name=f"Bench {i}", slug=f"bench-queries-{seed}-{i}") for i in range(12)]
+        counts = load_dataset(
+            products=options["products"],
+            users=options["users"],
+            orders=options["orders"],
+            seed=seed,
+            category_ids=[c.id for c in categories],
+        )
+        with connection.cursor() as cursor:
+            # Fresh statistics, as a long-lived database would have
+            cursor.execute("ANALYZE")
+        self.stdout.write(
+            f"Inserted {counts.products} products, {counts.users} users, {counts.orders} orders "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+        product = Product.objects.filter(category__in=categories).order_by("?").first()
+        order = Order.objects.exclude(tracking_number="").order_by("?").first()
+        return product, product.category, User.objects.get(id=order.user_id), order
+
+    def _run(self, queries, repeat):
+        failures = []
+        self.stdout.write(f"{'query':<20}{'rows':>7}{'mean ms':>10}{'p95 ms':>10}  plan")
+        for name, queryset, reads_every_row in queries:
+            plan = explain(queryset)
+            rows = len(list(queryset))  # warm-up
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+            scans = full_scans(plan)
+            style = self.style.ERROR if scans and not reads_every_row else (lambda text: text)
+            self.stdout.write(style(
+                f"{name:<20}{rows:>7}{statistics.mean(timings):>10.2f}{p95:>10.2f}  {plan[0] if plan else ''}"
+            ))
+            for step in plan[1:]:
+                self.stdout.write(f"{'':<49}{step}")
+            if scans and not reads_every_row:
+                failures.append(name)
+        return failures
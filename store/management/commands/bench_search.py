@@ -0,0 +1,80 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ...models import Category, Product
+from ...search import SEARCH_BACKENDS, product_index, search_product_ids
+from ...synthetic import product_rows
+
+DEFAULT_QUERIES = ["drill", "cordless drill", "hose", "stainless knife set", "gloves", "pro", "set"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark product search backends on a synthetic catalog (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=50000, help="Synthetic products to insert")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query and backend")
+        parser.add_argument("--backends", default=",".join(SEARCH_BACKENDS), help="Comma separated backends")
+        parser.add_argument("--query", action="append", dest="queries", help="Query to run (repeatable)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        backends = [b.strip() for b in options["backends"].split(",") if b.strip()]
+        unknown = set(backends) - set(SEARCH_BACKENDS)
+        if unknown:
+            raise CommandError(f"Unknown backends: {', '.join(sorted(unknown))}")
+        if "fts" in backends and connection.vendor != "sqlite":
+            self.stdout.write(self.style.WARNING("fts needs SQLite; it will fall back to db"))
+
+        try:
+            with transaction.atomic():
+                self._seed(options["products"], options["seed"])
+                self._run(backends, options["queries"] or DEFAULT_QUERIES, options["repeat"])
+                raise _Rollback
+        except _Rollback:
+            pass
+        # Drop the synthetic rows from this process' index as well
+        product_index.build()
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; synthetic catalog rolled back."))
+
+    def _seed(self, count, seed):
+        start = time.perf_counter()
+        categories = [
+            Category.objects.create(name=f"Bench {i}", slug=f"bench-{seed}-{i}") for i in range(12)
+        ]
+        rows = product_rows(count, [c.id for c in categories], seed=seed, start=Product.objects.count())
+        batch = []
+        for row in rows:
+            batch.append(Product(**row))
+            if len(batch) >= 2000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        self.stdout.write(f"Inserted {count} products in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        product_index.build()
+        self.stdout.write(f"Built in-process index ({len(product_index)} docs) in {time.perf_counter() - start:.2f}s")
+
+    def _run(self, backends, queries, repeat):
+        self.stdout.write(f"{'query':<22}{'backend':<8}{'hits':>8}{'mean ms':>10}{'p95 ms':>10}")
+        for query in queries:
+            for backend in backends:
+                hits = search_product_ids(query, in_stock=True, backend=backend)  # warm-up
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    search_product_ids(query, in_stock=True, backend=backend)
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+                self.stdout.write(
+                    f"{query:<22}{backend:<8}{len(hits):>8}{statistics.mean(timings):>10.2f}{p95:>10.2f}"
+                )
@@ -0,0 +1,85 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api.models import PaginatedResponse, ProductResponse
+from api.serializers import FastJSONResponse, product_dicts
+
+from ...models import Category, Product
+from ...synthetic import product_rows
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _orm_page(queryset, size):
+    """The pre-fast-path listing: instances, from_orm, .dict(), response_model pass, stdlib JSON."""
+    products = []
+    for product in queryset.select_related("category")[:size]:
+        product_data = ProductResponse.from_orm(product)
+        product_data.discount_percentage = product.get_discount_percentage()
+        if product.image:
+            product_data.image = product.image.url
+        products.append(product_data.dict())
+    response = PaginatedResponse(count=size, results=products)
+    # What FastAPI does with a returned model: validate against response_model, encode, render
+    content = PaginatedResponse.model_validate(response.model_dump())
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _fast_page(queryset, size):
+    return FastJSONResponse({"count": size, "results": product_dicts(queryset[:size])}).body
+
+
+class Command(BaseCommand):
+    help = "Benchmark product listing serialization (ORM + pydantic vs values() + orjson) on one page"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100, help="Products per page")
+        parser.add_argument("--repeat", type=int, default=200, help="Timed pages per path")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        try:
+            with transaction.atomic():
+                missing = rows - Product.objects.count()
+                if missing > 0:
+                    # Top the catalog up with synthetic products, rolled back afterwards
+                    category = Category.objects.create(name="Bench", slug=f"bench-serialization-{options['seed']}")
+                    Product.objects.bulk_create(
+                        Product(**row) for row in product_rows(missing, [category.id], seed=options["seed"])
+                    )
+                self._run(Product.objects.all(), rows, repeat)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, queryset, rows, repeat):
+        self.stdout.write(f"{'path':<8}{'mean ms':>10}{'p95 ms':>10}{'rows/s':>12}{'bytes':>10}")
+        results = {}
+        for name, render in (("orm", _orm_page), ("fast", _fast_page)):
+            body = render(queryset, rows)  # warm-up
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                render(queryset, rows)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            mean = statistics.mean(timings)
+            p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+            results[name] = (mean, json.loads(body))
+            self.stdout.write(f"{name:<8}{mean:>10.3f}{p95:>10.3f}{rows / mean * 1000:>12.0f}{len(body):>10}")
+
+        # Both paths must describe the same products
+        orm_ids = [row["id"] for row in results["orm"][1]["results"]]
+        fast_ids = [row["id"] for row in results["fast"][1]["results"]]
+        if orm_ids != fast_ids:
+            self.stdout.write(self.style.ERROR("Paths returned different products"))
+        self.stdout.write(self.style.SUCCESS(f"Speed-up: {results['orm'][0] / results['fast'][0]:.1f}x"))
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...catalog import bump_catalog_version
+from ...images import generate_derivatives
+from ...models import Product, Profile
+
+# (model, image field, digest field)
+TARGETS = {
+    "products": (Product, "image", "image_digest"),
+    "profiles": (Profile, "profile_picture", "picture_digest"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill the resized WebP/JPEG copies of product images and profile pictures "
+        "that were uploaded before derivatives existed (or --force to re-render all)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--only", choices=sorted(TARGETS), help="Process one kind of image")
+        parser.add_argument("--force", action="store_true", help="Re-render rows that already have derivatives")
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per digest UPDATE")
+
+    def handle(self, *args, **options):
+        kinds = [options["only"]] if options["only"] else sorted(TARGETS)
+        for kind in kinds:
+            self._backfill(kind, *TARGETS[kind], force=options["force"], batch_size=options["batch_size"])
+
+    def _backfill(self, kind, model, image_field, digest_field, force, batch_size):
+        start = time.perf_counter()
+        rows = model.objects.exclude(**{image_field: ""}).only("id", image_field, digest_field).order_by("id")
+        if not force:
+            rows = rows.filter(**{digest_field: ""})
+
+        # Rows sharing a file (the default profile picture) are read and hashed once
+        digests = {}
+        pending, rendered, reused, failed, updated = [], 0, 0, 0, 0
+        for row in rows.iterator(chunk_size=batch_size):
+            name = getattr(row, image_field).name
+            if name not in digests:
+                try:
+                    digests[name], created = generate_derivatives(name, force=force)
+                except (OSError, ValueError) as exc:
+                    digests[name] = ""
+                    failed += 1
+                    self.stderr.write(f"{kind} {row.id}: {name}: {exc}")
+                else:
+                    rendered += created
+                    reused += not created
+            if digests[name] and digests[name] != getattr(row, digest_field):
+                setattr(row, digest_field, digests[name])
+                pending.append(row)
+            if len(pending) >= batch_size:
+                updated += model.objects.bulk_update(pending, [digest_field])
+                pending = []
+        if pending:
+            updated += model.objects.bulk_update(pending, [digest_field])
+        if updated and model is Product:
+            # Cached API responses and pages embed the variant URLs
+            bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{kind}: {len(digests)} files, {rendered} rendered, {reused} already had derivatives, "
+            f"{failed} unreadable; {updated} rows updated in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ...jobs import queue_stats, work
+
+
+def _serve(poll_interval, once):
+    """One worker process: run jobs until SIGTERM/SIGINT, finishing the job in hand first."""
+    stopping = []
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stopping.append(True))
+    # Connections inherited from the parent must not be shared across processes
+    connections.close_all()
+    counts = work(poll_interval=poll_interval, once=once, should_stop=lambda: bool(stopping))
+    connections.close_all()
+    return counts
+
+
+def _child(poll_interval, once):
+    counts = _serve(poll_interval, once)
+    print(f"worker {os.getpid()}: {counts['done']} done, {counts['failed']} failed", flush=True)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run image jobs queued by uploads (decode, resize, re-encode to WebP/JPEG without "
+        "metadata, dedup by content) in worker processes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes", type=int, default=getattr(settings, "STORE_IMAGE_WORKERS", 2),
+            help="Worker processes polling the queue",
+        )
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between polls of an empty queue")
+        parser.add_argument("--once", action="store_true", help="Exit when no job is due instead of polling")
+        parser.add_argument("--stats", action="store_true", help="Print queue counts and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for key, value in queue_stats().items():
+                self.stdout.write(f"{key:<24}{value}")
+            return
+        if options["processes"] < 1:
+            raise CommandError("--processes must be at least 1")
+
+        if options["processes"] == 1:
+            counts = _serve(options["poll_interval"], options["once"])
+            self.stdout.write(self.style.SUCCESS(f"{counts['done']} jobs done, {counts['failed']} failed"))
+            return
+
+        # fork: children inherit the configured Django apps instead of re-importing settings
+        context = multiprocessing.get_context("fork")
+        connections.close_all()
+        workers = [
+            context.Process(target=_child, args=(options["poll_interval"], options["once"]), daemon=True)
+            for _ in range(options["processes"])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} image workers: {', '.join(str(w.pid) for w in workers)}")
+
+        def stop(signum, frame):
+            for worker in workers:
+                if worker.is_alive():
+                    os.kill(worker.pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, stop)
+        # Ctrl-C reaches the children through the process group; the parent just waits for them
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for worker in workers:
+            worker.join()
+        failed = [w.pid for w in workers if w.exitcode]
+        if failed:
+            raise CommandError(f"Workers exited with errors: {', '.join(map(str, failed))}")
+        self.stdout.write(self.style.SUCCESS("Image workers stopped."))
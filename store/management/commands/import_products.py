@@ -0,0 +1,54 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...importer import IMPORT_FORMATS, guess_format, import_products
+from ...recommender import compute_product_similarities, warm_cache
+
+
+class Command(BaseCommand):
+    help = "Upsert products from a CSV or JSONL file (or stdin) in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for stdin")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension")
+        parser.add_argument(
+            "--batch-size", type=int, default=getattr(settings, "STORE_IMPORT_BATCH_SIZE", 1000),
+            help="Products per INSERT ... ON CONFLICT statement",
+        )
+        parser.add_argument("--no-create-categories", action="store_true", help="Reject unknown category slugs")
+        parser.add_argument("--skip-vectors", action="store_true", help="Do not rebuild more-like-this vectors")
+        parser.add_argument("--warm-recommender", action="store_true", help="Recompute recommendations afterwards")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or guess_format(path)
+        if format is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format")
+
+        start = time.perf_counter()
+        try:
+            stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with stream:
+            result = import_products(
+                stream,
+                format,
+                batch_size=options["batch_size"],
+                create_categories=not options["no_create_categories"],
+                rebuild_vectors=not options["skip_vectors"],
+            )
+        elapsed = time.perf_counter() - start
+
+        for line_num, message in result.errors:
+            self.stderr.write(f"line {line_num}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created}, updated {result.updated}, skipped {result.skipped} products "
+            f"({result.categories_created} new categories) in {elapsed:.2f}s"
+        ))
+        if options["warm_recommender"]:
+            warm_cache(compute_product_similarities())
+            self.stdout.write(self.style.SUCCESS("Recommendation cache warmed."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ...sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete product tombstones older than STORE_SYNC_TOMBSTONE_RETENTION_DAYS; sync "
+        "tokens from before then are answered 410 and start over (run daily)"
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} tombstones"))
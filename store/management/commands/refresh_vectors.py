@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from ...vectors import rebuild_product_vectors, refresh_product_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        "Store text vectors for products created or edited since theirs was saved (run every "
+        "few minutes); --all recomputes every vector against fresh document frequencies"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild every vector, not only stale ones")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Vectors per write")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            count = rebuild_product_vectors(batch_size=options["batch_size"])
+        else:
+            count = refresh_product_vectors(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Text vectors stored for {count} products."))
@@ -1,12 +1,34 @@
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
+from store.importer import refresh_derived_data
 from store.models import Category, Product
+from store.synthetic import load_dataset
 from decimal import Decimal
 
 class Command(BaseCommand):
-    help = 'Seed the database with sample data'
+    help = (
+        'Seed the database with sample data; --products/--users/--orders add a large '
+        'synthetic dataset on top (e.g. for the bench_* commands)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=0, help='Synthetic products to add')
+        parser.add_argument('--users', type=int, default=0, help='Synthetic users to add, with carts and wishlists')
+        parser.add_argument('--orders', type=int, default=0, help='Synthetic orders to add, from existing users')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk INSERT')
+        parser.add_argument('--skip-vectors', action='store_true',
+                            help='Do not rebuild the more-like-this text vectors after adding products')
 
     def handle(self, *args, **options):
+        for name in ('products', 'users', 'orders'):
+            if options[name] < 0:
+                raise CommandError(f'--{name} must not be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
         # Create admin user if it doesn't exist
         if not User.objects.filter(username='admin').exists():
             User.objects.create_superuser('admin', 'admin@hamaroghara.com', 'admin123')
@@ -73,4 +95,26 @@ class Command(BaseCommand):
             if created:
                 self.stdout.write(f'Created product: {product.name}')
 
-        self.stdout.write(self.style.SUCCESS('Database seeded successfully!'))
\ No newline at end of file
+        if options['products'] or options['users'] or options['orders']:
+            self._synthetic(options)
+
+        self.stdout.write(self.style.SUCCESS('Database seeded successfully!'))
+
+    def _synthetic(self, options):
+        start = time.perf_counter()
+        counts = load_dataset(
+            products=options['products'],
+            users=options['users'],
+            orders=options['orders'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        if counts.products:
+            # bulk_create sent no signals: bring search indexes and vectors up to date
+            refresh_derived_data(rebuild_vectors=not options['skip_vectors'])
+        self.stdout.write(
+            f'Synthetic data: {counts.products} products, {counts.users} users, {counts.carts} cart rows, '
+            f'{counts.wishlists} wishlist rows, {counts.orders} orders ({counts.order_items} items) '
+            f'in {time.perf_counter() - start:.1f}s'
+        )
\ No newline at end of file
@@ -1,14 +1,38 @@
 from django.core.management.base import BaseCommand
 
-from ...subcategory_model import train_and_cache_subcategories
+from ...clustering import BACKENDS
+from ...subcategory_model import get_training_report, train_and_cache_subcategories
+from ...vectors import rebuild_product_vectors
 
 
 class Command(BaseCommand):
     help = "Train TF-IDF + KMeans subcategory model and cache product->subcategory mapping"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend",
+            choices=sorted(BACKENDS),
+            default="sklearn",
+            help="Clustering backend; falls back to numpy, then single, if its imports fail",
+        )
+        parser.add_argument(
+            "--skip-vectors",
+            action="store_true",
+            help="Do not rebuild the persisted product text vectors used by more-like-this",
+        )
+
     def handle(self, *args, **options):
-        self.stdout.write(self.style.NOTICE("Training subcategory model..."))
-        mapping = train_and_cache_subcategories()
+        self.stdout.write(self.style.NOTICE(f"Training subcategory model (backend={options['backend']})..."))
+        mapping = train_and_cache_subcategories(backend=options["backend"])
+        report = get_training_report() or {}
+        for note in report.get("notes", []):
+            self.stdout.write(self.style.WARNING(note))
+        self.stdout.write(
+            f"Backend: {report.get('backend')} (requested {report.get('requested')}), "
+            f"import {report.get('import_seconds')}s, train {report.get('train_seconds')}s, "
+            f"peak RSS {report.get('peak_rss_kb')} KiB (+{report.get('rss_growth_kb')} KiB)"
+        )
         self.stdout.write(self.style.SUCCESS(f"Subcategory mapping cached for {len(mapping)} products."))
-
-
+        if not options["skip_vectors"]:
+            count = rebuild_product_vectors()
+            self.stdout.write(self.style.SUCCESS(f"Text vectors stored for {count} products."))
@@ -0,0 +1,38 @@
+# FTS5 mirror of store_product(name, description) for the "fts" search backend.
+# SQLite only: other database vendors skip this migration.
+
+from django.db import migrations
+
+from store.search import FTS_CREATE_TABLE, FTS_REBUILD, FTS_TABLE, FTS_TRIGGERS
+
+CREATE_SQL = [
+    FTS_CREATE_TABLE,
+    *FTS_TRIGGERS.values(),
+    # Index rows that existed before the triggers
+    FTS_REBUILD,
+]
+
+DROP_SQL = [
+    *(f"DROP TRIGGER IF EXISTS {name}" for name in reversed(FTS_TRIGGERS)),
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0002_profile"),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_product_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVector',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text_vector', serialize=False, to='store.product')),
+                ('terms', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
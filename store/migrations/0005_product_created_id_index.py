@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_product_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at', '-id'], name='store_produ_created_68f480_idx'),
+        ),
+    ]
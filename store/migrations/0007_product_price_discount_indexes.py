@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:30
+
+from django.db import migrations, models
+import store.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_product_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price'], name='store_produ_categor_ca64c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(store.models.DiscountPercentage(), name='store_product_discount_idx'),
+        ),
+    ]
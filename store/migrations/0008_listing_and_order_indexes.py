@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_product_price_discount_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='store_order_user_id_f28375_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['tracking_number'], name='store_order_trackin_132e03_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('in_stock', True)), fields=['category', '-created_at', '-id'], name='store_product_cat_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('featured', True), ('in_stock', True)), fields=['-created_at', '-id'], name='store_product_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('best_selling', True), ('in_stock', True)), fields=['-created_at', '-id'], name='store_product_bestsell_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_listing_and_order_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_digest',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='picture_digest',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
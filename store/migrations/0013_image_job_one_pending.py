@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 23:14
+
+from django.db import migrations, models
+
+
+def drop_duplicate_pending(apps, schema_editor):
+    """Keep the oldest pending job per row; the others would only repeat it."""
+    ImageJob = apps.get_model('store', 'ImageJob')
+    seen = set()
+    duplicates = []
+    for job_id, kind, object_id in ImageJob.objects.filter(status='pending').order_by('id').values_list('id', 'kind', 'object_id'):
+        if (kind, object_id) in seen:
+            duplicates.append(job_id)
+        seen.add((kind, object_id))
+    ImageJob.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_catalog_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_pending, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='imagejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('kind', 'object_id'), name='store_imagejob_one_pending'),
+        ),
+    ]
@@ -1,15 +1,26 @@
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 from PIL import Image
 
+from .images import image_variants
+
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profile_picture = models.ImageField(upload_to='profile_pics/', default='profile_pics/default.jpg')
+    # SHA-256 of profile_picture, naming its resized copies (see store/images.py); blank until generated
+    picture_digest = models.CharField(max_length=64, blank=True, editable=False)
 
     def __str__(self):
         return f'{self.user.username} Profile'
 
+    @property
+    def picture_variants(self):
+        return image_variants(self.picture_digest)
+
 class Category(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
@@ -27,6 +38,59 @@ class Category(models.Model):
     def get_absolute_url(self):
         return reverse('store:category_detail', args=[self.slug])
 
+def discount_percentage(price, original_price):
+    """Whole-percent discount of ``price`` off ``original_price`` (0 when not discounted)."""
+    if original_price and original_price > price:
+        discount = ((original_price - price) / original_price) * 100
+        # Halves round up, as SQL ROUND does in DiscountPercentage
+        return int(Decimal(discount).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    return 0
+
+class DiscountPercentage(models.Expression):
+    """``discount_percentage`` as SQL, so the database can filter and sort on it.
+
+    The constants are written into the SQL rather than passed as
+    parameters: SQLite only uses an expression index when the query's
+    expression is textually the same as the indexed one.
+    """
+    output_field = models.IntegerField()
+    template = (
+        "(CASE WHEN %(original_price)s > %(price)s "
+        "THEN CAST(ROUND((%(original_price)s - %(price)s) * 100.0 / %(original_price)s) AS INTEGER) "
+        "ELSE 0 END)"
+    )
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False):
+        clone = self.copy()
+        clone.is_summary = summarize
+        clone.price = models.F('price').resolve_expression(query, allow_joins, reuse, summarize, for_save)
+        clone.original_price = models.F('original_price').resolve_expression(
+            query, allow_joins, reuse, summarize, for_save
+        )
+        return clone
+
+    def as_sql(self, compiler, connection):
+        price, price_params = compiler.compile(self.price)
+        original_price, original_params = compiler.compile(self.original_price)
+        sql = self.template % {"price": price, "original_price": original_price}
+        # original_price appears three times and price twice in the template
+        return sql, (*original_params, *price_params, *original_params, *price_params, *original_params)
+
+    def get_source_expressions(self):
+        return [getattr(self, "price", None), getattr(self, "original_price", None)]
+
+    def set_source_expressions(self, exprs):
+        self.price, self.original_price = exprs
+
+    def __eq__(self, other):
+        return isinstance(other, DiscountPercentage)
+
+    def __hash__(self):
+        return hash(DiscountPercentage)
+
+    def __repr__(self):
+        return 'DiscountPercentage()'
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
@@ -35,6 +99,8 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     original_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     image = models.ImageField(upload_to='products/%Y/%m/%d/', blank=True)
+    # SHA-256 of image, naming its resized copies (see store/images.py); blank until generated
+    image_digest = models.CharField(max_length=64, blank=True, editable=False)
     in_stock = models.BooleanField(default=True)
     featured = models.BooleanField(default=False)
     best_selling = models.BooleanField(default=False)
@@ -48,6 +114,29 @@ class Product(models.Model):
             models.Index(fields=['category']),
             models.Index(fields=['featured']),
             models.Index(fields=['best_selling']),
+            # Keyset pagination seeks on (created_at, id)
+            models.Index(fields=['-created_at', '-id']),
+            # The delta sync feed seeks on (updated_at, id)
+            models.Index(fields=['updated_at', 'id']),
+            # Price range filters and price sorting within a category
+            models.Index(fields=['category', 'price']),
+            models.Index(DiscountPercentage(), name='store_product_discount_idx'),
+            # Category pages and related products: in-stock products of a category, newest first.
+            # Partial indexes, because Django writes boolean filters as a bare column
+            # ("in_stock"), which SQLite cannot use as an equality on an index column.
+            models.Index(
+                fields=['category', '-created_at', '-id'], condition=models.Q(in_stock=True),
+                name='store_product_cat_stock_idx',
+            ),
+            # Home page rows, each holding only the few flagged products
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(featured=True, in_stock=True),
+                name='store_product_featured_idx',
+            ),
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(best_selling=True, in_stock=True),
+                name='store_product_bestsell_idx',
+            ),
         ]
 
     def __str__(self):
@@ -57,10 +146,77 @@ class Product(models.Model):
         return reverse('store:product_detail', args=[self.slug])
 
     def get_discount_percentage(self):
-        if self.original_price and self.original_price > self.price:
-            discount = ((self.original_price - self.price) / self.original_price) * 100
-            return round(discount)
-        return 0
+        return discount_percentage(self.price, self.original_price)
+
+    @property
+    def image_variants(self):
+        """Thumbnail and srcset URLs of the image, or None until they are generated."""
+        return image_variants(self.image_digest)
+
+class ProductVector(models.Model):
+    """L2-normalized sparse TF-IDF vector of a product's name and description."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='text_vector')
+    terms = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Vector for {self.product_id} ({len(self.terms)} terms)'
+
+class ProductTombstone(models.Model):
+    """Marker left by a deleted product so sync clients can drop their copy."""
+    product_id = models.BigIntegerField()
+    slug = models.SlugField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f'Deleted product {self.product_id} ({self.slug})'
+
+class CatalogVersion(models.Model):
+    """Single row holding the shared catalog version (see store/catalog.py)."""
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f'Catalog version {self.version}'
+
+class ImageJob(models.Model):
+    """Queued resize of an uploaded image, run by the image_worker command (see store/jobs.py)."""
+    KIND_CHOICES = [
+        ('product', 'Product image'),
+        ('profile', 'Profile picture'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Workers poll for the oldest due pending job
+            models.Index(fields=['run_after', 'id'], condition=models.Q(status='pending'), name='store_imagejob_due_idx'),
+        ]
+        constraints = [
+            # One pending job per row: it processes whatever image the row holds when it runs
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], condition=models.Q(status='pending'), name='store_imagejob_one_pending',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id} ({self.status})'
 
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -107,6 +263,11 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history, newest first
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['tracking_number']),
+        ]
 
     def __str__(self):
         return f'Order #{self.id} - {self.user.username}'
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+
+from .models import Product
+
+# Columns the product card templates read (get_discount_percentage needs both
+# prices, image_variants the digest) plus created_at for keyset cursors
+PRODUCT_CARD_FIELDS = (
+    "id", "slug", "name", "description", "image", "image_digest", "price", "original_price", "in_stock",
+    "created_at",
+)
+
+# Newest first, with id breaking created_at ties so the order is total
+KEYSET_ORDERING = ("-created_at", "-id")
+
+# ?ordering= values for product listings; id breaks ties in the same direction.
+# "discount" is the DiscountPercentage alias the caller adds to the queryset.
+PRODUCT_ORDERINGS = {
+    "-created_at": KEYSET_ORDERING,
+    "created_at": ("created_at", "id"),
+    "price": ("price", "id"),
+    "-price": ("-price", "-id"),
+    "discount": ("discount", "id"),
+    "-discount": ("-discount", "-id"),
+    "name": ("name", "id"),
+    "-name": ("-name", "-id"),
+}
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of ``encode_cursor``; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
+
+
+@dataclass
+class KeysetPage:
+    items: List[Any]
+    next_cursor: Optional[str]
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def seek(queryset: QuerySet[Product], cursor: Optional[str], page_size: int) -> QuerySet[Product]:
+    """The rows after ``cursor``, plus one extra that tells whether another page exists.
+
+    Raises ValueError for a malformed cursor.
+    """
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        # The redundant created_at <= bound gives SQLite a range to seek to; the OR
+        # alone makes it walk the index from the start
+        queryset = queryset.filter(Q(created_at__lte=created_at), Q(created_at__lt=created_at) | Q(id__lt=pk))
+    return queryset[:page_size + 1]
+
+
+def split_page(
+    items: List[Any], page_size: int, key: Optional[Callable[[Any], Tuple[datetime, int]]] = None
+) -> KeysetPage:
+    """Trim the look-ahead row from ``seek`` results and derive the next cursor.
+
+    ``key`` returns (created_at, id) for an item; the default reads model
+    attributes, pass one for dict rows.
+    """
+    key = key or (lambda item: (item.created_at, item.id))
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(*key(items[-1]))
+    return KeysetPage(items, next_cursor)
+
+
+def keyset_page(queryset: QuerySet[Product], cursor: Optional[str], page_size: int) -> KeysetPage:
+    """The ``page_size`` products after ``cursor`` in (created_at, id) descending order.
+
+    Seeks with an indexed range condition instead of OFFSET, so deep pages
+    cost the same as the first and rows inserted meanwhile never shift a
+    page.
+    """
+    return split_page(list(seek(queryset, cursor, page_size).iterator(chunk_size=page_size + 1)), page_size)
+
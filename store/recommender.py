@@ -10,6 +10,7 @@ from django.db.models import QuerySet
 
 from .models import Cart, Product
 from .subcategory_model import get_product_subcategory
+from .text import tokenize
 
 
 # Cache keys
@@ -43,8 +44,7 @@ def extract_product_features(products: QuerySet[Product]) -> Dict[int, ProductFe
         "best_selling",
         "name",
     ):
-        # lowercase alphanumeric tokenization
-        tokens = {t for t in ''.join(ch.lower() if ch.isalnum() else ' ' for ch in p.name).split() if t}
+        tokens = set(tokenize(p.name))
         features[p.id] = ProductFeatures(
             product_id=p.id,
             category_id=p.category_id or 0,
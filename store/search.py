@@ -0,0 +1,517 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import Q, QuerySet
+
+from .catalog import get_catalog_version
+from .facets import get_facet_index
+from .fuzzy import get_trigram_index
+from .models import Product
+from .text import STOP_WORDS, tokenize
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters; name tokens count NAME_WEIGHT times (a cheap BM25F)
+BM25_K1 = 1.2
+BM25_B = 0.75
+NAME_WEIGHT = 3
+# Cap on how many vocabulary terms the trailing query word may expand to
+PREFIX_EXPANSIONS = 50
+
+# Filter name -> Product attribute; each (name, value) pair owns a posting set
+FILTER_FIELDS = {
+    "in_stock": "in_stock",
+    "featured": "featured",
+    "best_selling": "best_selling",
+    "category_id": "category_id",
+}
+
+
+def query_terms(query: str) -> List[str]:
+    terms = tokenize(query)
+    return [t for t in terms if t not in STOP_WORDS] or terms
+
+
+class FilterView:
+    """Products matching every filter, tested against the live posting sets.
+
+    No intersection is built, so a membership test costs one lookup per
+    filter; for callers that only check a few candidate ids.
+    """
+
+    __slots__ = ("_sets",)
+
+    def __init__(self, sets: Sequence[Set[int]]) -> None:
+        self._sets = sets
+
+    def __contains__(self, product_id: object) -> bool:
+        return all(product_id in ids for ids in self._sets)
+
+
+class SearchIndex:
+    """In-process inverted index over product name and description.
+
+    Postings map term -> {product_id: weighted tf}. Filters are posting sets
+    too, so ``in_stock``/category restrictions are set intersections rather
+    than per-document checks. The index is per process: signals keep it
+    current for writes made here, and ``max_age`` bounds staleness from writes
+    made by other processes (or by ``QuerySet.update``, which sends no signals).
+    """
+
+    def __init__(self, max_age: float = 300.0) -> None:
+        self.max_age = max_age
+        self.built_at = 0.0
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self._doc_filters: Dict[int, Tuple[Tuple[str, object], ...]] = {}
+        self._filters: Dict[Tuple[str, object], Set[int]] = defaultdict(set)
+        self._total_length = 0
+        self._vocab: List[str] = []
+        self._vocab_dirty = False
+
+    # -- maintenance -------------------------------------------------------
+
+    @staticmethod
+    def source_queryset() -> QuerySet[Product]:
+        return Product.objects.only("id", "name", "description", *FILTER_FIELDS.values())
+
+    def build(self, products: Optional[Iterable[Product]] = None) -> None:
+        fresh = SearchIndex(self.max_age)
+        for product in products if products is not None else self.source_queryset().iterator(chunk_size=2000):
+            fresh._add(product)
+        with self._lock:
+            self._postings = fresh._postings
+            self._lengths = fresh._lengths
+            self._doc_terms = fresh._doc_terms
+            self._doc_filters = fresh._doc_filters
+            self._filters = fresh._filters
+            self._total_length = fresh._total_length
+            self._vocab_dirty = True
+            self.built_at = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        if not self.built_at or time.monotonic() - self.built_at > self.max_age:
+            self.build()
+
+    def index_product(self, product: Product) -> None:
+        with self._lock:
+            self._remove(product.id)
+            self._add(product)
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            self._remove(product_id)
+
+    def _add(self, product: Product) -> None:
+        tf: Counter = Counter()
+        for term in tokenize(product.name):
+            tf[term] += NAME_WEIGHT
+        tf.update(tokenize(product.description))
+        for term, count in tf.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._vocab_dirty = True
+            postings[product.id] = count
+        length = sum(tf.values())
+        self._lengths[product.id] = length
+        self._total_length += length
+        self._doc_terms[product.id] = tuple(tf)
+
+        keys = tuple((name, getattr(product, attr)) for name, attr in FILTER_FIELDS.items())
+        for key in keys:
+            self._filters[key].add(product.id)
+        self._doc_filters[product.id] = keys
+
+    def _remove(self, product_id: int) -> None:
+        for term in self._doc_terms.pop(product_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocab_dirty = True
+        self._total_length -= self._lengths.pop(product_id, 0)
+        for key in self._doc_filters.pop(product_id, ()):
+            self._filters[key].discard(product_id)
+
+    # -- querying ----------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        start = bisect.bisect_left(self._vocab, prefix)
+        matches: List[str] = []
+        for term in self._vocab[start:start + PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    def filter_ids(self, **filters: object) -> Optional[Set[int]]:
+        """Intersect the posting sets for the given filters (None = unfiltered)."""
+        sets = [self._filters.get((name, value), set()) for name, value in filters.items() if value is not None]
+        if not sets:
+            return None
+        sets.sort(key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+        return result
+
+    def filter_view(self, **filters: object) -> Optional[FilterView]:
+        """Like ``filter_ids`` without copying or intersecting the posting sets."""
+        sets = [self._filters.get((name, value), set()) for name, value in filters.items() if value is not None]
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return FilterView(sets)
+
+    def search(self, query: str, limit: Optional[int] = None, prefix: bool = True, **filters: object) -> List[int]:
+        """Ranked product ids matching every query term (BM25, best first).
+
+        With ``prefix`` the last term also matches longer vocabulary terms, so
+        partially typed words ("dri" -> "drill", "driver") still hit.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            # Each group is the list of index terms that satisfy one query term
+            groups: List[List[str]] = [[t] for t in terms]
+            if prefix:
+                groups[-1] = self._expand_prefix(terms[-1]) or groups[-1]
+
+            matches: List[Set[int]] = []
+            for group in groups:
+                docs: Set[int] = set()
+                for term in group:
+                    docs.update(self._postings.get(term, ()))
+                if not docs:
+                    return []
+                matches.append(docs)
+
+            allowed = self.filter_ids(**filters)
+            if allowed is not None:
+                matches.append(allowed)
+            matches.sort(key=len)
+            candidates = set(matches[0])
+            for docs in matches[1:]:
+                candidates &= docs
+                if not candidates:
+                    return []
+
+            n_docs = len(self._lengths)
+            avg_len = (self._total_length / n_docs) if n_docs else 1.0
+            scores: Dict[int, float] = dict.fromkeys(candidates, 0.0)
+            for group in groups:
+                for term in group:
+                    postings = self._postings.get(term)
+                    if not postings:
+                        continue
+                    idf = math.log(1.0 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for pid in candidates.intersection(postings):
+                        tf = postings[pid]
+                        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._lengths[pid] / avg_len)
+                        scores[pid] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+        # Ties go to the newest product, matching Product.Meta.ordering
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], -pid))
+        return ranked[:limit] if limit else ranked
+
+
+product_index = SearchIndex(max_age=getattr(settings, "STORE_SEARCH_INDEX_MAX_AGE", 300))
+
+
+def get_search_index() -> SearchIndex:
+    product_index.ensure_fresh()
+    return product_index
+
+
+def _db_search(query: str, limit: Optional[int], **filters: object) -> List[int]:
+    queryset = Product.objects.filter(Q(name__icontains=query) | Q(description__icontains=query))
+    queryset = queryset.filter(**{name: value for name, value in filters.items() if value is not None})
+    ids = queryset.values_list("id", flat=True)
+    return list(ids[:limit] if limit else ids)
+
+
+def _index_search(query: str, limit: Optional[int], **filters: object) -> List[int]:
+    return get_search_index().search(query, limit=limit, **filters)
+
+
+FTS_TABLE = "store_product_fts"
+# bm25() column weights for (name, description), mirroring NAME_WEIGHT
+FTS_WEIGHTS = (3.0, 1.0)
+# External-content FTS5 mirror of store_product(name, description); migration 0003 creates it
+FTS_CREATE_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='store_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+"""
+# Reindexes every product, including writes made while the triggers were missing
+FTS_REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+# Triggers keeping the FTS table in step with store_product; migration 0003 creates them and
+# ensure_fts_triggers puts back any a later table rebuild dropped
+FTS_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON store_product BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON store_product BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    """,
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description ON store_product BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+}
+
+
+def ensure_fts_triggers(using: str = "default") -> List[str]:
+    """Recreate any missing FTS trigger and reindex; returns the names recreated.
+
+    SQLite drops a table's triggers whenever a migration rebuilds it (most
+    schema changes to store_product do), so this runs after every migrate.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return []
+    with db.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE name LIKE %s", [f"{FTS_TABLE}%"])
+        existing = {name for kind, name in cursor.fetchall()}
+        if FTS_TABLE not in existing:
+            # Migrations have not reached 0003 (or were rolled back past it)
+            return []
+        missing = [name for name in FTS_TRIGGERS if name not in existing]
+        if missing:
+            logger.warning("Recreating dropped FTS triggers %s and rebuilding %s", ", ".join(missing), FTS_TABLE)
+            for name in missing:
+                cursor.execute(FTS_TRIGGERS[name])
+            # Writes made while a trigger was missing never reached the index
+            cursor.execute(FTS_REBUILD)
+    return missing
+
+
+def fts_match_expression(query: str) -> str:
+    """FTS5 MATCH string: every term required, the last one as a prefix."""
+    terms = query_terms(query)
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _fts_search(query: str, limit: Optional[int], **filters: object) -> List[int]:
+    # The FTS5 table only exists on SQLite (migration 0003)
+    if connection.vendor != "sqlite":
+        return _db_search(query, limit, **filters)
+    match = fts_match_expression(query)
+    if not match:
+        return []
+
+    where = [f"{FTS_TABLE} MATCH %s"]
+    params: List[object] = [match]
+    for name, value in filters.items():
+        if value is not None:
+            where.append(f"p.{FILTER_FIELDS[name]} = %s")
+            params.append(value)
+    sql = (
+        f"SELECT p.id FROM {FTS_TABLE} f JOIN store_product p ON p.id = f.rowid "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY bm25({FTS_TABLE}, {', '.join(str(w) for w in FTS_WEIGHTS)}), p.id DESC"
+    )
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+SEARCH_BACKENDS = {
+    "db": _db_search,
+    "index": _index_search,
+    "fts": _fts_search,
+}
+
+
+def search_product_ids(
+    query: str,
+    *,
+    in_stock: Optional[bool] = None,
+    featured: Optional[bool] = None,
+    best_selling: Optional[bool] = None,
+    category_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    backend: Optional[str] = None,
+) -> List[int]:
+    """Ranked ids of products matching ``query`` via the configured backend.
+
+    ``backend`` defaults to ``settings.STORE_SEARCH_BACKEND``: "index" for the
+    in-process BM25 index, "fts" for SQLite FTS5, "db" for the original
+    ``icontains`` scan.
+    """
+    name = backend or getattr(settings, "STORE_SEARCH_BACKEND", "index")
+    try:
+        search = SEARCH_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown search backend {name!r}; choose from {', '.join(SEARCH_BACKENDS)}")
+    return search(
+        query,
+        limit,
+        in_stock=in_stock,
+        featured=featured,
+        best_selling=best_selling,
+        category_id=category_id,
+    )
+
+
+def fuzzy_search_product_ids(query: str, limit: Optional[int] = None, **filters: object) -> List[int]:
+    """Typo-tolerant fallback: trigram candidates re-ranked by edit distance."""
+    allowed = get_search_index().filter_ids(**{k: v for k, v in filters.items() if v is not None})
+    return get_trigram_index().search(query, allowed=allowed, limit=limit)
+
+
+def products_in_order(ids: List[int], queryset: Optional[QuerySet[Product]] = None) -> List[Product]:
+    """Hydrate ``ids`` with one query, preserving rank order and skipping misses."""
+    if not ids:
+        return []
+    queryset = Product.objects.all() if queryset is None else queryset
+    found = queryset.in_bulk(ids)
+    return [found[i] for i in ids if i in found]
+
+
+
+# -- result cache ---------------------------------------------------------
+
+SEARCH_CACHE_KEY_TMPL = "store:search:{version}:{digest}:v1"
+
+
+@dataclass
+class SearchPage:
+    ids: List[int]
+    count: int
+    page: int
+    num_pages: int
+    facets: Optional[Dict[str, object]] = None
+    fuzzy: bool = False
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.num_pages
+
+    @property
+    def has_previous(self) -> bool:
+        return self.page > 1
+
+
+class SearchCacheStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self) -> Dict[str, object]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "catalog_version": get_catalog_version(),
+        }
+
+
+search_cache_stats = SearchCacheStats()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def cached_search(
+    query: str,
+    *,
+    page: int = 1,
+    page_size: Optional[int] = None,
+    facets: bool = False,
+    backend: Optional[str] = None,
+    **filters: object,
+) -> SearchPage:
+    """One page of ranked search results, cached per catalog version.
+
+    Entries are keyed by normalized query, filters, page and backend and hold
+    only product ids (plus the total and, when asked, facet counts), so a hit
+    costs one cache read and the caller's single hydration query. Any product
+    or category write bumps the catalog version and orphans every entry.
+    When the exact backend finds nothing the typo-tolerant trigram search
+    runs instead and the page is marked ``fuzzy``.
+    """
+    backend = backend or getattr(settings, "STORE_SEARCH_BACKEND", "index")
+    filters = {name: value for name, value in filters.items() if value is not None}
+    spec = json.dumps([normalize_query(query), sorted(filters.items()), page, page_size, facets, backend])
+    key = SEARCH_CACHE_KEY_TMPL.format(
+        version=get_catalog_version(), digest=hashlib.sha1(spec.encode()).hexdigest()
+    )
+    entry = cache.get(key)
+    search_cache_stats.record(entry is not None)
+    if entry is not None:
+        return SearchPage(*entry)
+
+    ids = search_product_ids(query, backend=backend, **filters)
+    fuzzy = False
+    if not ids and getattr(settings, "STORE_SEARCH_FUZZY_FALLBACK", True):
+        ids = fuzzy_search_product_ids(query, **filters)
+        fuzzy = bool(ids)
+    num_pages = max(1, math.ceil(len(ids) / page_size)) if page_size else 1
+    # Out-of-range pages clamp to the last page, like Paginator.get_page
+    page = min(max(1, page), num_pages)
+    page_ids = ids[(page - 1) * page_size:page * page_size] if page_size else ids
+    facet_counts = None
+    if facets:
+        facet_index = get_facet_index()
+        facet_counts = facet_index.counts(facet_index.bitmap_from_ids(ids))
+
+    result = SearchPage(page_ids, len(ids), page, num_pages, facet_counts, fuzzy)
+    cache.set(key, (result.ids, result.count, result.page, result.num_pages, result.facets, result.fuzzy),
+              timeout=getattr(settings, "STORE_SEARCH_CACHE_TIMEOUT", 300))
+    return result
@@ -1,7 +1,18 @@
-from django.db.models.signals import post_save
+import os
+
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save, pre_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import Profile
+from .models import Category, Product, ProductTombstone, Profile
+from .catalog import bump_catalog_version
+from .facets import facet_index
+from .images import strip_metadata
+from .fuzzy import trigram_index
+from .jobs import enqueue, kind_of
+from .search import ensure_fts_triggers, product_index
+from .suggest import suggester
+from .vectors import vector_index
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
@@ -11,3 +22,121 @@ def create_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+# Image uploads: remember the file name each row was loaded with, so a save can tell
+# whether the file changed (form upload, FieldFile.save or a plain assignment).
+# Reads __dict__ so a deferred image column is not fetched just for this.
+IMAGE_FIELDS = {Product: ('image', 'image_digest'), Profile: ('profile_picture', 'picture_digest')}
+
+def _file_name(value):
+    return getattr(value, 'name', value)
+
+def _strip_original(instance, field, file):
+    """Drop the upload's Exif/XMP metadata before it is stored (or, if already stored, in place)."""
+    if not file._committed:
+        file.file.seek(0)
+        data = file.file.read()
+        stripped = strip_metadata(data)
+        file.file.seek(0)
+        if stripped != data:
+            # Assigning a new file leaves it uncommitted, so FileField.pre_save stores it
+            setattr(instance, field, ContentFile(stripped, name=os.path.basename(file.name)))
+        return getattr(instance, field)
+    # FieldFile.save() stores the file before saving the row
+    with file.storage.open(file.name, 'rb') as stream:
+        data = stream.read()
+    stripped = strip_metadata(data)
+    if stripped != data:
+        file.storage.delete(file.name)
+        file.name = file.storage.save(file.name, ContentFile(stripped))
+    return file
+
+@receiver(post_init, sender=Product)
+@receiver(post_init, sender=Profile)
+def remember_image(sender, instance, **kwargs):
+    instance._loaded_image = _file_name(instance.__dict__.get(IMAGE_FIELDS[sender][0]))
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Profile)
+def note_image_change(sender, instance, **kwargs):
+    field, digest_field = IMAGE_FIELDS[sender]
+    if field not in instance.__dict__:
+        # Deferred: this save does not write the image
+        instance._queue_image = False
+        return
+    file = getattr(instance, field)
+    changed = not file._committed or file.name != instance._loaded_image
+    if changed or not file:
+        # The old digest no longer applies, and neither does any digest for a cleared field
+        setattr(instance, digest_field, '')
+    if changed and file and file.name != sender._meta.get_field(field).default:
+        # Originals are served publicly until (and besides) their derivatives
+        file = _strip_original(instance, field, file)
+    # A new file, or one still without derivatives (this save may even have written a stale
+    # blank digest over a worker's), is queued once the row is written. The default profile
+    # picture is shared by every profile and left to generate_image_variants.
+    instance._queue_image = (
+        bool(file) and not getattr(instance, digest_field) and file.name != sender._meta.get_field(field).default
+    )
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Profile)
+def queue_image(sender, instance, **kwargs):
+    field, _ = IMAGE_FIELDS[sender]
+    instance._loaded_image = _file_name(instance.__dict__.get(field))
+    if instance._queue_image:
+        instance._queue_image = False
+        # The request returns now; image_worker resizes it
+        enqueue(kind_of(sender), instance.pk)
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    bump_catalog_version()
+    # Only patch an index that has been built; an unbuilt one loads everything lazily
+    if product_index.built_at:
+        product_index.index_product(instance)
+    if suggester.built_at:
+        suggester.update_product(instance)
+    if facet_index.built_at:
+        facet_index.update_product(instance)
+    if trigram_index.built_at:
+        trigram_index.update_product(instance)
+    if vector_index.built_at:
+        vector_index.update_product(instance.id, instance.name, instance.description)
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    bump_catalog_version()
+    ProductTombstone.objects.create(product_id=instance.id, slug=instance.slug)
+    if product_index.built_at:
+        product_index.remove_product(instance.id)
+    if suggester.built_at:
+        suggester.remove_product(instance.id)
+    if facet_index.built_at:
+        facet_index.remove_product(instance.id)
+    if trigram_index.built_at:
+        trigram_index.remove_product(instance.id)
+    if vector_index.built_at:
+        vector_index.remove_product(instance.id)
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    bump_catalog_version()
+    if suggester.built_at:
+        suggester.update_category(instance)
+    if facet_index.built_at:
+        facet_index.update_category(instance)
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    bump_catalog_version()
+    if suggester.built_at:
+        suggester.remove_category(instance.id)
+    if facet_index.built_at:
+        facet_index.remove_category(instance.id)
+
+@receiver(post_migrate)
+def restore_fts_triggers(sender, using, **kwargs):
+    # Any migration that rebuilt store_product took the FTS triggers with it
+    if sender.name == 'store':
+        ensure_fts_triggers(using)
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import logging
+import time
 from collections import defaultdict
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
+from django.conf import settings
 from django.core.cache import cache
 
+from .clustering import BackendReport, load_backend, max_rss_kb
 from .models import Product
 
+logger = logging.getLogger(__name__)
+
 PRODUCT_SUBCAT_CACHE_KEY = "store:product_subcategories:v1"
+PRODUCT_SUBCAT_REPORT_CACHE_KEY = "store:product_subcategories:report:v1"
 
 
 def _build_corpus() -> Dict[int, List[int]]:
@@ -28,49 +35,65 @@ def _texts_for_products(prod_ids: List[int]) -> List[str]:
     return [id_to_text[i] for i in prod_ids]
 
 
-def train_and_cache_subcategories() -> Dict[int, int]:
-    """Train per-category KMeans clusters on product text and cache mapping.
+def _cluster_count(n_products: int) -> int:
+    # Heuristic: number of clusters based on catalog size for this category
+    # Ensure at least 2 and at most 8
+    return max(2, min(8, max(2, n_products // 4)))
 
-    Returns a dict: product_id -> subcategory_label (int)
+
+def train_subcategories(backend: str | None = None) -> Tuple[Dict[int, int], BackendReport]:
+    """Cluster each category's products with the chosen backend.
+
+    ``backend`` defaults to ``settings.STORE_SUBCATEGORY_BACKEND`` ("numpy"), so
+    web processes never import sklearn; the offline command asks for "sklearn".
+    Returns (product_id -> subcategory_label, report of backend/import/memory cost).
     """
-    try:
-        from sklearn.feature_extraction.text import TfidfVectorizer
-        from sklearn.cluster import KMeans
-    except Exception:
-        # If sklearn isn't available, store empty mapping
-        mapping: Dict[int, int] = {}
-        cache.set(PRODUCT_SUBCAT_CACHE_KEY, mapping, timeout=60 * 60)
-        return mapping
+    model, report = load_backend(backend or getattr(settings, "STORE_SUBCATEGORY_BACKEND", "numpy"))
 
     cat_to_products = _build_corpus()
     product_to_label: Dict[int, int] = {}
 
+    start = time.perf_counter()
     for cat_id, prod_ids in cat_to_products.items():
+        report.categories += 1
+        report.products += len(prod_ids)
         if len(prod_ids) <= 1:
             if prod_ids:
                 product_to_label[prod_ids[0]] = 0
             continue
 
         texts = _texts_for_products(prod_ids)
-        vectorizer = TfidfVectorizer(stop_words="english", max_features=4096, ngram_range=(1, 2))
-        X = vectorizer.fit_transform(texts)
-
-        # Heuristic: number of clusters based on catalog size for this category
-        # Ensure at least 2 and at most 8
-        k = max(2, min(8, max(2, len(prod_ids) // 4)))
         try:
-            model = KMeans(n_clusters=k, n_init=10, random_state=42)
-            labels = model.fit_predict(X)
+            labels = model.fit_predict(texts, _cluster_count(len(prod_ids)))
         except Exception:
-            # Fallback to single cluster if KMeans fails
+            # Fallback to single cluster if clustering fails
+            logger.exception("Subcategory clustering failed for category %s", cat_id)
             labels = [0] * len(prod_ids)
 
         for pid, label in zip(prod_ids, labels):
             # Namespace label by category to avoid collisions
             product_to_label[pid] = (cat_id << 8) + int(label)
 
-    cache.set(PRODUCT_SUBCAT_CACHE_KEY, product_to_label, timeout=60 * 60)
-    return product_to_label
+    report.train_seconds = time.perf_counter() - start
+    report.rss_after_kb = max_rss_kb()
+    return product_to_label, report
+
+
+def train_and_cache_subcategories(backend: str | None = None) -> Dict[int, int]:
+    """Train per-category clusters on product text and cache mapping.
+
+    Returns a dict: product_id -> subcategory_label (int)
+    """
+    mapping, report = train_subcategories(backend)
+    cache.set(PRODUCT_SUBCAT_CACHE_KEY, mapping, timeout=60 * 60)
+    cache.set(PRODUCT_SUBCAT_REPORT_CACHE_KEY, report.as_dict(), timeout=60 * 60)
+    logger.info("Subcategory model trained: %s", report.as_dict())
+    return mapping
+
+
+def get_training_report() -> Dict[str, object] | None:
+    """Backend, import time and memory of the last cached training run."""
+    return cache.get(PRODUCT_SUBCAT_REPORT_CACHE_KEY)
 
 
 def get_product_subcategory(product_id: int) -> int:
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Count, Sum
+
+from .images import IMAGE_WIDTHS, derivative_name
+from .models import Cart, Category, OrderItem, Product
+from .text import tokenize
+
+# Prefixes up to this many characters match too many entries to scan per
+# keystroke: their best TOP_K items are ranked ahead of time instead
+TOP_PREFIX_LENGTH = 3
+TOP_K = 20
+# Ranked candidates kept per short prefix: the spare tail refills the top
+# TOP_K as saves and deletes remove members, so lookups rarely rescan
+TOP_DEPTH = 2 * TOP_K
+# Bonus for matching at the start of the name rather than a later word
+LEADING_MATCH_BONUS = 1.0
+
+# (-score, name, (kind, id)): sorts best first, ties by name
+Ranked = Tuple[float, str, Tuple[str, int]]
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    kind: str  # "product" or "category"
+    id: int
+    name: str
+    slug: str
+    thumbnail: Optional[str]
+    weight: float
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"type": self.kind, "id": self.id, "name": self.name, "slug": self.slug, "thumbnail": self.thumbnail}
+
+
+def _keys(name: str) -> List[str]:
+    """Every word-suffix of the normalized name: "a b c" -> "a b c", "b c", "c"."""
+    words = tokenize(name)
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _short_prefixes(name: str) -> Set[str]:
+    """The prefixes of ``name``'s keys that have a precomputed top-k."""
+    return {key[:n] for key in _keys(name) for n in range(1, min(len(key), TOP_PREFIX_LENGTH) + 1)}
+
+
+class Suggester:
+    """Sorted-array prefix index over product and category names.
+
+    Entries are (key, kind, id, word position) tuples kept sorted so a prefix
+    lookup is one bisect plus a scan of the matching range. Short prefixes,
+    whose ranges span much of the catalog, are answered from a per-prefix
+    ranking made on rebuild and patched in place by saves; only one that
+    has lost its spare tail is ranked again, by the next lookup.
+    Product weights blend cart/order popularity (refreshed on full rebuilds)
+    with the featured/best_selling flags (refreshed on every save), and
+    signals patch single entries in place.
+    """
+
+    def __init__(self, max_age: float = 600.0) -> None:
+        self.max_age = max_age
+        self.built_at = 0.0
+        self._lock = threading.RLock()
+        self._entries: List[Tuple[str, str, int, int]] = []
+        self._items: Dict[Tuple[str, int], Suggestion] = {}
+        self._popularity: Dict[int, float] = {}
+        self._top: Dict[str, List[Ranked]] = {}
+        # Prefixes whose ranking was cut at TOP_DEPTH: every other match scores lower
+        self._cut: Set[str] = set()
+
+    # -- maintenance -------------------------------------------------------
+
+    @staticmethod
+    def _load_popularity() -> Dict[int, float]:
+        counts: Dict[int, float] = {}
+        for row in Cart.objects.values("product_id").annotate(n=Count("id")):
+            counts[row["product_id"]] = counts.get(row["product_id"], 0) + row["n"]
+        for row in OrderItem.objects.values("product_id").annotate(n=Sum("quantity")):
+            # A purchase says more than a cart add
+            counts[row["product_id"]] = counts.get(row["product_id"], 0) + 2 * (row["n"] or 0)
+        return {pid: math.log1p(n) for pid, n in counts.items()}
+
+    def _product_suggestion(self, product: Product) -> Suggestion:
+        weight = self._popularity.get(product.id, 0.0)
+        weight += 1.0 if product.best_selling else 0.0
+        weight += 0.5 if product.featured else 0.0
+        if product.image_digest:
+            # Suggestions render tiny: the smallest derivative
+            thumbnail = default_storage.url(derivative_name(product.image_digest, IMAGE_WIDTHS[0], "jpeg"))
+        else:
+            thumbnail = default_storage.url(product.image.name) if product.image else None
+        return Suggestion("product", product.id, product.name, product.slug, thumbnail, weight)
+
+    @staticmethod
+    def _category_suggestion(category: Category, product_count: int) -> Suggestion:
+        return Suggestion("category", category.id, category.name, category.slug, None, math.log1p(product_count) + 1.0)
+
+    def build(self) -> None:
+        fresh = Suggester(self.max_age)
+        fresh._popularity = self._load_popularity()
+        products = Product.objects.filter(in_stock=True).only(
+            "id", "name", "slug", "image", "image_digest", "featured", "best_selling"
+        )
+        for product in products.iterator(chunk_size=2000):
+            fresh._put(fresh._product_suggestion(product), sort=False)
+        for category in Category.objects.annotate(n=Count("products")):
+            fresh._put(self._category_suggestion(category, category.n), sort=False)
+        fresh._entries.sort()
+        fresh._rank_short_prefixes()
+        with self._lock:
+            self._entries = fresh._entries
+            self._items = fresh._items
+            self._top = fresh._top
+            self._cut = fresh._cut
+            self._popularity = fresh._popularity
+            self.built_at = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        if not self.built_at or time.monotonic() - self.built_at > self.max_age:
+            self.build()
+
+    def _put(self, item: Suggestion, sort: bool = True) -> None:
+        self._items[(item.kind, item.id)] = item
+        for position, key in enumerate(_keys(item.name)):
+            entry = (key, item.kind, item.id, position)
+            if sort:
+                bisect.insort(self._entries, entry)
+            else:
+                self._entries.append(entry)
+        for prefix in _short_prefixes(item.name):
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+            ranked = (-self._score(item, prefix), item.name, (item.kind, item.id))
+            if prefix in self._cut and ranked > top[-1]:
+                # Unranked matches might beat it: leave it out with them
+                continue
+            bisect.insort(top, ranked)
+            if len(top) > TOP_DEPTH:
+                top.pop()
+                self._cut.add(prefix)
+
+    def _drop(self, kind: str, item_id: int) -> None:
+        item = self._items.pop((kind, item_id), None)
+        if item is None:
+            return
+        for prefix in _short_prefixes(item.name):
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+            top[:] = [ranked for ranked in top if ranked[2] != (kind, item_id)]
+            if prefix in self._cut and len(top) < TOP_K:
+                # What ranked next is unknown here: rank again on the next lookup
+                del self._top[prefix]
+                self._cut.discard(prefix)
+        for position, key in enumerate(_keys(item.name)):
+            entry = (key, kind, item_id, position)
+            i = bisect.bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def update_product(self, product: Product) -> None:
+        with self._lock:
+            self._drop("product", product.id)
+            if product.in_stock:
+                self._put(self._product_suggestion(product))
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            self._drop("product", product_id)
+
+    def update_category(self, category: Category) -> None:
+        with self._lock:
+            old = self._items.get(("category", category.id))
+            self._drop("category", category.id)
+            # Keep the product-count weight from the last rebuild
+            weight = old.weight if old else 1.0
+            self._put(Suggestion("category", category.id, category.name, category.slug, None, weight))
+
+    def remove_category(self, category_id: int) -> None:
+        with self._lock:
+            self._drop("category", category_id)
+
+    # -- querying ----------------------------------------------------------
+
+    @staticmethod
+    def _score(item: Suggestion, prefix: str) -> float:
+        """``item``'s weight, plus the bonus if its name (not a later word) starts with ``prefix``."""
+        return item.weight + (LEADING_MATCH_BONUS if " ".join(tokenize(item.name)).startswith(prefix) else 0.0)
+
+    def _ranked(self, scores: Dict[Tuple[str, int], float]) -> List[Ranked]:
+        return sorted((-score, self._items[k].name, k) for k, score in scores.items())
+
+    def _scan(self, prefix: str) -> Dict[Tuple[str, int], float]:
+        """Best score of every item with a key starting with ``prefix``."""
+        scores: Dict[Tuple[str, int], float] = {}
+        for i in range(bisect.bisect_left(self._entries, (prefix,)), len(self._entries)):
+            key, kind, item_id, position = self._entries[i]
+            if not key.startswith(prefix):
+                break
+            item = self._items[(kind, item_id)]
+            score = item.weight + (LEADING_MATCH_BONUS if position == 0 else 0.0)
+            if score > scores.get((kind, item_id), float("-inf")):
+                scores[(kind, item_id)] = score
+        return scores
+
+    def _rank(self, prefix: str, scores: Dict[Tuple[str, int], float]) -> None:
+        self._top[prefix] = self._ranked(scores)[:TOP_DEPTH]
+        if len(scores) > TOP_DEPTH:
+            self._cut.add(prefix)
+        else:
+            self._cut.discard(prefix)
+
+    def _rank_short_prefixes(self) -> None:
+        """Rank the top ``TOP_DEPTH`` items of every prefix up to ``TOP_PREFIX_LENGTH``, in one pass."""
+        scores: Dict[str, Dict[Tuple[str, int], float]] = {}
+        for key, kind, item_id, position in self._entries:
+            score = self._items[(kind, item_id)].weight + (LEADING_MATCH_BONUS if position == 0 else 0.0)
+            for n in range(1, min(len(key), TOP_PREFIX_LENGTH) + 1):
+                best = scores.setdefault(key[:n], {})
+                if score > best.get((kind, item_id), float("-inf")):
+                    best[(kind, item_id)] = score
+        for prefix, best in scores.items():
+            self._rank(prefix, best)
+
+    def suggest(self, query: str, limit: int = 8) -> List[Suggestion]:
+        prefix = " ".join(tokenize(query))
+        if not prefix:
+            return []
+        with self._lock:
+            if len(prefix) <= TOP_PREFIX_LENGTH and limit <= TOP_K:
+                if prefix not in self._top:
+                    self._rank(prefix, self._scan(prefix))
+                ranked = self._top[prefix]
+            else:
+                # Longer prefixes narrow the range to a few entries
+                ranked = self._ranked(self._scan(prefix))
+            return [self._items[k] for _, _, k in ranked[:limit]]
+
+
+suggester = Suggester(max_age=getattr(settings, "STORE_SUGGEST_MAX_AGE", 600))
+
+
+def get_suggester() -> Suggester:
+    suggester.ensure_fresh()
+    return suggester
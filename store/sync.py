@@ -0,0 +1,141 @@
+"""Delta sync feed: products changed and deleted since an opaque token.
+
+A token holds two watermarks, the (updated_at, id) of the last product
+handed out and the id of the last tombstone. Both advance monotonically,
+so a client that stores ``next_token`` and calls again receives every
+later save and delete exactly once, in pages of ``limit``. Writes that
+skip ``Product.save`` (``QuerySet.update``) do not move ``updated_at``
+and are not seen.
+
+``updated_at`` and ``deleted_at`` are stamped when the row is written, not
+when its transaction commits, so a slow transaction can commit a row
+behind a watermark that has already moved past it. Rows are therefore
+only handed out once they are ``STORE_SYNC_SAFETY_LAG`` seconds old; a
+transaction that stays open longer than that can still be missed.
+
+Tombstones are pruned after ``STORE_SYNC_TOMBSTONE_RETENTION_DAYS``
+(``prune_tombstones``). A token also records the time up to which every
+deletion has been handed out; once that is older than the retention
+window the deletions it still needs may be gone, and ``changes_since``
+raises ``SyncTokenExpired`` so the client starts over with a full sync.
+"""
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import takewhile
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import Max, Q, QuerySet
+from django.utils import timezone
+
+from .models import Product, ProductTombstone
+
+# Oldest possible product watermark, for a client's first sync
+_EPOCH = datetime.fromisoformat("1970-01-01T00:00:00+00:00")
+
+
+class SyncTokenExpired(Exception):
+    """The token predates the tombstone retention window; sync from scratch."""
+
+
+def _safety_lag() -> timedelta:
+    return timedelta(seconds=getattr(settings, "STORE_SYNC_SAFETY_LAG", 5))
+
+
+def _retention() -> timedelta:
+    return timedelta(days=getattr(settings, "STORE_SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+
+
+@dataclass(frozen=True)
+class SyncToken:
+    updated_at: datetime
+    product_id: int
+    tombstone_id: int
+    # Every deletion up to this time has been handed out
+    deleted_until: datetime
+
+    def encode(self) -> str:
+        raw = "|".join([
+            self.updated_at.isoformat(), str(self.product_id), str(self.tombstone_id), self.deleted_until.isoformat(),
+        ]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "SyncToken":
+        """Inverse of ``encode``; raises ValueError on anything malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+            updated_at, product_id, tombstone_id, deleted_until = raw.split("|")
+            return cls(
+                datetime.fromisoformat(updated_at), int(product_id), int(tombstone_id),
+                datetime.fromisoformat(deleted_until),
+            )
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ValueError(f"Invalid sync token: {token!r}") from exc
+
+
+@dataclass
+class Changes:
+    rows: List[Tuple[Any, ...]]
+    tombstones: List[ProductTombstone]
+    next_token: SyncToken
+    has_more: bool
+
+
+def changed_products(token: SyncToken) -> QuerySet[Product]:
+    """Products saved after ``token``'s (updated_at, id) watermark, oldest first."""
+    # The redundant updated_at >= bound lets SQLite seek into the (updated_at, id) index
+    return Product.objects.filter(
+        Q(updated_at__gte=token.updated_at),
+        Q(updated_at__gt=token.updated_at) | Q(id__gt=token.product_id),
+    ).order_by("updated_at", "id")
+
+
+def changes_since(
+    token: Optional[SyncToken], limit: int, columns: Sequence[str], now: Optional[datetime] = None,
+) -> Changes:
+    """Up to ``limit`` changed products (as ``values_list(*columns)`` rows) and deletions after ``token``.
+
+    ``columns`` must start with id and include updated_at. Without a token
+    every product is a change and older tombstones are skipped: a first
+    sync has nothing to delete. Saves and deletes younger than the safety
+    lag wait for a later call. Raises ``SyncTokenExpired`` for a token
+    older than the tombstone retention window.
+    """
+    updated_at_at = list(columns).index("updated_at")
+    now = now or timezone.now()
+    settled = now - _safety_lag()
+    if token is None:
+        latest = ProductTombstone.objects.filter(deleted_at__lte=settled).aggregate(latest=Max("id"))["latest"]
+        token = SyncToken(_EPOCH, 0, latest or 0, settled)
+    elif token.deleted_until < now - _retention():
+        raise SyncTokenExpired("Sync token has expired; start over without one")
+
+    rows = list(changed_products(token).filter(updated_at__lte=settled).values_list(*columns)[:limit + 1])
+    # Ids are handed out in order, so stop at the first tombstone still inside the lag
+    tombstones = list(takewhile(
+        lambda tombstone: tombstone.deleted_at <= settled,
+        ProductTombstone.objects.filter(id__gt=token.tombstone_id).order_by("id")[:limit + 1],
+    ))
+
+    more_tombstones = len(tombstones) > limit
+    has_more = len(rows) > limit or more_tombstones
+    rows, tombstones = rows[:limit], tombstones[:limit]
+    next_token = SyncToken(
+        rows[-1][updated_at_at] if rows else token.updated_at,
+        rows[-1][0] if rows else token.product_id,
+        tombstones[-1].id if tombstones else token.tombstone_id,
+        # Only a caught-up page moves it: the rest of a backlog may be older
+        token.deleted_until if more_tombstones else max(token.deleted_until, settled),
+    )
+    return Changes(rows, tombstones, next_token, has_more)
+
+
+def prune_tombstones(now: Optional[datetime] = None) -> int:
+    """Delete tombstones older than the retention window; returns how many went."""
+    cutoff = (now or timezone.now()) - _retention()
+    deleted, _ = ProductTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
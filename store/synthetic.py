@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils.text import slugify
+
+from .models import Cart, Category, Order, OrderItem, Payment, Product, Profile, Wishlist
+
+BRANDS = [
+    "Apex", "BoltLine", "Craftwell", "DuraPro", "Everforge", "FieldKing", "GripMaster",
+    "Hearth", "IronOak", "Junction", "Keystone", "Lumen", "Meridian", "Northstar",
+]
+ADJECTIVES = [
+    "Cordless", "Heavy Duty", "Compact", "Professional", "Lightweight", "Electric",
+    "Adjustable", "Stainless", "Ergonomic", "Industrial", "Portable", "Magnetic",
+    "Folding", "Rechargeable", "Premium", "Classic",
+]
+NOUNS = [
+    "Drill", "Saw", "Sander", "Wrench Set", "Hammer", "Screwdriver Set", "Mixer",
+    "Food Processor", "Knife Set", "Hedge Trimmer", "Garden Hose", "Pruning Shears",
+    "Vacuum", "Pressure Washer", "Safety Glasses", "Work Gloves", "Ladder", "Toolbox",
+    "Tape Measure", "Level", "Blender", "Kettle", "Rake", "Shovel", "Mop", "Broom",
+    "Respirator", "Ear Protection", "Clamp Set", "Chisel Set",
+]
+SIZES = ["", "Mini", "XL", "12-Piece", "18V", "20V", "50ft", "5-Quart", "16oz", "8-Piece"]
+FEATURES = [
+    "with two batteries and a fast charger",
+    "with a soft-grip handle for all-day comfort",
+    "built from hardened steel for long service life",
+    "with a compact head for tight spaces",
+    "including a durable carry case",
+    "with variable speed control",
+    "rated for professional workshop use",
+    "with a weather-resistant finish",
+    "that folds flat for easy storage",
+    "with dust collection and low vibration",
+]
+USES = [
+    "Perfect for DIY projects around the house.",
+    "Ideal for contractors and serious hobbyists.",
+    "Great for decks, driveways and patios.",
+    "Essential for every kitchen.",
+    "A must-have for garden maintenance.",
+    "Keeps you protected on every job site.",
+]
+
+
+def product_name(rng: random.Random) -> str:
+    parts = [rng.choice(BRANDS), rng.choice(ADJECTIVES), rng.choice(NOUNS), rng.choice(SIZES)]
+    return " ".join(p for p in parts if p)
+
+
+def product_description(rng: random.Random, name: str) -> str:
+    features = rng.sample(FEATURES, 2)
+    return f"{name} {features[0]}, {features[1]}. {rng.choice(USES)}"
+
+
+def product_rows(count: int, category_ids: Sequence[int], seed: int = 0, start: int = 0) -> Iterator[Dict[str, object]]:
+    """Yield ``Product(**row)`` kwargs for ``count`` synthetic products.
+
+    Slugs are suffixed with a running number from ``start`` (one past the
+    highest product id, so repeated runs can append without colliding).
+    Output is deterministic for a given seed.
+    """
+    rng = random.Random(seed)
+    categories: List[int] = list(category_ids)
+    for i in range(start, start + count):
+        name = product_name(rng)
+        price = Decimal(rng.randrange(499, 49999)) / 100
+        on_sale = rng.random() < 0.3
+        yield {
+            "name": name,
+            "slug": f"{slugify(name)}-{i}",
+            "category_id": rng.choice(categories),
+            "description": product_description(rng, name),
+            "price": price,
+            "original_price": (price * Decimal(rng.choice(["1.15", "1.25", "1.40"]))).quantize(Decimal("0.01")) if on_sale else None,
+            "in_stock": rng.random() < 0.9,
+            "featured": rng.random() < 0.05,
+            "best_selling": rng.random() < 0.08,
+        }
+
+
+FIRST_NAMES = [
+    "Aarav", "Anita", "Bikash", "Deepa", "Hari", "Kiran", "Laxmi", "Manoj", "Nisha", "Prakash",
+    "Ramesh", "Sabina", "Sita", "Suman", "Sunita", "Ujjwal", "Alex", "Jordan", "Sam", "Taylor",
+]
+LAST_NAMES = [
+    "Adhikari", "Bhandari", "Gurung", "Karki", "Magar", "Pandey", "Rai", "Shrestha", "Tamang", "Thapa",
+]
+STREETS = ["Durbar Marg", "New Road", "Lakeside", "Jhamsikhel", "Baneshwor", "Thamel", "Putalisadak"]
+CITIES = ["Kathmandu", "Lalitpur", "Bhaktapur", "Pokhara", "Biratnagar", "Butwal"]
+# (status, weight); shipped and delivered orders carry a tracking number
+ORDER_STATUSES = [("delivered", 55), ("shipped", 15), ("processing", 10), ("pending", 15), ("cancelled", 5)]
+PAYMENT_METHODS = ["card", "paypal", "cod"]
+
+
+class PopularitySampler:
+    """Draw items with Zipf-skewed popularity: rank r is picked with weight 1 / r**skew.
+
+    Items are shuffled before ranking so popularity is unrelated to id.
+    Each draw is a binary search over cumulative weights.
+    """
+
+    def __init__(self, items: Sequence[int], rng: random.Random, skew: float = 1.1) -> None:
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, len(self.items) + 1)))
+
+    def sample(self, k: int) -> List[int]:
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+    def distinct(self, k: int) -> List[int]:
+        """Up to ``k`` distinct items (popular ones collide, so a few extra draws are made)."""
+        return list(dict.fromkeys(self.sample(k * 2)))[:k]
+
+
+def user_rows(count: int, seed: int = 0, start: int = 0) -> Iterator[Dict[str, object]]:
+    """Yield ``User(**row)`` kwargs; usernames run from ``start`` like product slugs."""
+    rng = random.Random(seed)
+    # One hash for every synthetic user: PBKDF2 per row would dominate the load
+    password = make_password("password")
+    for i in range(start, start + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        username = f"{first.lower()}.{last.lower()}{i}"
+        yield {
+            "username": username,
+            "email": f"{username}@example.com",
+            "first_name": first,
+            "last_name": last,
+            "password": password,
+        }
+
+
+def shipping_address(rng: random.Random) -> str:
+    return f"{rng.randint(1, 250)} {rng.choice(STREETS)}, {rng.choice(CITIES)}"
+
+
+@dataclass
+class DatasetCounts:
+    products: int = 0
+    users: int = 0
+    carts: int = 0
+    wishlists: int = 0
+    orders: int = 0
+    order_items: int = 0
+
+
+def _next_id(model) -> int:
+    # Suffixes run from one past the highest id, not count(): after deletes the
+    # count falls back under suffixes that rows still carry
+    return (model.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+
+
+def _bulk(model, objs, batch_size: int) -> int:
+    # One transaction per table: SQLite commits (and fsyncs) once instead of per row
+    created = 0
+    with transaction.atomic():
+        for batch in _batches(objs, batch_size):
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+    return created
+
+
+def _batches(items, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def load_dataset(
+    products: int = 0,
+    users: int = 0,
+    orders: int = 0,
+    seed: int = 0,
+    category_ids: Optional[Sequence[int]] = None,
+    batch_size: int = 5000,
+    log: Callable[[str], None] = lambda message: None,
+) -> DatasetCounts:
+    """Bulk-load synthetic products, users (with carts and wishlists) and orders.
+
+    Carts, wishlists and order lines draw products through one
+    ``PopularitySampler`` (and orders draw users through another), so a
+    few products and customers dominate as in production. Products go to
+    ``category_ids`` (default: every existing category). Rows are written
+    with ``bulk_create``, so no signals run: callers refresh search
+    indexes and other derived data afterwards.
+    """
+    rng = random.Random(seed)
+    counts = DatasetCounts()
+
+    if products:
+        start = time.perf_counter()
+        category_ids = list(category_ids or Category.objects.values_list("id", flat=True))
+        if not category_ids:
+            raise ValueError("Synthetic products need at least one category")
+        rows = product_rows(products, category_ids, seed=seed, start=_next_id(Product))
+        counts.products = _bulk(Product, (Product(**row) for row in rows), batch_size)
+        log(f"Inserted {counts.products} products in {time.perf_counter() - start:.1f}s")
+
+    if users:
+        start = time.perf_counter()
+        first_id = _next_id(User)
+        counts.users = _bulk(User, (User(**row) for row in user_rows(users, seed, start=first_id)), batch_size)
+        new_user_ids = list(User.objects.filter(id__gte=first_id).values_list("id", flat=True))
+        # bulk_create skips the post_save hook that creates profiles
+        _bulk(Profile, (Profile(user_id=user_id) for user_id in new_user_ids), batch_size)
+        log(f"Inserted {counts.users} users in {time.perf_counter() - start:.1f}s")
+
+    if not (users or orders):
+        return counts
+
+    start = time.perf_counter()
+    product_ids = list(Product.objects.filter(in_stock=True).values_list("id", flat=True))
+    user_ids = list(User.objects.values_list("id", flat=True))
+    if not product_ids or not user_ids:
+        return counts
+    popular_products = PopularitySampler(product_ids, rng)
+
+    if users:
+        carts = (
+            Cart(user_id=user_id, product_id=product_id, quantity=rng.choice((1, 1, 1, 2, 3)))
+            for user_id in new_user_ids
+            for product_id in popular_products.distinct(rng.choice((0, 0, 1, 1, 2, 3, 5)))
+        )
+        counts.carts = _bulk(Cart, carts, batch_size)
+        wishlists = (
+            Wishlist(user_id=user_id, product_id=product_id)
+            for user_id in new_user_ids
+            for product_id in popular_products.distinct(rng.choice((0, 0, 0, 1, 2, 4, 8)))
+        )
+        counts.wishlists = _bulk(Wishlist, wishlists, batch_size)
+        log(f"Inserted {counts.carts} cart and {counts.wishlists} wishlist rows in {time.perf_counter() - start:.1f}s")
+
+    if orders:
+        start = time.perf_counter()
+        frequent_buyers = PopularitySampler(user_ids, rng, skew=0.8)
+        statuses, weights = zip(*ORDER_STATUSES)
+        first_order = _next_id(Order)
+        with transaction.atomic():
+            for batch_start in range(0, orders, batch_size):
+                size = min(batch_size, orders - batch_start)
+                lines = [popular_products.distinct(rng.choice((1, 1, 1, 2, 2, 3, 4))) for _ in range(size)]
+                prices = dict(Product.objects.filter(
+                    id__in={pid for line in lines for pid in line}).values_list("id", "price"))
+                quantities = [[rng.choice((1, 1, 1, 2, 3)) for _ in line] for line in lines]
+                batch = []
+                for n, (line, qty, user_id, status) in enumerate(zip(
+                    lines, quantities, frequent_buyers.sample(size), rng.choices(statuses, weights, k=size)
+                )):
+                    batch.append(Order(
+                        user_id=user_id,
+                        status=status,
+                        total_amount=sum((prices[pid] * q for pid, q in zip(line, qty)), Decimal("0")),
+                        shipping_address=shipping_address(rng),
+                        tracking_number=f"HG{first_order + batch_start + n:010d}" if status in ("shipped", "delivered") else "",
+                    ))
+                # SQLite returns the new primary keys from bulk_create
+                Order.objects.bulk_create(batch)
+                items = [
+                    OrderItem(order_id=order.id, product_id=pid, quantity=q, price=prices[pid])
+                    for order, line, qty in zip(batch, lines, quantities)
+                    for pid, q in zip(line, qty)
+                ]
+                OrderItem.objects.bulk_create(items, batch_size=batch_size)
+                Payment.objects.bulk_create([
+                    Payment(
+                        order_id=order.id,
+                        payment_method=rng.choice(PAYMENT_METHODS),
+                        amount=order.total_amount,
+                        payment_status="failed" if order.status == "cancelled" else
+                        "pending" if order.status == "pending" else "completed",
+                    )
+                    for order in batch
+                ], batch_size=batch_size)
+                counts.orders += len(batch)
+                counts.order_items += len(items)
+        log(f"Inserted {counts.orders} orders with {counts.order_items} items in {time.perf_counter() - start:.1f}s")
+
+    return counts
+
@@ -0,0 +1,23 @@
+from django import template
+
+register = template.Library()
+
+# Product cards sit in grids of ~280-360px columns, full width on phones
+CARD_SIZES = '(max-width: 640px) 100vw, 360px'
+
+@register.inclusion_tag('store/_picture.html')
+def picture(image, variants, alt='', sizes=CARD_SIZES, style='', css_class='', loading='lazy'):
+    """Responsive <picture> (WebP, then JPEG) from an image's variants.
+
+    Without variants (queued, not yet backfilled, or unreadable) it shows
+    the original image.
+    """
+    return {
+        'image': image,
+        'variants': variants,
+        'alt': alt,
+        'sizes': sizes,
+        'style': style,
+        'css_class': css_class,
+        'loading': loading,
+    }
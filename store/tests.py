@@ -1,3 +1,526 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import catalog
+from .catalog import bump_catalog_version, get_catalog_version
+from .facets import FacetIndex
+from .fuzzy import CANDIDATE_BUDGET, TrigramIndex, edit_distance, trigram_index
+from .importer import import_products
+from .jobs import claim, enqueue, requeue_stale, run
+from .models import CatalogVersion, Category, ImageJob, Order, Product, ProductVector
+from .search import cached_search, ensure_fts_triggers, get_search_index, product_index, search_product_ids
+from .suggest import Suggester
+from .synthetic import load_dataset, product_rows
+from .sync import SyncTokenExpired, changes_since, prune_tombstones
+from .vectors import VectorIndex, get_vector_index, refresh_product_vectors, vector_index
+
+
+def make_product(category, slug, **fields):
+    fields.setdefault('name', slug.replace('-', ' ').title())
+    fields.setdefault('price', Decimal('10.00'))
+    return Product.objects.create(category=category, slug=slug, **fields)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The fts backend is SQLite FTS5')
+class FtsSearchTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Tools', slug='tools')
+
+    def test_saved_product_is_found(self):
+        # Run against the fully migrated schema: a later migration rebuilding
+        # store_product must not have dropped the sync triggers
+        product = make_product(self.category, 'cordless-drill', description='18V with two batteries')
+        self.assertEqual(search_product_ids('drill', backend='fts'), [product.id])
+        self.assertEqual(search_product_ids('batter', backend='fts'), [product.id])
+
+    def test_rename_and_delete_reach_the_index(self):
+        product = make_product(self.category, 'claw-hammer')
+        product.name = 'Framing Hammer'
+        product.save()
+        self.assertEqual(search_product_ids('framing', backend='fts'), [product.id])
+        self.assertEqual(search_product_ids('claw', backend='fts'), [])
+        product.delete()
+        self.assertEqual(search_product_ids('hammer', backend='fts'), [])
+
+    def test_dropped_trigger_is_recreated(self):
+        make_product(self.category, 'orbital-sander')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER store_product_fts_ai')
+        missed = make_product(self.category, 'sander-pads')
+        self.assertEqual(ensure_fts_triggers(), ['store_product_fts_ai'])
+        self.assertEqual(ensure_fts_triggers(), [])
+        # The rebuild picks up the row written while the trigger was missing
+        self.assertIn(missed.id, search_product_ids('sander', backend='fts'))
+        added = make_product(self.category, 'sanding-block')
+        self.assertEqual(search_product_ids('sanding', backend='fts'), [added.id])
+
+
+def jpeg_bytes(size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 60, 30)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class ProductImageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, STORE_IMAGE_JOBS_INLINE=True)
+        self.settings_override.enable()
+        self.product = make_product(Category.objects.create(name='Tools', slug='tools'), 'cordless-drill')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def render_picture(self, product):
+        template = Template('{% load image_extras %}{% picture product.image product.image_variants alt=product.name %}')
+        return template.render(Context({'product': product}))
+
+    def test_picture_uses_variants_once_processed(self):
+        self.product.image.save('drill.jpg', ContentFile(jpeg_bytes()))
+        self.product.refresh_from_db()
+        html = self.render_picture(self.product)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f'{self.product.image_digest}/320.jpg', html)
+
+    def test_picture_falls_back_to_original_without_variants(self):
+        # e.g. uploaded before derivatives existed, or its job failed
+        self.product.image.save('drill.jpg', ContentFile(jpeg_bytes()))
+        Product.objects.filter(pk=self.product.pk).update(image_digest='')
+        self.product.refresh_from_db()
+        html = self.render_picture(self.product)
+        self.assertNotIn('<picture', html)
+        self.assertIn(f'src="{self.product.image.url}"', html)
+
+    def test_decompression_bomb_does_not_break_save(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000), self.assertLogs('store.jobs', 'WARNING'):
+            self.product.image.save('bomb.jpg', ContentFile(jpeg_bytes((200, 200))))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_digest, '')
+
+    def test_uploads_lose_metadata_but_keep_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated
+        exif[0x010F] = 'Camera Maker Inc'
+        exif[0x8825] = {2: (27.0, 42.0, 0.0)}  # GPS latitude
+        buffer = io.BytesIO()
+        Image.new('RGB', (80, 40), (10, 200, 30)).save(buffer, 'JPEG', exif=exif.tobytes())
+        for save in (
+            lambda data: self.product.image.save('photo.jpg', ContentFile(data)),
+            lambda data: setattr(self.product, 'image', ContentFile(data, name='photo.jpg')) or self.product.save(),
+        ):
+            save(buffer.getvalue())
+            self.product.refresh_from_db()
+            with self.product.image.open('rb') as stream:
+                stored = stream.read()
+            self.assertNotIn(b'Camera Maker Inc', stored)
+            with Image.open(io.BytesIO(stored)) as image:
+                self.assertEqual(dict(image.getexif()), {0x0112: 6})
+                self.assertEqual(image.size, (80, 40))
+
+
+class FacetIndexTests(TestCase):
+    def test_build_matches_incremental_updates(self):
+        tools = Category.objects.create(name='Tools', slug='tools')
+        garden = Category.objects.create(name='Garden', slug='garden')
+        products = [
+            make_product(tools, 'cordless-drill', price=Decimal('89.99'), featured=True),
+            make_product(tools, 'claw-hammer', price=Decimal('19.50'), in_stock=False),
+            make_product(garden, 'hose-reel', price=Decimal('45.00'), best_selling=True),
+        ]
+        built = FacetIndex()
+        built.build()
+        patched = FacetIndex()
+        for product in products:
+            patched.update_product(product)
+        self.assertEqual(built._all, patched._all)
+        self.assertEqual(built._bitmaps, patched._bitmaps)
+
+        facets = built.counts(built.bitmap(category_id=tools.id))
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual(facets['in_stock'], {'true': 1, 'false': 1})
+        self.assertEqual(facets['category'], [{'value': 'tools', 'label': 'Tools', 'count': 2}])
+        self.assertEqual(facets['price'], [{'value': '0-25', 'count': 1}, {'value': '50-100', 'count': 1}])
+
+
+class SuggesterTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Tools', slug='tools')
+
+    def test_popular_item_late_in_the_alphabet_is_suggested(self):
+        # Hundreds of names sort ahead of the best seller under the prefix "s"
+        Product.objects.bulk_create(
+            Product(category=self.category, name=f'Saw blade {i:03}', slug=f'saw-blade-{i:03}', price=Decimal('5.00'))
+            for i in range(600)
+        )
+        star = make_product(self.category, 'sunflower-seeds', name='Sunflower Seeds', best_selling=True)
+        suggester = Suggester()
+        suggester.build()
+        self.assertEqual(suggester.suggest('s', limit=1)[0].id, star.id)
+        self.assertEqual(suggester.suggest('su', limit=1)[0].id, star.id)
+
+    def test_patches_reach_short_prefix_rankings(self):
+        drill = make_product(self.category, 'cordless-drill', name='Cordless Drill', featured=True)
+        make_product(self.category, 'wood-chisel', name='Wood Chisel')
+        suggester = Suggester()
+        suggester.build()
+        self.assertEqual([s.name for s in suggester.suggest('c')], ['Cordless Drill', 'Wood Chisel'])
+
+        # A new best seller enters the ranking; a product out of stock leaves it
+        clamp = make_product(self.category, 'bar-clamp', name='Bar Clamp', best_selling=True)
+        suggester.update_product(clamp)
+        drill.in_stock = False
+        suggester.update_product(drill)
+        self.assertEqual([s.name for s in suggester.suggest('c')], ['Bar Clamp', 'Wood Chisel'])
+        self.assertEqual([s.name for s in suggester.suggest('cl')], ['Bar Clamp'])
+
+    def test_saves_patch_short_prefix_rankings_in_place(self):
+        blades = Product.objects.bulk_create(
+            Product(category=self.category, name=f'Saw blade {i:03}', slug=f'saw-blade-{i:03}', price=Decimal('5.00'))
+            for i in range(60)
+        )
+        star = make_product(self.category, 'sunflower-seeds', name='Sunflower Seeds', best_selling=True)
+        suggester = Suggester()
+        suggester.build()
+
+        with mock.patch.object(suggester, '_scan', wraps=suggester._scan) as scan:
+            star.best_selling = False
+            suggester.update_product(star)
+            self.assertEqual(suggester.suggest('s', limit=1)[0].name, 'Saw blade 000')
+            # Ranked beyond the kept candidates until it became a best seller
+            blades[59].best_selling = True
+            suggester.update_product(blades[59])
+            self.assertEqual(suggester.suggest('s', limit=1)[0].name, 'Saw blade 059')
+            scan.assert_not_called()
+
+            # Deletes eat the spare tail; the prefix is ranked again once it is gone
+            for blade in blades[:25]:
+                suggester.remove_product(blade.id)
+            self.assertEqual(suggester.suggest('s', limit=2)[1].name, 'Saw blade 025')
+            self.assertEqual(scan.call_count, 1)
+
+
+@override_settings(STORE_PAGE_SIZE=2, STORE_KEYSET_FROM_PAGE=2)
+class CategoryPaginationTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Tools', slug='tools')
+        self.products = [make_product(self.category, f'tool-{i}') for i in range(7)]
+
+    def test_deep_pages_continue_with_cursors(self):
+        url = reverse('store:category_detail', args=['tools'])
+        seen = []
+        response = self.client.get(url)
+        self.assertIsNone(response.context['next_cursor'])
+        seen += [p.id for p in response.context['products']]
+
+        response = self.client.get(url, {'page': 2})
+        seen += [p.id for p in response.context['products']]
+        cursor = response.context['next_cursor']
+        self.assertContains(response, f'?after={cursor}')
+
+        while cursor:
+            response = self.client.get(url, {'after': cursor})
+            self.assertIsNone(response.context['page_obj'])
+            seen += [p.id for p in response.context['products']]
+            cursor = response.context['next_cursor']
+        # Newest first, each product exactly once
+        self.assertEqual(seen, sorted((p.id for p in self.products), reverse=True))
+
+    def test_bad_cursor_goes_back_to_page_one(self):
+        response = self.client.get(reverse('store:category_detail', args=['tools']), {'after': 'nonsense'})
+        self.assertRedirects(response, reverse('store:category_detail', args=['tools']))
+
+
+class SearchPageTests(TestCase):
+    def test_title_names_the_query(self):
+        make_product(Category.objects.create(name='Tools', slug='tools'), 'cordless-drill')
+        response = self.client.get(reverse('store:search'), {'q': 'drill'})
+        self.assertContains(response, '<title>Search: drill - HamaroGhara</title>', html=False)
+        self.assertEqual([p.slug for p in response.context['products']], ['cordless-drill'])
+
+
+class FuzzySearchTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Tools', slug='tools')
+        self.drill = make_product(self.category, 'cordless-drill', name='Cordless Drill')
+        make_product(self.category, 'corded-sander', name='Corded Sander')
+        catalog._forget()
+        product_index.built_at = trigram_index.built_at = 0.0
+
+    def test_typos_fall_back_to_trigram_search(self):
+        page = cached_search('cordles dril', page_size=10)
+        self.assertEqual((page.ids, page.fuzzy), ([self.drill.id], True))
+        exact = cached_search('cordless drill', page_size=10)
+        self.assertEqual((exact.ids, exact.fuzzy), ([self.drill.id], False))
+
+    def test_edit_distance_runs_on_the_candidate_budget_only(self):
+        # Many vocabulary words share a trigram or three with "dril"
+        Product.objects.bulk_create(
+            Product(category=self.category, name=f'Dri{a}{b} Bit', slug=f'dri{a}{b}-bit', price=Decimal('1.00'))
+            for a in 'abcdefgh' for b in 'mnopqrst'
+        )
+        index = TrigramIndex()
+        index.build()
+        with mock.patch('store.fuzzy.edit_distance', wraps=edit_distance) as distance:
+            self.assertEqual(index.search('dril'), [self.drill.id])
+        self.assertEqual(distance.call_count, CANDIDATE_BUDGET)
+
+
+class ImporterTests(TestCase):
+    def import_text(self, text, format, **kwargs):
+        return import_products(io.BytesIO(text.encode()), format, rebuild_vectors=False, **kwargs)
+
+    def test_csv_creates_products_and_categories(self):
+        result = self.import_text(
+            'slug,name,price,category,featured\n'
+            'cordless-drill,Cordless Drill,89.99,power-tools,yes\n'
+            'claw-hammer,Claw Hammer,19.5,hand-tools,no\n',
+            'csv',
+        )
+        self.assertEqual((result.created, result.updated, result.categories_created), (2, 0, 2))
+        drill = Product.objects.get(slug='cordless-drill')
+        self.assertEqual((drill.price, drill.featured, drill.category.name), (Decimal('89.99'), True, 'Power Tools'))
+
+    def test_jsonl_upserts_on_slug(self):
+        make_product(Category.objects.create(name='Tools', slug='tools'), 'cordless-drill')
+        result = self.import_text(
+            '{"slug": "cordless-drill", "name": "Cordless Drill", "price": "79.00", "category": "tools"}\n'
+            '\n'
+            '{"slug": "hose-reel", "name": "Hose Reel", "price": 45, "category": "tools", "in_stock": false}\n',
+            'jsonl',
+        )
+        self.assertEqual((result.created, result.updated, result.skipped), (1, 1, 0))
+        self.assertEqual(Product.objects.get(slug='cordless-drill').price, Decimal('79.00'))
+        self.assertFalse(Product.objects.get(slug='hose-reel').in_stock)
+
+    def test_partial_records_leave_other_columns_alone(self):
+        tools = Category.objects.create(name='Tools', slug='tools')
+        make_product(tools, 'cordless-drill', description='18V with two batteries', featured=True)
+        # A price-only row in the same batch as a full one must not reset the drill's columns
+        self.import_text(
+            '{"slug": "cordless-drill", "name": "Cordless Drill", "price": "79.00", "category": "tools"}\n'
+            '{"slug": "hose-reel", "name": "Hose Reel", "price": "45", "category": "tools",'
+            ' "description": "30 m", "featured": false}\n',
+            'jsonl',
+        )
+        drill = Product.objects.get(slug='cordless-drill')
+        self.assertEqual((drill.price, drill.description, drill.featured), (Decimal('79.00'), '18V with two batteries', True))
+        self.assertEqual(Product.objects.get(slug='hose-reel').description, '30 m')
+
+    def test_repeated_slug_keeps_the_last_record(self):
+        self.import_text(
+            '{"slug": "hose-reel", "name": "Hose Reel", "price": "45", "category": "tools", "featured": true}\n'
+            '{"slug": "hose-reel", "name": "Hose Reel XL", "price": "55", "category": "tools"}\n',
+            'jsonl',
+        )
+        reel = Product.objects.get(slug='hose-reel')
+        self.assertEqual((reel.name, reel.price, reel.featured), ('Hose Reel XL', Decimal('55.00'), False))
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        Category.objects.create(name='Tools', slug='tools')
+        result = self.import_text(
+            '{"slug": "cordless-drill", "name": "Cordless Drill", "price": "89.99", "category": "tools"}\n'
+            '{"slug": "no-price", "name": "No Price", "category": "tools"}\n'
+            'not json\n'
+            '{"slug": "claw-hammer", "name": "Claw Hammer", "price": "-1", "category": "tools"}\n'
+            '{"slug": "hose-reel", "name": "Hose Reel", "price": "45", "category": "garden"}\n',
+            'jsonl',
+            create_categories=False,
+        )
+        self.assertEqual((result.created, result.skipped), (1, 4))
+        self.assertEqual([line for line, _ in result.errors], [2, 3, 4, 5])
+        self.assertIn('slug, name and price are required', result.errors[0][1])
+        self.assertIn('invalid JSON', result.errors[1][1])
+        self.assertIn('non-negative', result.errors[2][1])
+        self.assertIn("unknown category 'garden'", result.errors[3][1])
+        self.assertEqual(list(Product.objects.values_list('slug', flat=True)), ['cordless-drill'])
+
+
+class CatalogVersionTests(TestCase):
+    def setUp(self):
+        # Versions memoized by earlier tests were rolled back with their data
+        catalog._forget()
+
+    def test_bump_moves_the_shared_version(self):
+        before = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_catalog_version()
+        self.assertGreater(get_catalog_version(), before)
+        self.assertEqual(CatalogVersion.objects.get().version, get_catalog_version())
+
+    def test_other_process_writes_are_seen_after_the_ttl(self):
+        before = get_catalog_version()
+        # Another process' bump: the row moves, this process' memo does not
+        CatalogVersion.objects.update(version=F('version') + 1)
+        self.assertEqual(get_catalog_version(), before)
+        with mock.patch.object(catalog, 'VERSION_TTL', 0):
+            self.assertEqual(get_catalog_version(), before + 1)
+
+    def test_missing_row_is_reseeded_past_old_versions(self):
+        before = get_catalog_version()
+        CatalogVersion.objects.all().delete()
+        with mock.patch.object(catalog, 'VERSION_TTL', 0):
+            self.assertGreater(get_catalog_version(), before)
+
+
+class ImageJobQueueTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, STORE_IMAGE_JOBS_INLINE=False)
+        self.settings_override.enable()
+        self.product = make_product(Category.objects.create(name='Tools', slug='tools'), 'cordless-drill')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_one_pending_job_per_row(self):
+        enqueue('product', self.product.id)
+        enqueue('product', self.product.id)
+        self.assertEqual(ImageJob.objects.filter(status='pending').count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ImageJob.objects.create(kind='product', object_id=self.product.id)
+
+    def test_failed_retry_yields_to_a_newer_pending_job(self):
+        self.product.image.save('drill.jpg', ContentFile(b'not an image at all'))
+        job = claim()
+        enqueue('product', self.product.id)  # uploaded again while the job ran
+        with mock.patch('store.jobs.process', side_effect=OSError('disk full')), self.assertLogs('store.jobs', 'WARNING'):
+            self.assertFalse(run(job))
+        self.assertEqual(list(ImageJob.objects.values_list('status', flat=True)), ['pending'])
+
+    def test_stale_job_is_requeued_unless_queued_again(self):
+        self.product.image.save('drill.jpg', ContentFile(jpeg_bytes()))
+        job = claim()
+        ImageJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        job = claim()
+        ImageJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        enqueue('product', self.product.id)
+        self.assertEqual(requeue_stale(), 0)
+        self.assertEqual(list(ImageJob.objects.values_list('status', flat=True)), ['pending'])
+
+
+class SyncFeedTests(TestCase):
+    COLUMNS = ('id', 'slug', 'updated_at')
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Tools', slug='tools')
+        self.start = timezone.now()
+
+    def slugs(self, changes):
+        return [row[1] for row in changes.rows]
+
+    def test_late_commit_behind_a_newer_save_is_not_skipped(self):
+        make_product(self.category, 'drill')
+        early = changes_since(None, 10, self.COLUMNS, now=self.start + timedelta(seconds=1))
+        self.assertEqual(self.slugs(early), [])  # still inside the safety lag
+        # Stamped before drill's save but committed after the call above
+        saw = make_product(self.category, 'saw')
+        Product.objects.filter(pk=saw.pk).update(updated_at=self.start - timedelta(seconds=1))
+
+        later = changes_since(early.next_token, 10, self.COLUMNS, now=self.start + timedelta(seconds=10))
+        self.assertEqual(self.slugs(later), ['saw', 'drill'])
+
+    def test_tombstones_expire_with_tokens_that_stop_syncing(self):
+        first = changes_since(None, 10, self.COLUMNS, now=self.start).next_token
+        for slug in ('drill', 'saw'):
+            make_product(self.category, slug).delete()
+
+        # A backlog page leaves deleted_until behind; the caught-up page moves it
+        paged = changes_since(first, 1, self.COLUMNS, now=self.start + timedelta(days=20))
+        self.assertTrue(paged.has_more)
+        self.assertEqual(paged.next_token.deleted_until, first.deleted_until)
+        synced = changes_since(paged.next_token, 1, self.COLUMNS, now=self.start + timedelta(days=20))
+        self.assertEqual([t.slug for t in synced.tombstones], ['saw'])
+        self.assertGreater(synced.next_token.deleted_until, first.deleted_until)
+
+        later = self.start + timedelta(days=31)
+        self.assertEqual(prune_tombstones(now=later), 2)
+        with self.assertRaises(SyncTokenExpired):
+            changes_since(first, 10, self.COLUMNS, now=later)
+        self.assertEqual(changes_since(synced.next_token, 10, self.COLUMNS, now=later).tombstones, [])
+
+
+class VectorIndexTests(TestCase):
+    def setUp(self):
+        tools = Category.objects.create(name='Tools', slug='tools')
+        self.drill = make_product(tools, 'cordless-drill', description='18V cordless drill driver with battery')
+        self.driver = make_product(tools, 'impact-driver', description='18V cordless impact driver with battery')
+        self.hammer = make_product(tools, 'hammer-drill', description='Cordless hammer drill with battery', in_stock=False)
+        self.rake = make_product(tools, 'garden-rake', description='Steel rake for leaves and lawns')
+        vector_index.built_at = product_index.built_at = 0.0
+
+    def similar(self, index, product, **kwargs):
+        return [pid for pid, _ in index.more_like_this(product.id, **kwargs)]
+
+    def test_refresh_persists_only_stale_vectors(self):
+        self.assertEqual(refresh_product_vectors(), 4)
+        self.assertEqual(refresh_product_vectors(), 0)
+        before = ProductVector.objects.get(product=self.rake).terms
+
+        self.rake.description = 'Cordless leaf blower with battery'
+        self.rake.save()
+        # The save patched the built index but wrote nothing
+        self.assertEqual(ProductVector.objects.get(product=self.rake).terms, before)
+        self.assertIn(self.rake.id, self.similar(vector_index, self.drill))
+
+        self.assertEqual(refresh_product_vectors(), 1)
+        self.assertNotEqual(ProductVector.objects.get(product=self.rake).terms, before)
+
+    def test_build_revectorizes_products_saved_after_their_vector(self):
+        refresh_product_vectors()
+        Product.objects.filter(pk=self.rake.pk).update(
+            description='18V cordless drill with battery', updated_at=timezone.now() + timedelta(seconds=1),
+        )
+        fresh = VectorIndex()
+        fresh.build()
+        self.assertIn(self.rake.id, self.similar(fresh, self.drill))
+
+    def test_in_stock_view_filters_neighbours(self):
+        index = get_vector_index()
+        self.assertIn(self.hammer.id, self.similar(index, self.drill))
+        allowed = get_search_index().filter_view(in_stock=True)
+        neighbours = self.similar(index, self.drill, allowed=allowed)
+        self.assertIn(self.driver.id, neighbours)
+        self.assertNotIn(self.hammer.id, neighbours)
+
+
+class SyntheticDatasetTests(TestCase):
+    def setUp(self):
+        Category.objects.create(name='Tools', slug='tools')
+
+    def test_reruns_after_deletes_number_rows_past_every_id(self):
+        load_dataset(products=4, users=3, orders=6, seed=1)
+        # count() now trails the ids; users go untouched as deleting one takes their orders
+        Product.objects.order_by('id').first().delete()
+        Order.objects.order_by('id').first().delete()
+        counts = load_dataset(products=4, users=3, orders=6, seed=1)
+        self.assertEqual((counts.products, counts.users, counts.orders), (4, 3, 6))
+
+        # Ids run on from the last run here, so every suffix is its row's id
+        for pk, slug in Product.objects.values_list('id', 'slug'):
+            self.assertTrue(slug.endswith(f'-{pk}'), slug)
+        for pk, username in User.objects.values_list('id', 'username'):
+            self.assertTrue(username.endswith(str(pk)), username)
+        for pk, tracking in Order.objects.exclude(tracking_number='').values_list('id', 'tracking_number'):
+            self.assertEqual(tracking, f'HG{pk:010d}')
+
+    def test_same_seed_gives_the_same_rows(self):
+        rows = [list(product_rows(5, [1, 2], seed=7)) for _ in range(2)]
+        self.assertEqual(rows[0], rows[1])
+        self.assertNotEqual(rows[0], list(product_rows(5, [1, 2], seed=8)))
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import FrozenSet, List
+
+# Small English stop word list; enough to keep "the", "and", "for" out of
+# TF-IDF vectors without pulling in sklearn's ENGLISH_STOP_WORDS.
+STOP_WORDS: FrozenSet[str] = frozenset(
+    """
+    a about above after again all also an and any are as at be been before
+    being below between both but by can could did do does doing down during
+    each few for from further had has have having he her here hers him his
+    how i if in into is it its itself just me more most my no nor not now of
+    off on once only or other our ours out over own same she should so some
+    such than that the their theirs them then there these they this those
+    through to too under until up very was we were what when where which
+    while who whom why will with would you your yours
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokenization shared by the recommender and search."""
+    if not text:
+        return []
+    return ''.join(ch.lower() if ch.isalnum() else ' ' for ch in text).split()
+
+
+def content_tokens(text: str, ngram_range: tuple[int, int] = (1, 1)) -> List[str]:
+    """Tokens with stop words removed, optionally extended with word n-grams."""
+    words = [t for t in tokenize(text) if t not in STOP_WORDS]
+    low, high = ngram_range
+    terms: List[str] = []
+    for n in range(low, high + 1):
+        if n == 1:
+            terms.extend(words)
+            continue
+        terms.extend(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return terms
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import heapq
+import math
+import threading
+import time
+from collections import Counter
+from typing import Container, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from .clustering import NGRAM_RANGE
+from .models import Product, ProductVector
+from .text import content_tokens
+
+SparseVector = Dict[str, float]
+
+# Only the heaviest query terms are scored; the tail adds cost, not ranking signal
+MAX_QUERY_TERMS = 32
+
+
+def product_text(name: str, description: str) -> str:
+    # Same text the subcategory trainer clusters on
+    return f"{name or ''}. {description or ''}"
+
+
+def _idf(df: int, n_docs: int) -> float:
+    # Smoothed idf, matching the clustering backends
+    return math.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+
+def tfidf_vector(text: str, df: Mapping[str, int], n_docs: int, keep_unseen: bool = False) -> SparseVector:
+    """L2-normalized TF-IDF of ``text``.
+
+    Terms never seen in the corpus are dropped, or with ``keep_unseen``
+    weighted as df=0 (so a new product still has a vector).
+    """
+    tf = Counter(t for t in content_tokens(text, NGRAM_RANGE) if keep_unseen or t in df)
+    weights = {term: count * _idf(df.get(term, 0), n_docs) for term, count in tf.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    if not norm:
+        return {}
+    return {term: round(w / norm, 6) for term, w in weights.items()}
+
+
+def compute_product_vectors(rows: Iterable[Tuple[int, str, str]]) -> Dict[int, SparseVector]:
+    """TF-IDF vectors over the whole catalog from (id, name, description) rows."""
+    docs: Dict[int, List[str]] = {}
+    df: Counter = Counter()
+    for pid, name, description in rows:
+        terms = content_tokens(product_text(name, description), NGRAM_RANGE)
+        docs[pid] = terms
+        df.update(set(terms))
+    n_docs = len(docs)
+    vectors: Dict[int, SparseVector] = {}
+    for pid, terms in docs.items():
+        tf = Counter(terms)
+        weights = {term: count * _idf(df[term], n_docs) for term, count in tf.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        vectors[pid] = {term: round(w / norm, 6) for term, w in weights.items()}
+    return vectors
+
+
+def rebuild_product_vectors(batch_size: int = 1000) -> int:
+    """Recompute and persist every product's vector; returns how many were stored."""
+    rows = Product.objects.values_list("id", "name", "description").iterator(chunk_size=5000)
+    vectors = compute_product_vectors(rows)
+    with transaction.atomic():
+        ProductVector.objects.all().delete()
+        batch: List[ProductVector] = []
+        for pid, terms in vectors.items():
+            batch.append(ProductVector(product_id=pid, terms=terms))
+            if len(batch) >= batch_size:
+                ProductVector.objects.bulk_create(batch)
+                batch = []
+        ProductVector.objects.bulk_create(batch)
+    vector_index.invalidate()
+    return len(vectors)
+
+
+def stale_products():
+    """Products with no stored vector, or one older than their last save."""
+    return Product.objects.filter(Q(text_vector__isnull=True) | Q(text_vector__updated_at__lt=F("updated_at")))
+
+
+def refresh_product_vectors(batch_size: int = 1000) -> int:
+    """Vectorize and persist only the stale products; returns how many were stored.
+
+    Saves do not write vectors themselves (that would cost a write per save,
+    and only in processes with a built index); run this from a periodic job,
+    and ``rebuild_product_vectors`` now and then to refresh every weight.
+    """
+    index = get_vector_index()
+    stored = 0
+    rows = stale_products().order_by("id").values_list("id", "name", "description")
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:batch_size])
+        if not chunk:
+            return stored
+        vectors = [ProductVector(product_id=pid, terms=index.update_product(pid, name, description))
+                   for pid, name, description in chunk]
+        # auto_now stamps updated_at on insert, and the upsert copies it over
+        ProductVector.objects.bulk_create(
+            vectors, update_conflicts=True, unique_fields=["product"], update_fields=["terms", "updated_at"],
+        )
+        stored += len(vectors)
+        last_id = chunk[-1][0]
+
+
+class VectorIndex:
+    """Exact top-k cosine search over the persisted product vectors.
+
+    Vectors are unit length, so cosine similarity is a sparse dot product,
+    accumulated over term postings: only products sharing a term with the
+    query are touched. New or edited products are vectorized against the
+    loaded document frequencies, in memory only; ``refresh_product_vectors``
+    persists them, and until then every build vectorizes them again.
+    """
+
+    def __init__(self, max_age: float = 600.0) -> None:
+        self.max_age = max_age
+        self.built_at = 0.0
+        self._lock = threading.RLock()
+        self._vectors: Dict[int, SparseVector] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._df: Counter = Counter()
+
+    def build(self) -> None:
+        fresh = VectorIndex(self.max_age)
+        current = ProductVector.objects.filter(updated_at__gte=F("product__updated_at"))
+        for pid, terms in current.values_list("product_id", "terms").iterator(chunk_size=5000):
+            fresh._put(pid, terms)
+        # Products created or edited since their vector was stored get one on the fly
+        missing = stale_products().values_list("id", "name", "description")
+        for pid, name, description in missing.iterator(chunk_size=5000):
+            fresh._put(pid, fresh.vectorize(product_text(name, description)))
+        with self._lock:
+            self._vectors = fresh._vectors
+            self._postings = fresh._postings
+            self._df = fresh._df
+            self.built_at = time.monotonic()
+
+    def ensure_fresh(self) -> None:
+        if not self.built_at or time.monotonic() - self.built_at > self.max_age:
+            self.build()
+
+    def invalidate(self) -> None:
+        """Reload from the database on next use (after a bulk rebuild)."""
+        self.built_at = 0.0
+
+    def _put(self, pid: int, vector: SparseVector) -> None:
+        self._vectors[pid] = vector
+        for term, weight in vector.items():
+            self._postings.setdefault(term, {})[pid] = weight
+        self._df.update(vector.keys())
+
+    def _drop(self, pid: int) -> None:
+        for term in self._vectors.pop(pid, {}):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(pid, None)
+                if not postings:
+                    del self._postings[term]
+            self._df[term] -= 1
+            if self._df[term] <= 0:
+                del self._df[term]
+
+    def vectorize(self, text: str) -> SparseVector:
+        # Reads the live document frequencies; callers hold the lock
+        return tfidf_vector(text, self._df, max(1, len(self._vectors)), keep_unseen=True)
+
+    def update_product(self, product_id: int, name: str, description: str) -> SparseVector:
+        """Re-vectorize one product in memory and return its new vector."""
+        with self._lock:
+            self._drop(product_id)
+            vector = self.vectorize(product_text(name, description))
+            self._put(product_id, vector)
+        return vector
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            self._drop(product_id)
+
+    def nearest(
+        self,
+        vector: SparseVector,
+        k: int = 10,
+        exclude: Optional[Set[int]] = None,
+        allowed: Optional[Container[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """Top-k (product_id, cosine) for ``vector``, best first.
+
+        ``allowed`` is only asked about scored ids, so a ``FilterView`` over
+        the search index's posting sets works without materializing them.
+        """
+        terms = heapq.nlargest(MAX_QUERY_TERMS, vector.items(), key=lambda item: item[1])
+        scores: Dict[int, float] = {}
+        with self._lock:
+            for term, weight in terms:
+                for pid, other in self._postings.get(term, {}).items():
+                    scores[pid] = scores.get(pid, 0.0) + weight * other
+        for pid in exclude or ():
+            scores.pop(pid, None)
+        if allowed is not None:
+            scores = {pid: score for pid, score in scores.items() if pid in allowed}
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def more_like_this(
+        self, product_id: int, k: int = 10, allowed: Optional[Container[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        vector = self._vectors.get(product_id)
+        if not vector:
+            return []
+        return self.nearest(vector, k=k, exclude={product_id}, allowed=allowed)
+
+    def query(self, text: str, k: int = 10, allowed: Optional[Container[int]] = None) -> List[Tuple[int, float]]:
+        return self.nearest(tfidf_vector(text, self._df, max(1, len(self._vectors))), k=k, allowed=allowed)
+
+
+vector_index = VectorIndex(max_age=getattr(settings, "STORE_VECTOR_INDEX_MAX_AGE", 600))
+
+
+def get_vector_index() -> VectorIndex:
+    vector_index.ensure_fresh()
+    return vector_index
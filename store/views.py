@@ -3,11 +3,15 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, update_session_auth_hash
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.db.models import Q
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from .models import Product, Category, Cart, Wishlist, Order, OrderItem, Payment, Profile
 from .recommender import recommend_for_user_cart, get_similar_products, warm_cache, compute_product_similarities
+from .facets import get_facet_index
+from .pagination import PRODUCT_CARD_FIELDS, KEYSET_ORDERING, encode_cursor, keyset_page
+from .search import cached_search, products_in_order
 from .forms import UserUpdateForm, ProfileUpdateForm, CustomPasswordChangeForm
 import uuid
 from decimal import Decimal
@@ -45,30 +49,69 @@ def product_detail(request, slug):
 
 def category_detail(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    products = Product.objects.filter(category=category, in_stock=True)
+    products = Product.objects.filter(category=category, in_stock=True).only(*PRODUCT_CARD_FIELDS)
+    page_size = getattr(settings, 'STORE_PAGE_SIZE', 24)
+    facet_index = get_facet_index()
+    
+    # ?after=<cursor> switches to keyset paging (cheap at any depth, no page count);
+    # numbered pages hand over to it from STORE_KEYSET_FROM_PAGE on
+    cursor = request.GET.get('after')
+    page_obj = None
+    next_cursor = None
+    if cursor:
+        try:
+            keyset = keyset_page(products, cursor, page_size)
+        except ValueError:
+            return redirect('store:category_detail', slug=category.slug)
+        products = keyset.items
+        next_cursor = keyset.next_cursor
+    else:
+        page_obj = Paginator(products.order_by(*KEYSET_ORDERING), page_size).get_page(request.GET.get('page'))
+        products = page_obj.object_list
+        if page_obj.has_next() and page_obj.number >= getattr(settings, 'STORE_KEYSET_FROM_PAGE', 5):
+            # Same ordering as keyset_page, so its cursor continues right after this page
+            last = list(products)[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
     
     context = {
         'category': category,
         'products': products,
+        'page_obj': page_obj,
+        'next_cursor': next_cursor,
+        'facets': facet_index.counts(facet_index.bitmap(category_id=category.id, in_stock=True)),
     }
     return render(request, 'store/category_detail.html', context)
 
 def search(request):
     query = request.GET.get('q', '')
     products = []
+    result = None
     
     if query:
-        products = Product.objects.filter(
-            Q(name__icontains=query) | Q(description__icontains=query),
-            in_stock=True
+        result = cached_search(
+            query,
+            page=_page_number(request.GET.get('page')),
+            page_size=getattr(settings, 'STORE_PAGE_SIZE', 24),
+            facets=True,
+            in_stock=True,
         )
+        products = products_in_order(result.ids, Product.objects.only(*PRODUCT_CARD_FIELDS))
     
     context = {
         'products': products,
         'query': query,
+        'result': result,
+        'facets': result.facets if result else None,
+        'fuzzy': result.fuzzy if result else False,
     }
     return render(request, 'store/search_results.html', context)
 
+def _page_number(value):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
 @login_required
 def cart_detail(request):
     cart_items = Cart.objects.filter(user=request.user)